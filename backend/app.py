@@ -1,15 +1,34 @@
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, request, jsonify, send_from_directory, send_file, g, Response
 from flask_cors import CORS
 from werkzeug.utils import secure_filename
+from werkzeug.exceptions import RequestEntityTooLarge
+import io
 import os
+import hashlib
+import time
+import threading
+import mimetypes
+import signal
 from datetime import datetime
 from dotenv import load_dotenv
 from functools import wraps
 
 from database import db
-from user_service import UserService
-from otp_service import OTPService
-from disease_detection import DiseaseDetectionService
+from user_service import UserService, TOKEN_CACHE, PROFILE_CACHE
+from otp_service import OTPService, OTP_STORE, SMS_QUEUE
+import disease_detection
+from disease_detection import (DiseaseDetectionService, INFERENCE_STATS, INFERENCE_MODE,
+                               PREDICTION_CACHE)
+from upload_store import PendingUploadStore
+from pagination import encode_cursor, decode_cursor
+from image_derivatives import DERIVATIVES, DERIVATIVE_SIZES
+from blob_store import BLOBS
+from deletion_jobs import DELETION_JOBS
+from maintenance import MAINTENANCE
+from metrics import REGISTRY, HTTP_REQUESTS, HTTP_ERRORS, HTTP_LATENCY, SCAN_STAGE_LATENCY
+from scan_profiling import StageTimer, ScanProfiler, stage
+from disease_catalog import lookup_encoded
+import fast_json
 
 load_dotenv()
 
@@ -24,12 +43,144 @@ app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
 # Create uploads directory if it doesn't exist
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 
+# 'immediate' writes every scan to disk on upload. 'deferred' keeps scans in
+# memory and writes them only once a report is saved; opt in only with a
+# single worker process, since a save landing on another process (or after
+# a restart) cannot find the scan
+UPLOAD_PERSIST = os.getenv('UPLOAD_PERSIST', 'immediate').lower()
+PENDING_UPLOADS = PendingUploadStore(
+    app.config['UPLOAD_FOLDER'],
+    max_bytes=int(float(os.getenv('PENDING_UPLOADS_MB', 64)) * 1024 * 1024),
+    ttl_seconds=int(os.getenv('PENDING_UPLOAD_TTL', 1800)),
+    path_for=BLOBS.path_for
+)
+
+# GET /api/ratings page size (default and upper bound for ?limit=)
+RATINGS_PAGE_SIZE = int(os.getenv('RATINGS_PAGE_SIZE', 50))
+RATINGS_MAX_PAGE_SIZE = int(os.getenv('RATINGS_MAX_PAGE_SIZE', 200))
+
+# Uploads and their derivatives never change once written (names are
+# unique), so browsers and proxies may cache them for a long time
+UPLOAD_CACHE_MAX_AGE = int(os.getenv('UPLOAD_CACHE_MAX_AGE', 30 * 24 * 3600))
+
+# Serve Prometheus metrics on /metrics
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'True').lower() == 'true'
+
+# Scan stage timings in a Server-Timing response header (for debugging)
+SCAN_TIMING_HEADER = os.getenv('SCAN_TIMING_HEADER', 'False').lower() == 'true'
+
+# cProfile every N-th scan (0 = off); SIGUSR2 to a worker profiles every
+# scan for SCAN_PROFILE_WINDOW seconds
+SCAN_PROFILER = ScanProfiler(
+    os.getenv('SCAN_PROFILE_DIR', 'profiles'),
+    every=int(os.getenv('SCAN_PROFILE_EVERY', 0)),
+    max_files=int(os.getenv('SCAN_PROFILE_MAX_FILES', 200))
+)
+SCAN_PROFILE_WINDOW = int(os.getenv('SCAN_PROFILE_WINDOW', 60))
+if SCAN_PROFILE_WINDOW > 0 and hasattr(signal, 'SIGUSR2'):
+    try:
+        signal.signal(signal.SIGUSR2,
+                      lambda signum, frame: SCAN_PROFILER.enable_for(SCAN_PROFILE_WINDOW))
+    except ValueError:
+        pass  # Imported outside the main thread
+
+# Purge expired OTPs and orphaned uploads from a background thread of each
+# worker (runs are serialized across workers); set False when
+# maintenance.py runs as its own process
+MAINTENANCE_IN_APP = os.getenv('MAINTENANCE_IN_APP', 'True').lower() == 'true'
+
+# /api/scan/batch limits (images per request and total request size)
+SCAN_BATCH_MAX_IMAGES = int(os.getenv('SCAN_BATCH_MAX_IMAGES', 30))
+SCAN_BATCH_MAX_MB = int(os.getenv('SCAN_BATCH_MAX_MB', 128))
+
 # Allowed extensions for image upload
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+def json_response(payload, status=200):
+    """JSON response for payloads carrying pre-encoded catalog fragments (fast_json)"""
+    return Response(fast_json.dumps(payload), status=status, mimetype='application/json')
+
+# ==================== Startup ====================
+
+def startup():
+    """Connect to the database and warm up the model off the import path.
+
+    Runs in a background thread so the worker answers /api/health right
+    away; the health check reports readiness until both are done.
+    """
+    if os.getenv('MODEL_WARMUP', 'background').lower() == 'background':
+        disease_detection.start_model_warmup()
+
+    print("\n" + "="*60)
+    print("Initializing GrowGuardians Database")
+    print("="*60)
+
+    delay = 2
+    while db.host and not db.schema_ready:
+        db.connect()
+        if db.schema_ready:
+            break
+        print(f"⚠️  Retrying database setup in {delay}s")
+        time.sleep(delay)
+        delay = min(delay * 2, 60)
+
+    if not db.host:
+        db.connect()  # Prints the "not configured" hint
+    print("="*60 + "\n")
+    
+    # Finish file deletions interrupted by a restart
+    if db.schema_ready:
+        try:
+            DELETION_JOBS.resume()
+        except Exception as e:
+            print(f"❌ Could not resume file deletion jobs: {e}")
+
+    if db.schema_ready and MAINTENANCE_IN_APP:
+        MAINTENANCE.start()
+
+threading.Thread(target=startup, name='startup', daemon=True).start()
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    """Count the request and observe its latency under its route pattern"""
+    start = g.pop('request_start', None)
+    if start is not None:
+        # The URL rule ('/api/reports/<int:report_id>') keeps label values bounded
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        HTTP_LATENCY.observe(time.perf_counter() - start, request.method, route)
+        HTTP_REQUESTS.inc(request.method, route, str(response.status_code))
+        if response.status_code >= 500:
+            HTTP_ERRORS.inc(request.method, route)
+    return response
+
+@app.teardown_appcontext
+def release_db_connection(exception=None):
+    """Return the request's pooled database connection"""
+    db.release()
+
+def scan_timing(f):
+    """Decorator timing the stages of a scan and profiling sampled requests"""
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        timer = StageTimer()
+        with timer.activate(), SCAN_PROFILER.maybe_profile():
+            response = app.make_response(f(*args, **kwargs))
+        
+        for name, seconds in timer.stages.items():
+            SCAN_STAGE_LATENCY.observe(seconds, name)
+        if SCAN_TIMING_HEADER:
+            response.headers['Server-Timing'] = timer.server_timing()
+        return response
+    
+    return decorated
+
 def token_required(f):
     """Decorator to require authentication token"""
     @wraps(f)
@@ -62,7 +213,23 @@ def token_required(f):
 
 @app.route('/api/health', methods=['GET'])
 def health_check():
-    """Health check endpoint"""
+    """Health check endpoint
+
+    Always answers immediately. Pass ?ready=1 to get a 503 until the
+    database schema and the model are ready (for readiness probes).
+    """
+    model_state = disease_detection.MODEL_STATE
+    schema_ready = db.schema_ready or not db.host
+    ready = schema_ready and model_state in ('ready', 'failed', 'server')
+    if request.args.get('ready') and not ready:
+        return jsonify({
+            'success': False,
+            'message': 'GrowGuardians Backend is starting',
+            'ready': False,
+            'model': model_state,
+            'schemaReady': schema_ready
+        }), 503
+
     try:
         # Check if connection is alive
         if db.connection:
@@ -78,9 +245,55 @@ def health_check():
     return jsonify({
         'success': True,
         'message': 'GrowGuardians Backend is running',
-        'database': db_status
+        'database': db_status,
+        'ready': ready,
+        'model': model_state,
+        'databasePool': db.pool_stats(),
+        'predictionCache': PREDICTION_CACHE.stats() if PREDICTION_CACHE else None,
+        'pendingUploads': PENDING_UPLOADS.stats(),
+        'smsQueue': SMS_QUEUE.stats() if SMS_QUEUE else None,
+        'scanProfiler': SCAN_PROFILER.stats(),
+        'otpStore': OTP_STORE.stats(),
+        'tokenCache': TOKEN_CACHE.stats(),
+        'profileCache': PROFILE_CACHE.stats(),
+        'derivatives': DERIVATIVES.stats(),
+        'maintenance': MAINTENANCE.stats()
     }), 200
 
+@app.route('/api/inference/stats', methods=['GET'])
+def inference_stats():
+    """Model throughput and latency per batch size"""
+    batcher = disease_detection.BATCHER
+    return jsonify({
+        'success': True,
+        'mode': INFERENCE_MODE,
+        'backend': getattr(disease_detection.MODEL, 'backend', None),
+        'batching': batcher is not None,
+        'maxBatchSize': batcher.max_batch_size if batcher else 1,
+        'maxWaitMs': batcher.max_wait * 1000 if batcher else 0,
+        'batches': INFERENCE_STATS.snapshot()
+    }), 200
+
+def _pool_gauge():
+    stats = db.pool_stats()
+    if not stats:
+        return {}
+    return {('in_use',): stats['in_use'], ('idle',): stats['idle'], ('max',): stats['max']}
+
+REGISTRY.gauge_callback('growguardians_db_pool_connections', 'Database pool connections by state',
+                        _pool_gauge, ('state',))
+REGISTRY.gauge_callback('growguardians_sms_queue_depth', 'SMS messages waiting for delivery',
+                        lambda: {(): SMS_QUEUE.stats()['queued']} if SMS_QUEUE else {})
+REGISTRY.gauge_callback('growguardians_pending_upload_bytes', 'Bytes of scans kept in memory',
+                        lambda: {(): PENDING_UPLOADS.stats()['bytes']})
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Prometheus scrape endpoint"""
+    if not METRICS_ENABLED:
+        return jsonify({'success': False, 'message': 'Metrics are disabled'}), 404
+    return Response(REGISTRY.expose(), mimetype='text/plain; version=0.0.4')
+
 # ==================== Authentication Routes ====================
 
 @app.route('/api/auth/send-registration-otp', methods=['POST'])
@@ -217,64 +430,174 @@ def update_profile():
 
 # ==================== Disease Detection Routes ====================
 
+def store_scan_upload(file):
+    """Read an uploaded image once and keep it until its report is saved.
+
+    Returns (image_data, digest, filepath). Files are named by content
+    hash, so identical photos share one blob.
+    """
+    with stage('read'):
+        image_data = file.read()
+    with stage('hash'):
+        digest = hashlib.sha256(image_data).hexdigest()
+    filename = BLOBS.name_for(image_data, secure_filename(file.filename), digest)
+    filepath = BLOBS.path_for(filename)
+    with stage('save'):
+        if UPLOAD_PERSIST == 'immediate':
+            BLOBS.write(filename, image_data)
+        elif not BLOBS.touch(filename):
+            PENDING_UPLOADS.add(filename, image_data)
+    return image_data, digest, filepath
+
+def store_saved_upload(filename, timeout=30):
+    """Make sure a scan is on disk before a report references it.
+
+    Waits for the write of a pending scan so its errors reach the caller.
+    Returns False when the scan is neither pending nor on disk (it
+    expired, the worker restarted or another worker handled the scan).
+    """
+    future = PENDING_UPLOADS.persist(filename)
+    if future is not None:
+        future.result(timeout=timeout)
+        return True
+    return BLOBS.touch(filename)
+
+def diagnosis_data_for(filepath, prediction):
+    """Client-facing diagnosis of one scanned image (serialize with json_response)"""
+    disease_data = lookup_encoded(prediction['disease_key'])
+    
+    return {
+        'image': f"/uploads/{os.path.basename(filepath)}",
+        'imagePath': filepath,
+        'isHealthy': prediction['is_healthy'],
+        'diseaseName': disease_data['name'],
+        'confidence': prediction['confidence'],
+        'diagnosisPoints': disease_data['diagnosis'],
+        'tipsPoints': disease_data['tips'],
+        'date': datetime.now().isoformat()
+    }
+
 @app.route('/api/scan/upload', methods=['POST'])
 @token_required
+@scan_timing
 def upload_scan():
     """Upload plant image for disease detection (without saving to database)"""
     try:
-        if 'image' not in request.files:
+        with stage('parse'):
+            files = request.files
+        if 'image' not in files:
             return jsonify({'success': False, 'message': 'No image file provided'}), 400
         
-        file = request.files['image']
+        file = files['image']
         
         if file.filename == '':
             return jsonify({'success': False, 'message': 'No selected file'}), 400
         
         if file and allowed_file(file.filename):
-            # Create unique filename
-            filename = secure_filename(file.filename)
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            filename = f"{request.user_id}_{timestamp}_{filename}"
-            filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-            
-            # Save file
-            file.save(filepath)
+            image_data, digest, filepath = store_scan_upload(file)
             
             # Predict disease
-            prediction = DiseaseDetectionService.predict_disease(filepath)
-            
-            # Get disease information
-            from disease_detection import DISEASE_INFO
-            disease_data = DISEASE_INFO.get(prediction['disease_key'], DISEASE_INFO['healthy'])
+            prediction = DiseaseDetectionService.predict_disease_bytes(image_data, digest)
             
             # Return diagnosis data WITHOUT saving to database
-            diagnosis_data = {
-                'image': f"/uploads/{os.path.basename(filepath)}",
-                'imagePath': filepath,
-                'isHealthy': prediction['is_healthy'],
-                'diseaseName': disease_data['name'],
-                'confidence': prediction['confidence'],
-                'diagnosisPoints': disease_data['diagnosis'],
-                'tipsPoints': disease_data['tips'],
-                'date': datetime.now().isoformat()
-            }
+            diagnosis_data = diagnosis_data_for(filepath, prediction)
             
-            return jsonify({
-                'success': True,
-                'diagnosisData': diagnosis_data
-            }), 200
+            with stage('serialize'):
+                return json_response({
+                    'success': True,
+                    'diagnosisData': diagnosis_data
+                })
         else:
             return jsonify({'success': False, 'message': 'Invalid file type'}), 400
         
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)}), 500
 
+@app.route('/api/scan/batch', methods=['POST'])
+@token_required
+@scan_timing
+def upload_scan_batch():
+    """Diagnose several photos of one plot (multipart field 'images') in one request"""
+    try:
+        # Batches may carry far more than a single scan
+        request.max_content_length = SCAN_BATCH_MAX_MB * 1024 * 1024
+        with stage('parse'):
+            files = request.files.getlist('images')
+        if not files:
+            return jsonify({'success': False, 'message': 'No image files provided'}), 400
+        if len(files) > SCAN_BATCH_MAX_IMAGES:
+            return jsonify({
+                'success': False,
+                'message': f'At most {SCAN_BATCH_MAX_IMAGES} images per batch'
+            }), 400
+        
+        results = [None] * len(files)
+        scans = []  # (index, file name, image_data, digest, filepath)
+        for index, file in enumerate(files):
+            if not file.filename or not allowed_file(file.filename):
+                results[index] = {
+                    'index': index,
+                    'fileName': file.filename,
+                    'success': False,
+                    'message': 'Invalid file type'
+                }
+                continue
+            scans.append((index, file.filename, *store_scan_upload(file)))
+        
+        predictions = DiseaseDetectionService.predict_disease_batch(
+            [(image_data, digest) for _, _, image_data, digest, _ in scans])
+        
+        for (index, name, _, _, filepath), prediction in zip(scans, predictions):
+            if 'error' in prediction:
+                results[index] = {
+                    'index': index,
+                    'fileName': name,
+                    'success': False,
+                    'message': prediction['error']
+                }
+            else:
+                results[index] = {
+                    'index': index,
+                    'fileName': name,
+                    'success': True,
+                    'diagnosisData': {
+                        **diagnosis_data_for(filepath, prediction),
+                        'diseaseKey': prediction['disease_key']
+                    }
+                }
+        
+        # Files rejected before prediction count as failed in the summary
+        rejected = [{'error': 'Invalid file type'}] * (len(files) - len(scans))
+        summary = DiseaseDetectionService.summarize_predictions(predictions + rejected)
+        
+        with stage('serialize'):
+            return json_response({
+                'success': True,
+                'results': results,
+                'summary': summary
+            })
+        
+    except RequestEntityTooLarge:
+        return jsonify({
+            'success': False,
+            'message': f'Batch larger than {SCAN_BATCH_MAX_MB} MB'
+        }), 413
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)}), 500
+
 @app.route('/api/reports', methods=['GET'])
 @token_required
 def get_reports():
-    """Get all reports for the authenticated user"""
+    """Get a page of reports for the authenticated user (?limit=&after=)"""
     try:
-        result = DiseaseDetectionService.get_user_reports(request.user_id)
+        limit = request.args.get('limit', type=int)
+        if limit is not None and limit < 1:
+            return jsonify({'success': False, 'message': 'limit must be positive'}), 400
+        
+        result = DiseaseDetectionService.get_user_reports(
+            request.user_id, limit=limit, after=request.args.get('after'))
+        if not result['success'] and result['message'] == 'Invalid cursor':
+            return jsonify(result), 400
         return jsonify(result), 200 if result['success'] else 500
         
     except Exception as e:
@@ -290,6 +613,10 @@ def save_report():
         if not data or 'imagePath' not in data:
             return jsonify({'success': False, 'message': 'Missing image path'}), 400
         
+        # Only the file name is taken from the client; the blob store
+        # decides where it lives
+        filename = secure_filename(os.path.basename(data['imagePath']))
+        
         # Create prediction object from diagnosis data
         prediction = {
             'is_healthy': data.get('isHealthy', False),
@@ -297,23 +624,36 @@ def save_report():
             'confidence': data.get('confidence', 0)
         }
         
-        # Save report to database
+        # Write the scan to disk now that it is being kept, before any
+        # report points at it
+        try:
+            stored = store_saved_upload(filename)
+        except Exception as e:
+            print(f"❌ Could not store scan {filename}: {e}")
+            return jsonify({'success': False, 'message': 'Could not store the scanned image'}), 500
+        if not stored:
+            return jsonify({
+                'success': False,
+                'message': 'Scan expired, please upload the image again'
+            }), 410
+        
+        # Save report to database (takes a reference on the image blob)
         report_result = DiseaseDetectionService.save_report(
             request.user_id,
-            data['imagePath'],
+            BLOBS.path_for(filename),
             prediction
         )
         
         if not report_result['success']:
             return jsonify(report_result), 500
         
-        # Get saved report details
-        report_details = DiseaseDetectionService.get_report_details(
-            report_result['report_id'],
-            request.user_id
-        )
+        # Create its thumbnail and preview ahead of the first reports list request
+        DERIVATIVES.generate_async(filename, lambda: load_upload(filename))
         
-        return jsonify(report_details), 200
+        return json_response({
+            'success': True,
+            'diagnosisData': report_result['diagnosisData']
+        })
         
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)}), 500
@@ -324,7 +664,7 @@ def get_report(report_id):
     """Get specific report details"""
     try:
         result = DiseaseDetectionService.get_report_details(report_id, request.user_id)
-        return jsonify(result), 200 if result['success'] else 404
+        return json_response(result, 200 if result['success'] else 404)
         
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)}), 500
@@ -343,10 +683,27 @@ def delete_report(report_id):
 @app.route('/api/reports', methods=['DELETE'])
 @token_required
 def delete_all_reports():
-    """Delete all reports for the authenticated user"""
+    """Delete all reports for the authenticated user.
+
+    Returns 202 with a jobId; image files are removed in the background
+    (see GET /api/reports/delete-jobs/<job_id>).
+    """
     try:
         result = DiseaseDetectionService.delete_all_reports(request.user_id)
-        return jsonify(result), 200 if result['success'] else 500
+        return jsonify(result), 202 if result['success'] else 500
+        
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+@app.route('/api/reports/delete-jobs/<job_id>', methods=['GET'])
+@token_required
+def get_delete_job(job_id):
+    """Progress of a background file deletion job"""
+    try:
+        job = DELETION_JOBS.status(job_id, request.user_id)
+        if job is None:
+            return jsonify({'success': False, 'message': 'Job not found'}), 404
+        return jsonify({'success': True, 'job': job}), 200
         
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)}), 500
@@ -366,15 +723,21 @@ def submit_rating():
         if not rating or not isinstance(rating, int) or rating < 1 or rating > 5:
             return jsonify({'success': False, 'message': 'Rating must be between 1 and 5'}), 400
         
-        # Insert rating into database
+        # Insert rating and bump the summary count in one transaction
         cursor = db.connection.cursor()
         cursor.execute("""
             INSERT INTO ratings (user_id, rating, feedback)
             VALUES (%s, %s, %s)
+            RETURNING id
         """, (request.user_id, rating, feedback))
+        rating_id = cursor.fetchone()[0]
+        cursor.execute("""
+            INSERT INTO ratings_summary (rating, count)
+            VALUES (%s, 1)
+            ON CONFLICT (rating) DO UPDATE SET count = ratings_summary.count + 1
+        """, (rating,))
         
         db.connection.commit()
-        rating_id = cursor.lastrowid
         cursor.close()
         
         return jsonify({
@@ -390,22 +753,46 @@ def submit_rating():
 @app.route('/api/ratings', methods=['GET'])
 @token_required
 def get_ratings():
-    """Get all ratings (can be filtered by user)"""
+    """Get a page of ratings, newest first (?limit=&after=)"""
     try:
+        limit = request.args.get('limit', type=int)
+        if limit is not None and limit < 1:
+            return jsonify({'success': False, 'message': 'limit must be positive'}), 400
+        limit = min(limit or RATINGS_PAGE_SIZE, RATINGS_MAX_PAGE_SIZE)
+        
+        params = []
+        keyset = ""
+        after = request.args.get('after')
+        if after:
+            try:
+                params.extend(decode_cursor(after))
+            except ValueError:
+                return jsonify({'success': False, 'message': 'Invalid cursor'}), 400
+            keyset = "WHERE (r.created_at, r.id) < (%s, %s)"
+        # One extra row tells us whether there is a next page
+        params.append(limit + 1)
+        
         cursor = db.connection.cursor()
         
         # Get ratings with user information
-        cursor.execute("""
+        cursor.execute(f"""
             SELECT r.id, r.rating, r.feedback, r.created_at,
                    u.name, u.surname
             FROM ratings r
             JOIN users u ON r.user_id = u.id
-            ORDER BY r.created_at DESC
-        """)
+            {keyset}
+            ORDER BY r.created_at DESC, r.id DESC
+            LIMIT %s
+        """, params)
         
         ratings_rows = cursor.fetchall()
         cursor.close()
         
+        next_cursor = None
+        if len(ratings_rows) > limit:
+            ratings_rows = ratings_rows[:limit]
+            next_cursor = encode_cursor(ratings_rows[-1][3], ratings_rows[-1][0])
+        
         # Format ratings
         ratings = []
         for row in ratings_rows:
@@ -422,23 +809,98 @@ def get_ratings():
         return jsonify({
             'success': True,
             'ratings': ratings,
-            'count': len(ratings)
+            'count': len(ratings),
+            'nextCursor': next_cursor
         }), 200
         
     except Exception as e:
         print(f"❌ Error fetching ratings: {e}")
         return jsonify({'success': False, 'message': str(e)}), 500
 
+@app.route('/api/ratings/summary', methods=['GET'])
+@token_required
+def get_ratings_summary():
+    """Average rating, count and 1-5 histogram from the running aggregate"""
+    try:
+        cursor = db.connection.cursor()
+        cursor.execute("SELECT rating, count FROM ratings_summary")
+        rows = cursor.fetchall()
+        cursor.close()
+        
+        histogram = {str(star): 0 for star in range(1, 6)}
+        for star, count in rows:
+            histogram[str(star)] = count
+        total = sum(histogram.values())
+        average = sum(int(star) * count for star, count in histogram.items()) / total if total else 0
+        
+        return jsonify({
+            'success': True,
+            'summary': {
+                'average': round(average, 2),
+                'count': total,
+                'histogram': histogram
+            }
+        }), 200
+        
+    except Exception as e:
+        print(f"❌ Error fetching ratings summary: {e}")
+        return jsonify({'success': False, 'message': str(e)}), 500
+
 # ==================== File Serving ====================
 
 @app.route('/uploads/<filename>', methods=['GET'])
 def serve_upload(filename):
-    """Serve uploaded files"""
+    """Serve uploaded files (?size=thumb or ?size=preview for WebP derivatives)"""
     try:
-        return send_from_directory(app.config['UPLOAD_FOLDER'], filename)
+        size = request.args.get('size')
+        if size:
+            return serve_derivative(filename, size)
+        
+        # Scans not yet written to disk are served from memory
+        image_data = PENDING_UPLOADS.get(filename)
+        if image_data is not None:
+            mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+            return send_file(io.BytesIO(image_data), mimetype=mimetype)
+        
+        # Content-addressed blobs: the hash in the name is a strong ETag
+        if BLOBS.is_blob(filename):
+            response = send_file(BLOBS.path_for(filename), etag=filename.split('.')[0],
+                                 max_age=UPLOAD_CACHE_MAX_AGE, conditional=True)
+            response.cache_control.public = True
+            response.cache_control.immutable = True
+            return response
+        return send_from_directory(app.config['UPLOAD_FOLDER'], filename,
+                                   max_age=UPLOAD_CACHE_MAX_AGE)
     except Exception as e:
         return jsonify({'success': False, 'message': 'File not found'}), 404
 
+def load_upload(filename):
+    """Original bytes of an upload on disk, or None"""
+    filename = secure_filename(filename)
+    return BLOBS.read(filename) if filename else None
+
+def serve_derivative(filename, size):
+    """Serve a cached WebP derivative with a strong ETag"""
+    if size not in DERIVATIVE_SIZES:
+        return jsonify({'success': False, 'message': f'Unknown size: {size}'}), 400
+    
+    # Scans not yet written to disk are rendered without caching: maintenance
+    # only removes derivatives of files it finds on disk, so a cached copy
+    # would outlive a scan that is never saved
+    image_data = PENDING_UPLOADS.get(filename)
+    if image_data is not None and not BLOBS.exists(filename):
+        return send_file(io.BytesIO(DERIVATIVES.render(image_data, size)), mimetype='image/webp')
+    
+    path, etag = DERIVATIVES.get(filename, size, lambda: load_upload(filename))
+    if path is None:
+        return jsonify({'success': False, 'message': 'File not found'}), 404
+    
+    response = send_file(path, mimetype='image/webp', etag=etag,
+                         max_age=UPLOAD_CACHE_MAX_AGE, conditional=True)
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
 # ==================== Run Server ====================
 
 if __name__ == '__main__':
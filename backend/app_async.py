@@ -0,0 +1,834 @@
+"""
+Asyncio serving mode for the GrowGuardians API (aiohttp).
+
+Exposes the same routes as app.py. The I/O-bound ones (OTP and login,
+profile, reports, ratings, health) are native coroutines on an asyncpg
+pool, so an idle request costs a few KB instead of a worker thread and
+one process can hold thousands of open connections. Scans run the model
+on a small executor, OTP SMS go out as background tasks, and the
+remaining routes (saving and deleting reports, batch scans, uploads,
+metrics) are served by the Flask app on a thread pool.
+
+Run with:
+
+    python app_async.py
+    gunicorn 'app_async:create_app()' --worker-class aiohttp.GunicornWebWorker --bind 0.0.0.0:5000
+"""
+import asyncio
+import io
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
+
+from aiohttp import web
+from werkzeug.datastructures import FileStorage
+
+import disease_detection
+from app import (app as flask_app, allowed_file, store_scan_upload, diagnosis_data_for,
+                 PENDING_UPLOADS, SCAN_BATCH_MAX_MB, RATINGS_PAGE_SIZE, RATINGS_MAX_PAGE_SIZE)
+from database import db
+from database_async import adb
+from maintenance import MAINTENANCE
+from disease_detection import (DiseaseDetectionService, PREDICTION_CACHE, REPORTS_PAGE_SIZE,
+                               REPORTS_MAX_PAGE_SIZE, format_report_list_item,
+                               format_report_details)
+from metrics import (HTTP_REQUESTS, HTTP_ERRORS, HTTP_LATENCY, OTP_STORE_LATENCY,
+                     SCAN_STAGE_LATENCY)
+from otp_service import OTPService, OTP_STORE, OTP_TTL_SECONDS, SMS_SENDER
+from pagination import encode_cursor, decode_cursor
+from scan_profiling import StageTimer
+from sms_delivery import timed_send
+import fast_json
+from user_service import (UserService, TOKEN_CACHE, PROFILE_CACHE, format_user,
+                          REGISTER_USER, INSERT_USER, LOGIN_USER, USER_BY_MOBILE)
+from otp_store import ISSUE_OTP, ISSUE_OTP_IF_USER, CONSUME_OTP
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Threads running the Flask app for routes without a native handler
+WSGI_EXECUTOR = ThreadPoolExecutor(max_workers=int(os.getenv('ASYNC_WSGI_THREADS', 16)),
+                                   thread_name_prefix='wsgi-bridge')
+
+# Threads running scans (upload storage, preprocessing and the model)
+INFERENCE_EXECUTOR = ThreadPoolExecutor(max_workers=int(os.getenv('ASYNC_INFERENCE_WORKERS', 2)),
+                                        thread_name_prefix='async-inference')
+
+# OTP SMS are sent by background tasks, at most this many at once
+SMS_SLOTS = asyncio.Semaphore(int(os.getenv('ASYNC_SMS_CONCURRENCY', 50)))
+SMS_MAX_ATTEMPTS = int(os.getenv('SMS_MAX_ATTEMPTS', 3))
+SMS_RETRY_BACKOFF = float(os.getenv('SMS_RETRY_BACKOFF', 1))
+_sms_tasks = set()
+
+CORS_METHODS = 'DELETE, GET, HEAD, OPTIONS, PATCH, POST, PUT'
+
+
+def error(message, status):
+    return web.json_response({'success': False, 'message': message}, status=status)
+
+
+def fast_response(payload, status=200):
+    """JSON response for payloads carrying pre-encoded catalog fragments (fast_json)"""
+    return web.Response(body=fast_json.dumps(payload), status=status,
+                        content_type='application/json')
+
+
+def token_required(handler):
+    """Decorator to require authentication token (user id in request['user_id'])"""
+    @wraps(handler)
+    async def decorated(request):
+        token = request.headers.get('Authorization')
+        if not token:
+            return error('Token is missing', 401)
+
+        # Remove 'Bearer ' prefix if present
+        if token.startswith('Bearer '):
+            token = token[7:]
+
+        result = UserService.verify_token(token)
+        if not result['success']:
+            return web.json_response(result, status=401)
+
+        request['user_id'] = result['user_id']
+        return await handler(request)
+
+    return decorated
+
+
+# ==================== Middleware ====================
+
+@web.middleware
+async def cors_middleware(request, handler):
+    """Allow any origin, like CORS(app) in app.py"""
+    if request.method == 'OPTIONS' and 'Access-Control-Request-Method' in request.headers:
+        headers = {
+            'Access-Control-Allow-Origin': '*',
+            'Access-Control-Allow-Methods': CORS_METHODS
+        }
+        if 'Access-Control-Request-Headers' in request.headers:
+            headers['Access-Control-Allow-Headers'] = request.headers['Access-Control-Request-Headers']
+        return web.Response(status=200, headers=headers)
+
+    response = await handler(request)
+    response.headers.setdefault('Access-Control-Allow-Origin', '*')
+    return response
+
+
+@web.middleware
+async def metrics_middleware(request, handler):
+    """Count native requests and observe their latency under their route pattern"""
+    if request.match_info.handler is wsgi_bridge:
+        return await handler(request)  # Recorded by the Flask app itself
+
+    route = request.match_info.route.resource
+    route = route.canonical if route is not None else 'unmatched'
+    start = asyncio.get_running_loop().time()
+    status = 500
+    try:
+        response = await handler(request)
+        status = response.status
+        return response
+    except web.HTTPException as e:
+        status = e.status
+        raise
+    finally:
+        HTTP_LATENCY.observe(asyncio.get_running_loop().time() - start, request.method, route)
+        HTTP_REQUESTS.inc(request.method, route, str(status))
+        if status >= 500:
+            HTTP_ERRORS.inc(request.method, route)
+
+
+# ==================== WSGI Bridge ====================
+
+async def wsgi_bridge(request):
+    """Serve the request with the Flask app on WSGI_EXECUTOR"""
+    body = await request.read()
+    environ = {
+        'REQUEST_METHOD': request.method,
+        'SCRIPT_NAME': '',
+        'PATH_INFO': request.path,
+        'QUERY_STRING': request.query_string,
+        'SERVER_NAME': request.url.host or 'localhost',
+        'SERVER_PORT': str(request.url.port or 80),
+        'SERVER_PROTOCOL': f"HTTP/{request.version.major}.{request.version.minor}",
+        'REMOTE_ADDR': request.remote or '',
+        'CONTENT_TYPE': request.headers.get('Content-Type', ''),
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': request.scheme,
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False
+    }
+    for name, value in request.headers.items():
+        key = 'HTTP_' + name.upper().replace('-', '_')
+        if key not in ('HTTP_CONTENT_TYPE', 'HTTP_CONTENT_LENGTH'):
+            environ[key] = f"{environ[key]},{value}" if key in environ else value
+
+    def call_flask():
+        started = {}
+
+        def start_response(status, headers, exc_info=None):
+            started['status'] = int(status.split(' ', 1)[0])
+            started['headers'] = headers
+
+        result = flask_app.wsgi_app(environ, start_response)
+        try:
+            content = b''.join(result)
+        finally:
+            if hasattr(result, 'close'):
+                result.close()
+        return started['status'], started['headers'], content
+
+    status, headers, content = await asyncio.get_running_loop().run_in_executor(
+        WSGI_EXECUTOR, call_flask)
+    response = web.Response(status=status, body=content)
+    for name, value in headers:
+        if name.lower() not in ('content-length', 'transfer-encoding', 'connection'):
+            response.headers.add(name, value)
+    return response
+
+
+async def scan_batch(request):
+    """/api/scan/batch on Flask, the one route allowed a body up to SCAN_BATCH_MAX_MB"""
+    return await wsgi_bridge(request.clone(client_max_size=SCAN_BATCH_MAX_MB * 1024 * 1024))
+
+
+# ==================== OTP ====================
+
+async def issue_otp(mobile_number, purpose, otp_code, require_user=None):
+    """OTP_STORE.issue() without blocking the event loop; returns whether it was issued"""
+    with OTP_STORE_LATENCY.time(OTP_STORE.name, 'issue'):
+        if OTP_STORE.name == 'memory':
+            if (require_user is not None
+                    and await user_registered(mobile_number) != require_user):
+                return False
+            return OTP_STORE.issue(mobile_number, purpose, otp_code, OTP_TTL_SECONDS)
+
+        # Same single statements as PostgresOTPStore.issue
+        if require_user is None:
+            await adb.execute(ISSUE_OTP.numbered, mobile_number, purpose,
+                              mobile_number, otp_code, purpose, float(OTP_TTL_SECONDS))
+            return True
+        registered = await adb.fetchval(ISSUE_OTP_IF_USER.numbered, mobile_number,
+                                        mobile_number, purpose, require_user,
+                                        mobile_number, otp_code, purpose,
+                                        float(OTP_TTL_SECONDS), require_user)
+        return registered == require_user
+
+
+async def user_registered(mobile_number):
+    return await adb.fetchval("SELECT EXISTS (SELECT 1 FROM users WHERE mobile_number = $1)",
+                              mobile_number)
+
+
+async def verify_otp(mobile_number, otp_code, purpose):
+    """Consume a matching, unexpired OTP; same result dict as OTPService.verify_otp"""
+    with OTP_STORE_LATENCY.time(OTP_STORE.name, 'verify'):
+        if OTP_STORE.name == 'memory':
+            verified = OTP_STORE.verify(mobile_number, purpose, otp_code)
+        else:
+            verified = await adb.fetchval(CONSUME_OTP.numbered,
+                                          mobile_number, otp_code, purpose) is not None
+
+    if verified:
+        return {'success': True, 'message': 'OTP verified successfully'}
+    return {'success': False, 'message': 'Invalid or expired OTP'}
+
+
+async def deliver_sms(mobile_number, otp_code):
+    """Send one OTP SMS with retries; runs as a background task"""
+    async with SMS_SLOTS:
+        for attempt in range(1, SMS_MAX_ATTEMPTS + 1):
+            try:
+                result = await asyncio.to_thread(timed_send, SMS_SENDER, mobile_number, otp_code)
+                if result.get('success'):
+                    return
+                sms_error = result.get('message', 'unknown error')
+            except Exception as e:
+                sms_error = str(e)
+
+            print(f"❌ SMS Error (attempt {attempt}/{SMS_MAX_ATTEMPTS}): {sms_error}")
+            if attempt < SMS_MAX_ATTEMPTS:
+                await asyncio.sleep(SMS_RETRY_BACKOFF * (2 ** (attempt - 1)))
+
+    # Fallback to console display
+    print("\n" + "="*60)
+    print("⚠️  SMS FAILED - Displaying OTP in Console")
+    print(f"📱 Mobile Number: {mobile_number}")
+    print(f"🔑 OTP Code: {otp_code}")
+    print(f"❌ Error: {sms_error}")
+    print("="*60 + "\n")
+
+
+async def send_otp(mobile_number, purpose, require_user=None):
+    """Store a new OTP and schedule its SMS; same result dict as OTPService.send_otp"""
+    try:
+        otp_code = OTPService.generate_otp()
+        if not await issue_otp(mobile_number, purpose, otp_code, require_user):
+            return {
+                'success': False,
+                'message': ('Mobile number not registered' if require_user
+                            else 'Mobile number already registered')
+            }
+
+        task = asyncio.create_task(deliver_sms(mobile_number, otp_code))
+        _sms_tasks.add(task)
+        task.add_done_callback(_sms_tasks.discard)
+
+        # Also display in console for development
+        print("\n" + "="*60)
+        print(f"📱 OTP CODE FOR MOBILE: {mobile_number}")
+        print(f"🔑 OTP: {otp_code}")
+        print("⏰ Expires in: 3 minutes")
+        print(f"📋 Purpose: {purpose}")
+        print("📨 SMS Status: SMS scheduled for delivery")
+        print("="*60 + "\n")
+
+        return {
+            'success': True,
+            'message': 'OTP sent successfully',
+            'otp': otp_code,  # For development only - remove in production
+            'expiresIn': OTP_TTL_SECONDS,
+            'sms_sent': True
+        }
+
+    except Exception as e:
+        print(f"Error sending OTP: {e}")
+        return {'success': False, 'message': f'Failed to send OTP: {str(e)}'}
+
+
+# ==================== Health Check ====================
+
+async def health_check(request):
+    """Health check endpoint (?ready=1 returns 503 until schema and model are ready)"""
+    model_state = disease_detection.MODEL_STATE
+    schema_ready = db.schema_ready or not db.host
+    ready = schema_ready and model_state in ('ready', 'failed', 'server')
+    if request.query.get('ready') and not ready:
+        return web.json_response({
+            'success': False,
+            'message': 'GrowGuardians Backend is starting',
+            'ready': False,
+            'model': model_state,
+            'schemaReady': schema_ready
+        }, status=503)
+
+    try:
+        db_status = 'connected' if adb.pool and await adb.fetchval('SELECT 1') == 1 else 'disconnected'
+    except Exception:
+        db_status = 'disconnected'
+
+    return web.json_response({
+        'success': True,
+        'message': 'GrowGuardians Backend is running',
+        'server': 'asyncio',
+        'database': db_status,
+        'ready': ready,
+        'model': model_state,
+        'databasePool': adb.stats(),
+        'wsgiDatabasePool': db.pool_stats(),
+        'predictionCache': PREDICTION_CACHE.stats() if PREDICTION_CACHE else None,
+        'pendingUploads': PENDING_UPLOADS.stats(),
+        'smsTasks': len(_sms_tasks),
+        'otpStore': OTP_STORE.stats(),
+        'tokenCache': TOKEN_CACHE.stats(),
+        'profileCache': PROFILE_CACHE.stats(),
+        'maintenance': MAINTENANCE.stats()
+    })
+
+
+# ==================== Authentication Routes ====================
+
+async def send_registration_otp(request):
+    """Send OTP for registration"""
+    try:
+        data = await request.json()
+        mobile_number = data.get('mobileNumber')
+
+        if not mobile_number:
+            return error('Mobile number is required', 400)
+
+        result = await send_otp(mobile_number, 'registration', require_user=False)
+        return web.json_response(result, status=200 if result['success'] else 400)
+
+    except Exception as e:
+        return error(str(e), 500)
+
+
+async def register(request):
+    """Register new user"""
+    try:
+        data = await request.json()
+        otp_code = data.get('otpCode')
+        mobile_number = data.get('mobileNumber')
+
+        # Validate required fields
+        if not all([data.get('name'), data.get('surname'), mobile_number, data.get('tehsil')]):
+            return error('Required fields are missing', 400)
+
+        if not otp_code:
+            return error('OTP code is required', 400)
+
+        user_values = (data.get('name'), data.get('surname'), mobile_number,
+                       data.get('email', ''), data.get('province', ''),
+                       data.get('district', ''), data.get('tehsil'),
+                       data.get('village', ''), data.get('address', ''))
+
+        if OTP_STORE.name == 'memory':
+            otp_result = await verify_otp(mobile_number, otp_code, 'registration')
+            if not otp_result['success']:
+                return web.json_response(otp_result, status=400)
+            user_id = await adb.fetchval(INSERT_USER.numbered, *user_values)
+        else:
+            # Verify the OTP and insert the user in one statement
+            row = await adb.fetchrow(REGISTER_USER.numbered,
+                                     mobile_number, otp_code, 'registration', *user_values)
+            if not row[0]:
+                return error('Invalid or expired OTP', 400)
+            user_id = row[1]
+
+        if user_id is None:
+            return error('User already registered', 400)
+
+        return web.json_response({
+            'success': True,
+            'message': 'User registered successfully',
+            'token': UserService.generate_token(user_id, mobile_number),
+            'user_id': user_id
+        }, status=201)
+
+    except Exception as e:
+        return error(str(e), 500)
+
+
+async def resend_otp(request):
+    """Resend OTP"""
+    try:
+        data = await request.json()
+        mobile_number = data.get('mobileNumber')
+        purpose = data.get('purpose', 'registration')  # 'registration' or 'login'
+
+        if not mobile_number:
+            return error('Mobile number is required', 400)
+
+        result = await send_otp(mobile_number, purpose)
+        return web.json_response(result, status=200 if result['success'] else 400)
+
+    except Exception as e:
+        return error(str(e), 500)
+
+
+async def send_login_otp(request):
+    """Send OTP for login"""
+    try:
+        data = await request.json()
+        mobile_number = data.get('mobileNumber')
+
+        if not mobile_number:
+            return error('Mobile number is required', 400)
+
+        result = await send_otp(mobile_number, 'login', require_user=True)
+        return web.json_response(result, status=200 if result['success'] else 400)
+
+    except Exception as e:
+        return error(str(e), 500)
+
+
+async def login(request):
+    """Login user with OTP"""
+    try:
+        data = await request.json()
+        mobile_number = data.get('mobileNumber')
+        otp_code = data.get('otpCode')
+
+        if not mobile_number or not otp_code:
+            return error('Mobile number and OTP are required', 400)
+
+        if OTP_STORE.name == 'memory':
+            otp_result = await verify_otp(mobile_number, otp_code, 'login')
+            if not otp_result['success']:
+                return web.json_response(otp_result, status=400)
+            user_row = await adb.fetchrow(USER_BY_MOBILE.numbered, mobile_number)
+        else:
+            # Verify the OTP and read the user in one statement
+            row = await adb.fetchrow(LOGIN_USER.numbered,
+                                     mobile_number, otp_code, 'login', mobile_number)
+            if not row[0]:
+                return error('Invalid or expired OTP', 400)
+            user_row = tuple(row)[1:] if row[1] is not None else None
+        if not user_row:
+            return error('User not found', 400)
+
+        user = format_user(user_row)
+        return web.json_response({
+            'success': True,
+            'message': 'Login successful',
+            'token': UserService.generate_token(user['id'], mobile_number),
+            'user': user
+        })
+
+    except Exception as e:
+        return error(str(e), 500)
+
+
+# ==================== User Profile Routes ====================
+
+@token_required
+async def get_profile(request):
+    """Get user profile (read through PROFILE_CACHE)"""
+    user_id = request['user_id']
+    try:
+        profile = PROFILE_CACHE.get(user_id)
+        if profile is None:
+            user_row = await adb.fetchrow("""
+                SELECT id, name, surname, mobile_number, email, province,
+                       district, tehsil, village, address
+                FROM users
+                WHERE id = $1
+            """, user_id)
+            if not user_row:
+                return error('User not found', 404)
+            profile = format_user(user_row)
+            PROFILE_CACHE.put(user_id, profile)
+
+        return web.json_response({'success': True, 'user': dict(profile)})
+
+    except Exception as e:
+        print(f"Error fetching profile: {e}")
+        return error('Failed to fetch profile', 404)
+
+
+@token_required
+async def update_profile(request):
+    """Update user profile (OTP required when the mobile number changes)"""
+    user_id = request['user_id']
+    try:
+        data = await request.json()
+        otp_code = data.get('otpCode')
+        new_mobile = data.get('mobileNumber')
+
+        current_mobile = await adb.fetchval("SELECT mobile_number FROM users WHERE id = $1", user_id)
+        if current_mobile is None:
+            return error('User not found', 400)
+
+        # If mobile number is changing, verify OTP
+        if new_mobile and new_mobile != current_mobile:
+            if not otp_code:
+                return error('OTP required for mobile number change', 400)
+            otp_result = await verify_otp(new_mobile, otp_code, 'login')
+            if not otp_result['success']:
+                return web.json_response(otp_result, status=400)
+
+        await adb.execute("""
+            UPDATE users
+            SET mobile_number = $1, email = $2, address = $3, updated_at = CURRENT_TIMESTAMP
+            WHERE id = $4
+        """, new_mobile or current_mobile, data.get('email', ''), data.get('address', ''), user_id)
+        PROFILE_CACHE.pop(user_id)
+
+        return web.json_response({'success': True, 'message': 'Profile updated successfully'})
+
+    except Exception as e:
+        print(f"Error updating profile: {e}")
+        return error(f'Failed to update profile: {str(e)}', 400)
+
+
+# ==================== Disease Detection Routes ====================
+
+def scan_upload(file):
+    """Store and diagnose one upload (runs on INFERENCE_EXECUTOR)"""
+    timer = StageTimer()
+    with timer.activate():
+        image_data, digest, filepath = store_scan_upload(file)
+        prediction = DiseaseDetectionService.predict_disease_bytes(image_data, digest)
+        diagnosis_data = diagnosis_data_for(filepath, prediction)
+    for name, seconds in timer.stages.items():
+        SCAN_STAGE_LATENCY.observe(seconds, name)
+    return diagnosis_data
+
+
+@token_required
+async def upload_scan(request):
+    """Upload plant image for disease detection (without saving to database)"""
+    try:
+        max_size = flask_app.config['MAX_CONTENT_LENGTH']
+        if (request.content_length or 0) > max_size:
+            return error('File too large', 413)
+
+        # Chunked bodies have no Content-Length; post() stops reading past the limit
+        form = await request.clone(client_max_size=max_size).post()
+        field = form.get('image')
+        if field is None or not hasattr(field, 'file'):
+            return error('No image file provided', 400)
+        if not field.filename:
+            return error('No selected file', 400)
+        if not allowed_file(field.filename):
+            return error('Invalid file type', 400)
+
+        diagnosis_data = await asyncio.get_running_loop().run_in_executor(
+            INFERENCE_EXECUTOR, scan_upload, FileStorage(stream=field.file, filename=field.filename))
+        return fast_response({'success': True, 'diagnosisData': diagnosis_data})
+
+    except web.HTTPRequestEntityTooLarge:
+        return error('File too large', 413)
+    except Exception as e:
+        return error(str(e), 500)
+
+
+@token_required
+async def get_reports(request):
+    """Get a page of reports for the authenticated user (?limit=&after=)"""
+    try:
+        try:
+            limit = int(request.query['limit']) if 'limit' in request.query else None
+        except ValueError:
+            limit = None
+        if limit is not None and limit < 1:
+            return error('limit must be positive', 400)
+        limit = min(limit or REPORTS_PAGE_SIZE, REPORTS_MAX_PAGE_SIZE)
+
+        params = [request['user_id']]
+        keyset = ""
+        after = request.query.get('after')
+        if after:
+            try:
+                params.extend(decode_cursor(after))
+            except ValueError:
+                return error('Invalid cursor', 400)
+            keyset = "AND (created_at, id) < ($2, $3)"
+        # One extra row tells us whether there is a next page
+        params.append(limit + 1)
+
+        rows = await adb.fetch(f"""
+            SELECT id, image_path, is_healthy, disease_name,
+                   confidence_score, created_at, disease_key, catalog_version
+            FROM disease_reports
+            WHERE user_id = $1 {keyset}
+            ORDER BY created_at DESC, id DESC
+            LIMIT ${len(params)}
+        """, *params)
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1][5], rows[-1][0])
+
+        return web.json_response({
+            'success': True,
+            'reports': [format_report_list_item(row) for row in rows],
+            'nextCursor': next_cursor
+        })
+
+    except Exception as e:
+        print(f"Error fetching reports: {e}")
+        return error('Failed to fetch reports', 500)
+
+
+@token_required
+async def get_report(request):
+    """Get specific report"""
+    try:
+        report_id = request.match_info['report_id']
+        row = None
+        if report_id.isdigit():
+            row = await adb.fetchrow("""
+                SELECT id, image_path, is_healthy, disease_name, confidence_score,
+                       diagnosis_details, treatment_tips, created_at,
+                       disease_key, catalog_version
+                FROM disease_reports
+                WHERE id = $1 AND user_id = $2
+            """, int(report_id), request['user_id'])
+        if not row:
+            return error('Report not found', 404)
+
+        return fast_response({'success': True, 'diagnosisData': format_report_details(row)})
+
+    except Exception as e:
+        print(f"Error getting report details: {e}")
+        return error('Failed to get report details', 404)
+
+
+# ==================== Ratings Routes ====================
+
+@token_required
+async def submit_rating(request):
+    """Submit user rating and feedback"""
+    try:
+        data = await request.json()
+        rating = data.get('rating')
+        feedback = data.get('feedback', '')
+
+        # Validate rating
+        if not rating or not isinstance(rating, int) or rating < 1 or rating > 5:
+            return error('Rating must be between 1 and 5', 400)
+
+        # Insert rating and bump the summary count in one transaction
+        async with adb.transaction() as conn:
+            rating_id = await adb.fetchval("""
+                INSERT INTO ratings (user_id, rating, feedback)
+                VALUES ($1, $2, $3)
+                RETURNING id
+            """, request['user_id'], rating, feedback, conn=conn)
+            await adb.execute("""
+                INSERT INTO ratings_summary (rating, count)
+                VALUES ($1, 1)
+                ON CONFLICT (rating) DO UPDATE SET count = ratings_summary.count + 1
+            """, rating, conn=conn)
+
+        return web.json_response({
+            'success': True,
+            'message': 'Rating submitted successfully',
+            'rating_id': rating_id
+        }, status=201)
+
+    except Exception as e:
+        print(f"❌ Error submitting rating: {e}")
+        return error(str(e), 500)
+
+
+@token_required
+async def get_ratings(request):
+    """Get a page of ratings, newest first (?limit=&after=)"""
+    try:
+        try:
+            limit = int(request.query['limit']) if 'limit' in request.query else None
+        except ValueError:
+            limit = None
+        if limit is not None and limit < 1:
+            return error('limit must be positive', 400)
+        limit = min(limit or RATINGS_PAGE_SIZE, RATINGS_MAX_PAGE_SIZE)
+
+        params = []
+        keyset = ""
+        after = request.query.get('after')
+        if after:
+            try:
+                params.extend(decode_cursor(after))
+            except ValueError:
+                return error('Invalid cursor', 400)
+            keyset = "WHERE (r.created_at, r.id) < ($1, $2)"
+        # One extra row tells us whether there is a next page
+        params.append(limit + 1)
+
+        rows = await adb.fetch(f"""
+            SELECT r.id, r.rating, r.feedback, r.created_at,
+                   u.name, u.surname
+            FROM ratings r
+            JOIN users u ON r.user_id = u.id
+            {keyset}
+            ORDER BY r.created_at DESC, r.id DESC
+            LIMIT ${len(params)}
+        """, *params)
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1][3], rows[-1][0])
+
+        ratings = [{
+            'id': row[0],
+            'rating': row[1],
+            'feedback': row[2],
+            'created_at': row[3].isoformat() if row[3] else None,
+            'name': row[4],
+            'surname': row[5]
+        } for row in rows]
+
+        return web.json_response({
+            'success': True,
+            'ratings': ratings,
+            'count': len(ratings),
+            'nextCursor': next_cursor
+        })
+
+    except Exception as e:
+        print(f"❌ Error fetching ratings: {e}")
+        return error(str(e), 500)
+
+
+@token_required
+async def get_ratings_summary(request):
+    """Average rating, count and 1-5 histogram from the running aggregate"""
+    try:
+        rows = await adb.fetch("SELECT rating, count FROM ratings_summary")
+
+        histogram = {str(star): 0 for star in range(1, 6)}
+        for star, count in rows:
+            histogram[str(star)] = count
+        total = sum(histogram.values())
+        average = sum(int(star) * count for star, count in histogram.items()) / total if total else 0
+
+        return web.json_response({
+            'success': True,
+            'summary': {
+                'average': round(average, 2),
+                'count': total,
+                'histogram': histogram
+            }
+        })
+
+    except Exception as e:
+        print(f"❌ Error fetching ratings summary: {e}")
+        return error(str(e), 500)
+
+
+# ==================== Application ====================
+
+async def on_startup(application):
+    await adb.connect()
+
+
+async def on_cleanup(application):
+    await adb.close()
+    WSGI_EXECUTOR.shutdown(wait=False)
+    INFERENCE_EXECUTOR.shutdown(wait=False)
+
+
+def create_app():
+    """aiohttp application serving every route of app.py"""
+    application = web.Application(
+        middlewares=[cors_middleware, metrics_middleware],
+        # Only /api/scan/batch (scan_batch) raises this
+        client_max_size=flask_app.config['MAX_CONTENT_LENGTH']
+    )
+    router = application.router
+    router.add_get('/api/health', health_check)
+    router.add_post('/api/auth/send-registration-otp', send_registration_otp)
+    router.add_post('/api/auth/register', register)
+    router.add_post('/api/auth/resend-otp', resend_otp)
+    router.add_post('/api/auth/send-login-otp', send_login_otp)
+    router.add_post('/api/auth/login', login)
+    router.add_get('/api/user/profile', get_profile)
+    router.add_put('/api/user/profile', update_profile)
+    router.add_post('/api/scan/upload', upload_scan)
+    router.add_post('/api/scan/batch', scan_batch)
+    router.add_get('/api/reports', get_reports)
+    router.add_get('/api/reports/{report_id}', get_report)
+    router.add_post('/api/ratings', submit_rating)
+    router.add_get('/api/ratings', get_ratings)
+    router.add_get('/api/ratings/summary', get_ratings_summary)
+
+    # Everything else (and other methods on the paths above) goes to Flask
+    router.add_route('*', '/{tail:.*}', wsgi_bridge)
+
+    application.on_startup.append(on_startup)
+    application.on_cleanup.append(on_cleanup)
+    return application
+
+
+if __name__ == '__main__':
+    port = int(os.environ.get('PORT', 5000))
+
+    print("\n" + "="*50)
+    print("GrowGuardians Backend Server (asyncio)")
+    print("="*50)
+    print(f"Server running on: http://0.0.0.0:{port}")
+    print(f"Database: {os.getenv('DB_NAME', 'growguardians')}")
+    print(f"Model path: {os.getenv('MODEL_PATH')}")
+    print("="*50 + "\n")
+
+    web.run_app(create_app(), host='0.0.0.0', port=port, print=None)
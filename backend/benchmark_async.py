@@ -0,0 +1,156 @@
+"""
+Side-by-side load benchmark of the WSGI (gunicorn + Flask) and asyncio
+(aiohttp + asyncpg) deployments.
+
+Drives both servers with the same asyncio client, so thousands of open
+connections cost the client almost nothing. Start both against the same
+database and SECRET_KEY, e.g.:
+
+    SMS_BACKEND=fake gunicorn --bind 0.0.0.0:5000 --workers 2 --threads 16 wsgi:app
+    SMS_BACKEND=fake gunicorn 'app_async:create_app()' --worker-class aiohttp.GunicornWebWorker \\
+        --bind 0.0.0.0:5001 --workers 2
+    python benchmark_async.py --concurrency 50,200,1000 --duration 10
+
+Use FAKE_SMS_LATENCY_MS or a slow database to see how each mode behaves
+when requests spend their time waiting rather than computing. Run the
+client on another machine (or watch its CPU) at high concurrency.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import aiohttp
+
+from benchmark_load import ensure_user
+
+WSGI_URL = "http://localhost:5000/api"
+ASYNC_URL = "http://localhost:5001/api"
+
+
+def make_flows(base_url):
+    """Request coroutines per flow: flow(session, user) -> ok"""
+    async def profile(session, user):
+        async with session.get(f"{base_url}/user/profile",
+                               headers={"Authorization": f"Bearer {user[1]}"}) as response:
+            await response.read()
+            return response.status == 200
+
+    async def reports(session, user):
+        async with session.get(f"{base_url}/reports",
+                               headers={"Authorization": f"Bearer {user[1]}"}) as response:
+            await response.read()
+            return response.status == 200
+
+    async def login(session, user):
+        async with session.post(f"{base_url}/auth/send-login-otp",
+                                json={"mobileNumber": user[0]}) as response:
+            if response.status != 200:
+                return False
+            otp_code = (await response.json()).get('otp')
+        async with session.post(f"{base_url}/auth/login",
+                                json={"mobileNumber": user[0], "otpCode": otp_code}) as response:
+            await response.read()
+            return response.status == 200
+
+    async def health(session, user):
+        async with session.get(f"{base_url}/health") as response:
+            await response.read()
+            return response.status == 200
+
+    return {'profile': profile, 'reports': reports, 'login': login, 'health': health}
+
+
+async def run_level(flow, users, concurrency, duration, timeout):
+    """Run `concurrency` client tasks calling flow() for `duration` seconds"""
+    latencies = []
+    errors = 0
+    stop_at = time.perf_counter() + duration
+    connector = aiohttp.TCPConnector(limit=0)
+    client_timeout = aiohttp.ClientTimeout(total=timeout)
+
+    async with aiohttp.ClientSession(connector=connector, timeout=client_timeout) as session:
+        async def client(user):
+            nonlocal errors
+            while time.perf_counter() < stop_at:
+                start = time.perf_counter()
+                try:
+                    ok = await flow(session, user)
+                except (aiohttp.ClientError, asyncio.TimeoutError):
+                    ok = False
+                latencies.append(time.perf_counter() - start)
+                if not ok:
+                    errors += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(client(users[i % len(users)]) for i in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'concurrency': concurrency,
+        'requests': len(latencies),
+        'errors': errors,
+        'throughput': len(latencies) / elapsed if elapsed else 0,
+        'p50_ms': statistics.median(latencies) * 1000 if latencies else 0,
+        'p99_ms': latencies[int(len(latencies) * 0.99) - 1] * 1000 if latencies else 0
+    }
+
+
+def print_results(title, rows):
+    print("\n" + "="*78)
+    print(f" {title}")
+    print("="*78)
+    print(f"{'':>6} | {'WSGI':^33} | {'asyncio':^33}")
+    print(f"{'conc':>6} | {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'errors':>6} | "
+          f"{'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'errors':>6}")
+    for wsgi, asgi in rows:
+        print(f"{wsgi['concurrency']:>6} | "
+              f"{wsgi['throughput']:>8.1f} {wsgi['p50_ms']:>8.1f} {wsgi['p99_ms']:>8.1f} {wsgi['errors']:>6} | "
+              f"{asgi['throughput']:>8.1f} {asgi['p50_ms']:>8.1f} {asgi['p99_ms']:>8.1f} {asgi['errors']:>6}")
+
+
+async def run(args):
+    levels = [int(level) for level in args.concurrency.split(',')]
+    flows = [flow.strip() for flow in args.flows.split(',')]
+    servers = {
+        'wsgi': make_flows(args.wsgi_url.rstrip('/')),
+        'async': make_flows(args.async_url.rstrip('/'))
+    }
+
+    users = [None]
+    if any(flow != 'health' for flow in flows):
+        print(f"Preparing {args.users} benchmark users...")
+        users = [ensure_user(args.wsgi_url.rstrip('/'), i) for i in range(args.users)]
+
+    for flow in flows:
+        rows = []
+        for concurrency in levels:
+            wsgi = await run_level(servers['wsgi'][flow], users, concurrency,
+                                   args.duration, args.timeout)
+            asgi = await run_level(servers['async'][flow], users, concurrency,
+                                   args.duration, args.timeout)
+            rows.append((wsgi, asgi))
+        print_results(flow, rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--wsgi-url', default=WSGI_URL)
+    parser.add_argument('--async-url', default=ASYNC_URL)
+    parser.add_argument('--concurrency', default='50,200,1000',
+                        help='comma separated numbers of open connections')
+    parser.add_argument('--duration', type=float, default=10,
+                        help='seconds per level and server')
+    parser.add_argument('--flows', default='profile,reports,login',
+                        help='comma separated: profile, reports, login, health')
+    parser.add_argument('--users', type=int, default=50,
+                        help='benchmark users shared by the clients')
+    parser.add_argument('--timeout', type=float, default=30,
+                        help='seconds before a request counts as an error')
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
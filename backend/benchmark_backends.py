@@ -0,0 +1,86 @@
+"""
+Accuracy-vs-latency comparison of the inference backends.
+
+Runs every sample image through the eager float32 model and through each
+exported backend (see convert_model.py), then reports per backend how often
+its top-1 class matches float32, the largest probability drift, and
+single-image latency.
+
+    python benchmark_backends.py --samples samples/ --backends torchscript,int8_dynamic,int8_static,onnx
+"""
+import argparse
+import statistics
+import time
+import warnings
+
+import torch
+
+from convert_model import load_images
+from model_runtime import get_model_path, load_checkpoint_model, load_exported_model, predict_probabilities
+
+
+def evaluate(model, tensors, repeats):
+    """Probabilities per sample and per-call latencies in seconds"""
+    predict_probabilities(model, tensors[0])  # warm up
+    outputs = []
+    latencies = []
+    for tensor in tensors:
+        for _ in range(repeats):
+            start = time.perf_counter()
+            probabilities = predict_probabilities(model, tensor)[0]
+            latencies.append(time.perf_counter() - start)
+        outputs.append(probabilities)
+    return outputs, sorted(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--samples', help='directory of sample leaf images')
+    parser.add_argument('--limit', type=int, default=100, help='max sample images')
+    parser.add_argument('--random', type=int, default=0,
+                        help='use N random tensors instead of images (latency only)')
+    parser.add_argument('--backends', default='torchscript,int8_dynamic,int8_static,onnx')
+    parser.add_argument('--repeats', type=int, default=3, help='timed runs per sample')
+    parser.add_argument('--threads', type=int, default=0)
+    args = parser.parse_args()
+
+    warnings.filterwarnings('ignore')
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+    tensors = load_images(args.samples, args.limit)
+    if not tensors and args.random:
+        tensors = [torch.randn(1, 3, 224, 224) for _ in range(args.random)]
+    if not tensors:
+        raise SystemExit("No samples: pass --samples DIR or --random N")
+
+    reference = load_checkpoint_model(get_model_path())
+    if reference is None:
+        raise SystemExit(1)
+    reference = reference.cpu().eval()
+
+    results = [('eager', *evaluate(reference, tensors, args.repeats))]
+    for backend in [b.strip() for b in args.backends.split(',') if b.strip()]:
+        model = load_exported_model(backend)
+        if model is None:
+            continue
+        results.append((backend, *evaluate(model, tensors, args.repeats)))
+
+    baseline = results[0][1]
+    print("\n" + "="*78)
+    print(f" {len(tensors)} samples, {torch.get_num_threads()} torch threads")
+    print("="*78)
+    print(f"{'backend':<14} {'top-1 match':>12} {'max |dp|':>9} {'p50 ms':>8} {'p99 ms':>8} {'speedup':>8}")
+    eager_p50 = statistics.median(results[0][2])
+    for backend, outputs, latencies in results:
+        matches = sum(int(out.argmax()) == int(ref.argmax()) for out, ref in zip(outputs, baseline))
+        drift = max(float((out - ref).abs().max()) for out, ref in zip(outputs, baseline))
+        p50 = statistics.median(latencies)
+        p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+        print(f"{backend:<14} {matches / len(outputs) * 100:>11.1f}% {drift:>9.4f} "
+              f"{p50 * 1000:>8.1f} {p99 * 1000:>8.1f} {eager_p50 / p50:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
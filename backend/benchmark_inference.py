@@ -0,0 +1,93 @@
+"""
+Batch-size tuning benchmark for the dynamic inference batcher.
+
+Runs the ResNet50 model in-process (the checkpoint from MODEL_PATH, or a
+randomly initialised network with the same shape if none is found) and
+drives it from many concurrent callers for each candidate max batch size.
+Prints throughput and p50/p99 latency per batch size actually formed.
+
+    python benchmark_inference.py --batch-sizes 1,2,4,8,16 --clients 16
+"""
+import argparse
+import threading
+import time
+
+import torch
+
+from inference_batcher import InferenceBatcher, InferenceStats
+
+
+def build_model():
+    from disease_detection import get_model
+    model = get_model()
+    if model is not None:
+        return model
+
+    from torchvision import models
+    print("⚠️ No checkpoint loaded, benchmarking a randomly initialised ResNet50")
+    model = models.resnet50(weights=None)
+    model.fc = torch.nn.Linear(model.fc.in_features, 4)
+    return model.eval()
+
+
+def run(model, max_batch_size, max_wait_ms, clients, requests_per_client):
+    stats = InferenceStats()
+    batcher = InferenceBatcher(model, max_batch_size=max_batch_size,
+                               max_wait_ms=max_wait_ms, stats=stats)
+    sample = torch.randn(1, 3, 224, 224)
+
+    # Warm up so one-off allocation costs don't skew the first batches
+    batcher.predict(sample)
+    stats.reset()
+
+    def client():
+        for _ in range(requests_per_client):
+            batcher.predict(sample)
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    return clients * requests_per_client / elapsed, stats.snapshot()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--batch-sizes', default='1,2,4,8,16')
+    parser.add_argument('--max-wait-ms', type=float, default=5)
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--requests', type=int, default=8,
+                        help='requests per client per batch size')
+    parser.add_argument('--threads', type=int, default=0,
+                        help='torch intra-op threads (0 = torch default)')
+    args = parser.parse_args()
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+    model = build_model()
+
+    print("\n" + "="*78)
+    print(f" Dynamic batching: {args.clients} clients, max wait {args.max_wait_ms} ms, "
+          f"{torch.get_num_threads()} torch threads")
+    print("="*78)
+    print(f"{'max batch':>9} {'overall img/s':>14} | {'batch':>5} {'batches':>8} "
+          f"{'img/s':>8} {'p50 ms':>8} {'p99 ms':>8}")
+
+    for max_batch_size in [int(b) for b in args.batch_sizes.split(',')]:
+        overall, snapshot = run(model, max_batch_size, args.max_wait_ms,
+                                args.clients, args.requests)
+        for i, row in enumerate(snapshot):
+            prefix = f"{max_batch_size:>9} {overall:>14.1f}" if i == 0 else " " * 24
+            print(f"{prefix} | {row['batch_size']:>5} {row['batches']:>8} "
+                  f"{row['images_per_second']:>8.1f} {row['latency_p50_ms']:>8.1f} "
+                  f"{row['latency_p99_ms']:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Microbenchmark of response serialization for /api/scan/upload and
+/api/reports/<id>: Flask's jsonify over plain catalog lists against
+fast_json splicing the pre-encoded catalog fragments.
+
+    python benchmark_json.py --iterations 50000
+"""
+import argparse
+import json
+import time
+
+from flask import Flask, jsonify
+
+import fast_json
+from disease_catalog import DISEASE_INFO, CATALOG_VERSION, lookup, lookup_encoded
+
+DATE = '2025-01-01T12:00:00.000000'
+
+
+def scan_payload(entry, disease_key):
+    """/api/scan/upload body built from a catalog entry (plain or encoded)"""
+    return {
+        'success': True,
+        'diagnosisData': {
+            'image': f"/uploads/ab/cd/{'0' * 64}.jpg",
+            'imagePath': f"uploads/ab/cd/{'0' * 64}.jpg",
+            'isHealthy': disease_key == 'healthy',
+            'diseaseName': entry['name'],
+            'confidence': 97.53,
+            'diagnosisPoints': entry['diagnosis'],
+            'tipsPoints': entry['tips'],
+            'date': DATE
+        }
+    }
+
+
+def report_payload(entry, disease_key):
+    """/api/reports/<id> body built from a catalog entry (plain or encoded)"""
+    return {
+        'success': True,
+        'diagnosisData': {
+            'id': '12345',
+            'image': f"/uploads/ab/cd/{'0' * 64}.jpg?size=preview",
+            'imageOriginal': f"/uploads/ab/cd/{'0' * 64}.jpg",
+            'isHealthy': disease_key == 'healthy',
+            'diseaseName': entry['name'],
+            'diagnosisPoints': entry['diagnosis'],
+            'tipsPoints': entry['tips'],
+            'date': DATE
+        }
+    }
+
+
+def time_path(make_response, payloads, iterations):
+    """Microseconds per response"""
+    start = time.perf_counter()
+    for i in range(iterations):
+        make_response(payloads[i % len(payloads)])
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=50000,
+                        help='responses built per route and path')
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    keys = list(DISEASE_INFO)
+
+    def jsonify_response(payload):
+        return jsonify(payload).get_data()
+
+    def fast_response(payload):
+        return app.response_class(fast_json.dumps(payload), mimetype='application/json').get_data()
+
+    encoder = 'orjson' if fast_json.orjson is not None else 'json'
+    print("\n" + "="*60)
+    print(f" Response serialization ({args.iterations} responses, fast_json uses {encoder})")
+    print("="*60)
+    print(f"{'route':>16} {'step':>9} | {'jsonify us':>10} {'fast us':>8} {'speedup':>8}")
+
+    with app.app_context():
+        for route, build in (('scan/upload', scan_payload), ('reports/<id>', report_payload)):
+            plain = [build(lookup(key, CATALOG_VERSION), key) for key in keys]
+            encoded = [build(lookup_encoded(key, CATALOG_VERSION), key) for key in keys]
+
+            # Both paths must produce the same document
+            for a, b in zip(plain, encoded):
+                assert json.loads(jsonify_response(a)) == json.loads(fast_response(b))
+
+            for step, slow_path, fast_path in (
+                    ('encode', app.json.dumps, fast_json.dumps),
+                    ('response', jsonify_response, fast_response)):
+                slow = time_path(slow_path, plain, args.iterations)
+                fast = time_path(fast_path, encoded, args.iterations)
+                print(f"{route:>16} {step:>9} | {slow:>10.2f} {fast:>8.2f} {slow / fast:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
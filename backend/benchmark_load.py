@@ -0,0 +1,159 @@
+"""
+Load benchmark for the database-backed endpoints.
+
+Measures throughput of GET /api/reports, POST /api/auth/send-login-otp
+and the full OTP login flow (send-login-otp + login) as the number of
+concurrent clients grows. Run against a live backend, e.g.:
+
+    SMS_BACKEND=fake FAKE_SMS_LATENCY_MS=800 gunicorn --bind 0.0.0.0:5000 --threads 16 wsgi:app
+    python benchmark_load.py --clients 1,2,4,8,16 --duration 10
+
+Compare SMS_DELIVERY=sync and SMS_DELIVERY=async to see the effect of the
+background SMS queue on send-otp latency.
+"""
+import argparse
+import statistics
+import threading
+import time
+
+import requests
+
+BASE_URL = "http://localhost:5000/api"
+
+
+def ensure_user(base_url, index):
+    """Register (or log in) a benchmark user and return its JWT token"""
+    mobile_number = f"0399{index:07d}"
+    session = requests.Session()
+
+    response = session.post(f"{base_url}/auth/send-registration-otp",
+                            json={"mobileNumber": mobile_number})
+    if response.status_code == 200:
+        response = session.post(f"{base_url}/auth/register", json={
+            "name": "Bench",
+            "surname": f"User{index}",
+            "mobileNumber": mobile_number,
+            "tehsil": "Benchmark",
+            "otpCode": response.json().get('otp')
+        })
+        if response.status_code == 201:
+            return mobile_number, response.json()['token']
+
+    token = login_once(session, base_url, mobile_number)
+    if not token:
+        raise RuntimeError(f"Could not register or log in {mobile_number}")
+    return mobile_number, token
+
+
+def login_once(session, base_url, mobile_number):
+    """Run the two-step OTP login flow, returning the token or None"""
+    response = session.post(f"{base_url}/auth/send-login-otp",
+                            json={"mobileNumber": mobile_number})
+    if response.status_code != 200:
+        return None
+    response = session.post(f"{base_url}/auth/login", json={
+        "mobileNumber": mobile_number,
+        "otpCode": response.json().get('otp')
+    })
+    if response.status_code != 200:
+        return None
+    return response.json().get('token')
+
+
+def run_level(worker, users, clients, duration):
+    """Run `clients` threads calling worker() for `duration` seconds"""
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    stop_at = time.perf_counter() + duration
+
+    def client(user):
+        session = requests.Session()
+        local_latencies = []
+        local_errors = 0
+        while time.perf_counter() < stop_at:
+            start = time.perf_counter()
+            ok = worker(session, user)
+            local_latencies.append(time.perf_counter() - start)
+            if not ok:
+                local_errors += 1
+        with lock:
+            latencies.extend(local_latencies)
+            errors[0] += local_errors
+
+    threads = [threading.Thread(target=client, args=(users[i % len(users)],))
+               for i in range(clients)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'clients': clients,
+        'requests': len(latencies),
+        'errors': errors[0],
+        'throughput': len(latencies) / elapsed if elapsed else 0,
+        'p50_ms': statistics.median(latencies) * 1000 if latencies else 0,
+        'p99_ms': latencies[int(len(latencies) * 0.99) - 1] * 1000 if latencies else 0
+    }
+
+
+def print_results(title, results):
+    print("\n" + "="*60)
+    print(f" {title}")
+    print("="*60)
+    print(f"{'clients':>8} {'requests':>9} {'errors':>7} {'req/s':>9} {'p50 ms':>9} {'p99 ms':>9}")
+    for r in results:
+        print(f"{r['clients']:>8} {r['requests']:>9} {r['errors']:>7} "
+              f"{r['throughput']:>9.1f} {r['p50_ms']:>9.1f} {r['p99_ms']:>9.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--base-url', default=BASE_URL)
+    parser.add_argument('--clients', default='1,2,4,8,16',
+                        help='comma separated concurrency levels')
+    parser.add_argument('--duration', type=float, default=10,
+                        help='seconds per concurrency level')
+    parser.add_argument('--flows', default='reports,send-otp,login',
+                        help='comma separated: reports, send-otp, login')
+    args = parser.parse_args()
+
+    levels = [int(level) for level in args.clients.split(',')]
+    flows = [flow.strip() for flow in args.flows.split(',')]
+    base_url = args.base_url.rstrip('/')
+
+    print(f"Preparing {max(levels)} benchmark users...")
+    users = [ensure_user(base_url, i) for i in range(max(levels))]
+
+    def reports(session, user):
+        response = session.get(f"{base_url}/reports",
+                               headers={"Authorization": f"Bearer {user[1]}"})
+        return response.status_code == 200
+
+    def send_otp(session, user):
+        response = session.post(f"{base_url}/auth/send-login-otp",
+                                json={"mobileNumber": user[0]})
+        return response.status_code == 200
+
+    def login(session, user):
+        return login_once(session, base_url, user[0]) is not None
+
+    if 'reports' in flows:
+        print_results("GET /api/reports",
+                      [run_level(reports, users, n, args.duration) for n in levels])
+    if 'send-otp' in flows:
+        print_results("POST /api/auth/send-login-otp",
+                      [run_level(send_otp, users, n, args.duration) for n in levels])
+    if 'login' in flows:
+        # Each login is two requests (send OTP + verify), counted as one flow
+        print_results("OTP login flow (/api/auth/send-login-otp + /api/auth/login)",
+                      [run_level(login, users, n, args.duration) for n in levels])
+
+
+if __name__ == "__main__":
+    main()
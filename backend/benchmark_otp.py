@@ -0,0 +1,100 @@
+"""
+OTP store benchmark.
+
+Runs the login OTP flow (OTPService.send_otp + OTPService.verify_otp)
+in-process against each OTP store backend at several thread counts and
+reports flows per second. SMS go to the fake sink so only the store is
+measured. The postgres backend needs the database from .env.
+
+    python benchmark_otp.py --backends memory,postgres --threads 1,4,16 --duration 5
+"""
+import argparse
+import contextlib
+import io
+import os
+import statistics
+import threading
+import time
+
+os.environ.setdefault('SMS_BACKEND', 'fake')
+
+import otp_service  # noqa: E402
+from database import db  # noqa: E402
+from otp_service import OTPService  # noqa: E402
+from otp_store import create_otp_store  # noqa: E402
+
+
+def run_level(threads, duration):
+    """`threads` clients running send+verify for `duration` seconds"""
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    stop_at = time.perf_counter() + duration
+
+    def client(index):
+        mobile_number = f"0398{index:07d}"
+        local_latencies = []
+        local_errors = 0
+        while time.perf_counter() < stop_at:
+            start = time.perf_counter()
+            sent = OTPService.send_otp(mobile_number, 'login')
+            ok = sent['success'] and OTPService.verify_otp(
+                mobile_number, sent['otp'], 'login')['success']
+            local_latencies.append(time.perf_counter() - start)
+            if not ok:
+                local_errors += 1
+        db.release()
+        with lock:
+            latencies.extend(local_latencies)
+            errors[0] += local_errors
+
+    workers = [threading.Thread(target=client, args=(i,)) for i in range(threads)]
+    started = time.perf_counter()
+    # send_otp prints a banner per OTP; keep it out of the measurement
+    with contextlib.redirect_stdout(io.StringIO()):
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'threads': threads,
+        'flows': len(latencies),
+        'errors': errors[0],
+        'throughput': len(latencies) / elapsed if elapsed else 0,
+        'p50_ms': statistics.median(latencies) * 1000 if latencies else 0,
+        'p99_ms': latencies[int(len(latencies) * 0.99) - 1] * 1000 if latencies else 0
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--backends', default='memory,postgres')
+    parser.add_argument('--threads', default='1,4,16',
+                        help='comma separated thread counts')
+    parser.add_argument('--duration', type=float, default=5,
+                        help='seconds per thread count')
+    args = parser.parse_args()
+
+    levels = [int(level) for level in args.threads.split(',')]
+    for backend in [b.strip() for b in args.backends.split(',') if b.strip()]:
+        otp_service.OTP_STORE = create_otp_store(backend)
+        if backend == 'postgres' and not db.connect():
+            print("❌ Skipping postgres: database not reachable")
+            continue
+
+        print("\n" + "="*60)
+        print(f" OTP login flow, OTP_STORE={backend}")
+        print("="*60)
+        print(f"{'threads':>8} {'flows':>9} {'errors':>7} {'flows/s':>9} {'p50 ms':>9} {'p99 ms':>9}")
+        for level in levels:
+            r = run_level(level, args.duration)
+            print(f"{r['threads']:>8} {r['flows']:>9} {r['errors']:>7} "
+                  f"{r['throughput']:>9.1f} {r['p50_ms']:>9.2f} {r['p99_ms']:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
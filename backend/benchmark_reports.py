@@ -0,0 +1,133 @@
+"""
+Compare reading legacy reports (text stored as JSON in every row) with
+compact reports (disease_key + catalog_version resolved from
+disease_catalog.py).
+
+Without --db only the decode step is measured, on synthetic rows for every
+catalog entry. With --db a sample of saved reports of each kind is read
+through the same query as GET /api/reports/<id>, and the size of the
+disease_reports table is printed:
+
+    python benchmark_reports.py --iterations 100000
+    python benchmark_reports.py --db --samples 500
+"""
+import argparse
+import json
+import statistics
+import time
+from datetime import datetime
+
+from disease_catalog import DISEASE_INFO, CATALOG_VERSION, table_size
+from disease_detection import format_report_details
+
+DETAIL_QUERY = """
+    SELECT id, image_path, is_healthy, disease_name, confidence_score,
+           diagnosis_details, treatment_tips, created_at,
+           disease_key, catalog_version
+    FROM disease_reports
+    WHERE id = %s
+"""
+
+
+def synthetic_rows():
+    """(legacy rows, compact rows) with one row per catalog entry"""
+    created_at = datetime.now()
+    legacy, compact = [], []
+    for i, (key, entry) in enumerate(DISEASE_INFO.items()):
+        image_path = f"uploads/ab/cd/{i:064x}.jpg"
+        legacy.append((i, image_path, key == 'healthy', entry['name'], 97.5,
+                       json.dumps(entry['diagnosis']), json.dumps(entry['tips']),
+                       created_at, None, None))
+        compact.append((i, image_path, key == 'healthy', None, 97.5,
+                        None, None, created_at, key, CATALOG_VERSION))
+    return legacy, compact
+
+
+def row_bytes(row):
+    """Bytes of the text columns a row carries"""
+    return sum(len(value.encode()) for value in (row[3], row[5], row[6], row[8]) if value)
+
+
+def time_decode(rows, iterations):
+    """Microseconds per format_report_details() call"""
+    start = time.perf_counter()
+    for i in range(iterations):
+        format_report_details(rows[i % len(rows)])
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def run_offline(args):
+    legacy, compact = synthetic_rows()
+    print("\n" + "="*60)
+    print(f" Report decode ({args.iterations} rows, {len(legacy)} catalog entries)")
+    print("="*60)
+    print(f"{'layout':>8} | {'us/row':>8} {'text bytes/row':>15}")
+    for name, rows in (('legacy', legacy), ('compact', compact)):
+        micros = time_decode(rows, args.iterations)
+        size = statistics.mean(row_bytes(row) for row in rows)
+        print(f"{name:>8} | {micros:>8.2f} {size:>15.0f}")
+
+
+def time_reads(cursor, report_ids):
+    """Per-read milliseconds of the detail query plus decoding"""
+    latencies = []
+    for report_id in report_ids:
+        start = time.perf_counter()
+        cursor.execute(DETAIL_QUERY, (report_id,))
+        format_report_details(cursor.fetchone())
+        latencies.append((time.perf_counter() - start) * 1000)
+    latencies.sort()
+    return latencies
+
+
+def run_db(args):
+    from database import db
+    if not db.connect():
+        raise SystemExit(1)
+
+    with db.session() as conn:
+        cursor = conn.cursor()
+        size = table_size(cursor)
+        print("\n" + "="*60)
+        print(" disease_reports table")
+        print("="*60)
+        print(f"   {size['rows']} rows, {size['total_bytes'] / 1024:.1f} KB on disk, "
+              f"{size['avg_row_bytes']:.0f} bytes per row")
+
+        print(f"\n{'layout':>8} | {'reads':>6} {'p50 ms':>8} {'p99 ms':>8} {'bytes/row':>10}")
+        for name, condition in (('legacy', 'disease_key IS NULL'),
+                                ('compact', 'disease_key IS NOT NULL')):
+            cursor.execute(f"""
+                SELECT id, pg_column_size(r.*) FROM disease_reports AS r
+                WHERE {condition} ORDER BY random() LIMIT %s
+            """, (args.samples,))
+            sample = cursor.fetchall()
+            if not sample:
+                print(f"{name:>8} | {'no rows':>6}")
+                continue
+            latencies = time_reads(cursor, [report_id for report_id, _ in sample])
+            print(f"{name:>8} | {len(latencies):>6} {statistics.median(latencies):>8.3f} "
+                  f"{latencies[int(len(latencies) * 0.99) - 1]:>8.3f} "
+                  f"{statistics.mean(width for _, width in sample):>10.0f}")
+        conn.commit()
+        cursor.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=100000,
+                        help='rows decoded per layout')
+    parser.add_argument('--db', action='store_true',
+                        help='also read saved reports from the configured database')
+    parser.add_argument('--samples', type=int, default=500,
+                        help='reports read per layout with --db')
+    args = parser.parse_args()
+
+    run_offline(args)
+    if args.db:
+        run_db(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,278 @@
+"""
+Round trips and latency of the auth and report-saving flows against a
+local PostgreSQL (DATABASE_URL or DB_* in .env).
+
+Each flow runs three ways:
+  legacy    the statement sequences used before (SELECT, UPDATE, INSERT,
+            COMMIT ... on separate statements)
+  single    the current single-statement CTE / RETURNING versions
+  prepared  the same with server-side prepared statements
+
+A round trip is a statement sent or a COMMIT. Test users are created with
++99 mobile numbers and deleted afterwards:
+
+    python benchmark_roundtrips.py --iterations 500
+"""
+import argparse
+import contextlib
+import hashlib
+import io
+import os
+import statistics
+import time
+
+os.environ['OTP_STORE'] = 'postgres'
+os.environ.setdefault('SMS_BACKEND', 'fake')
+os.environ.setdefault('SMS_DELIVERY', 'sync')
+os.environ.setdefault('MODEL_WARMUP', 'lazy')
+
+import psycopg2
+
+import database
+from database import db, PreparingConnection, TimedCursor
+from otp_service import OTP_STORE, OTP_TTL_SECONDS
+from user_service import UserService
+from disease_detection import DiseaseDetectionService, format_report_details
+from blob_store import BLOBS, BlobStore
+
+OTP_CODE = '1234'
+BLOB_NAME = hashlib.sha256(b'benchmark_roundtrips').hexdigest() + '.jpg'
+
+
+class CountingCursor(TimedCursor):
+    def execute(self, query, vars=None):
+        self.connection.round_trips += 1
+        return super().execute(query, vars)
+
+
+class CountingConnection(PreparingConnection):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.round_trips = 0
+
+    def commit(self):
+        self.round_trips += 1
+        return super().commit()
+
+
+# ==================== Legacy flows ====================
+
+def legacy_send_otp(mobile_number, purpose, registered):
+    """User check, then revoke, insert and commit on separate statements"""
+    conn = db.connection
+    cursor = conn.cursor()
+    cursor.execute("SELECT id FROM users WHERE mobile_number = %s", (mobile_number,))
+    if (cursor.fetchone() is not None) != registered:
+        cursor.close()
+        return False
+    cursor.execute("""
+        UPDATE otp_codes
+        SET is_used = TRUE
+        WHERE mobile_number = %s AND purpose = %s AND is_used = FALSE
+    """, (mobile_number, purpose))
+    cursor.execute("""
+        INSERT INTO otp_codes (mobile_number, otp_code, purpose, expires_at)
+        VALUES (%s, %s, %s, NOW() + make_interval(secs => %s))
+    """, (mobile_number, OTP_CODE, purpose, float(OTP_TTL_SECONDS)))
+    conn.commit()
+    cursor.close()
+    return True
+
+
+def legacy_verify(cursor, mobile_number, purpose):
+    cursor.execute("""
+        SELECT id FROM otp_codes
+        WHERE mobile_number = %s AND otp_code = %s AND purpose = %s
+        AND is_used = FALSE AND expires_at > NOW()
+        ORDER BY created_at DESC
+        LIMIT 1
+    """, (mobile_number, OTP_CODE, purpose))
+    record = cursor.fetchone()
+    if not record:
+        return False
+    cursor.execute("UPDATE otp_codes SET is_used = TRUE WHERE id = %s", (record[0],))
+    db.connection.commit()
+    return True
+
+
+def legacy_register(user_data):
+    cursor = db.connection.cursor()
+    if not legacy_verify(cursor, user_data['mobileNumber'], 'registration'):
+        return None
+    cursor.execute("SELECT id FROM users WHERE mobile_number = %s", (user_data['mobileNumber'],))
+    if cursor.fetchone():
+        return None
+    cursor.execute("""
+        INSERT INTO users (name, surname, mobile_number, email, province,
+                           district, tehsil, village, address)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+        RETURNING id
+    """, (user_data['name'], user_data['surname'], user_data['mobileNumber'], '', '', '',
+          user_data['tehsil'], '', ''))
+    user_id = cursor.fetchone()[0]
+    db.connection.commit()
+    cursor.close()
+    return user_id
+
+
+def legacy_login(mobile_number):
+    cursor = db.connection.cursor()
+    if not legacy_verify(cursor, mobile_number, 'login'):
+        return None
+    cursor.execute("""
+        SELECT id, name, surname, mobile_number, email, province,
+               district, tehsil, village, address
+        FROM users
+        WHERE mobile_number = %s
+    """, (mobile_number,))
+    row = cursor.fetchone()
+    cursor.close()
+    return row
+
+
+def legacy_save_report(user_id, image_path):
+    """INSERT, blob reference and COMMIT, then the details read back"""
+    cursor = db.connection.cursor()
+    cursor.execute("""
+        INSERT INTO disease_reports
+        (user_id, image_path, is_healthy, disease_key, catalog_version, confidence_score)
+        VALUES (%s, %s, %s, %s, %s, %s)
+        RETURNING id
+    """, (user_id, image_path, False, 'brown_spot', 1, 91.5))
+    report_id = cursor.fetchone()[0]
+    BlobStore.add_ref(cursor, BLOB_NAME)
+    db.connection.commit()
+    cursor.execute("""
+        SELECT id, image_path, is_healthy, disease_name, confidence_score,
+               diagnosis_details, treatment_tips, created_at, disease_key, catalog_version
+        FROM disease_reports
+        WHERE id = %s AND user_id = %s
+    """, (report_id, user_id))
+    details = format_report_details(cursor.fetchone())
+    cursor.close()
+    return details
+
+
+# ==================== Runner ====================
+
+def mobile_for(mode_index, i):
+    return f"+99{mode_index}{i:07d}"
+
+
+def user_data_for(mobile_number):
+    return {'mobileNumber': mobile_number, 'name': 'Bench', 'surname': 'Mark', 'tehsil': 'Bench'}
+
+
+def issue(mobile_number, purpose):
+    """Untimed setup: a known OTP for the next verification"""
+    OTP_STORE.issue(mobile_number, purpose, OTP_CODE, OTP_TTL_SECONDS)
+
+
+def run_flow(conn, calls):
+    """(round trips per call, latencies ms) for a list of (setup, call) pairs"""
+    latencies = []
+    trips = 0
+    for setup, call in calls:
+        if setup:
+            setup()
+        before = conn.round_trips
+        start = time.perf_counter()
+        call()
+        latencies.append((time.perf_counter() - start) * 1000)
+        trips += conn.round_trips - before
+    return trips / len(calls), latencies
+
+
+def run_mode(conn, mode, mode_index, iterations):
+    legacy = mode == 'legacy'
+    database.PREPARED_STATEMENTS = mode == 'prepared'
+    mobiles = [mobile_for(mode_index, i) for i in range(iterations)]
+    image_path = BLOBS.path_for(BLOB_NAME)
+    user_ids = {}
+
+    def register(mobile):
+        if legacy:
+            user_ids[mobile] = legacy_register(user_data_for(mobile))
+        else:
+            user_ids[mobile] = UserService.register_user(user_data_for(mobile), OTP_CODE)['user_id']
+
+    flows = {
+        'registration OTP': [
+            (None, (lambda m=m: legacy_send_otp(m, 'registration', False)) if legacy
+             else (lambda m=m: UserService.send_registration_otp(m)))
+            for m in mobiles],
+        'register': [
+            (lambda m=m: issue(m, 'registration'), lambda m=m: register(m))
+            for m in mobiles],
+        'login OTP': [
+            (None, (lambda m=m: legacy_send_otp(m, 'login', True)) if legacy
+             else (lambda m=m: UserService.send_login_otp(m)))
+            for m in mobiles],
+        'login': [
+            (lambda m=m: issue(m, 'login'),
+             (lambda m=m: legacy_login(m)) if legacy else (lambda m=m: UserService.login_user(m, OTP_CODE)))
+            for m in mobiles],
+        'save report': [
+            (None, (lambda m=m: legacy_save_report(user_ids[m], image_path)) if legacy
+             else (lambda m=m: DiseaseDetectionService.save_report(
+                 user_ids[m], image_path,
+                 {'disease_key': 'brown_spot', 'is_healthy': False, 'confidence': 91.5})))
+            for m in mobiles]
+    }
+
+    results = {}
+    with contextlib.redirect_stdout(io.StringIO()):
+        for flow, calls in flows.items():
+            results[flow] = run_flow(conn, calls)
+    return results
+
+
+def cleanup(conn):
+    cursor = conn.cursor()
+    cursor.execute("DELETE FROM users WHERE mobile_number LIKE %s", ('+99%',))
+    cursor.execute("DELETE FROM otp_codes WHERE mobile_number LIKE %s", ('+99%',))
+    cursor.execute("DELETE FROM image_blobs WHERE name = %s", (BLOB_NAME,))
+    conn.commit()
+    cursor.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=200,
+                        help='calls per flow and mode')
+    args = parser.parse_args()
+
+    if not db.connect():
+        raise SystemExit(1)
+    conn = psycopg2.connect(host=db.host, user=db.user, password=db.password,
+                            database=db.database, port=db.port,
+                            connection_factory=CountingConnection, cursor_factory=CountingCursor)
+    db._local.conn = conn  # The services run their statements on this connection
+
+    modes = ('legacy', 'single', 'prepared')
+    try:
+        cleanup(conn)
+        results = {mode: run_mode(conn, mode, index, args.iterations)
+                   for index, mode in enumerate(modes)}
+    finally:
+        conn.rollback()
+        cleanup(conn)
+        db._local.conn = None
+        conn.close()
+
+    print("\n" + "="*78)
+    print(f" Round trips and median latency per call ({args.iterations} calls)")
+    print("="*78)
+    print(f"{'flow':>17} | " + " | ".join(f"{mode:^17}" for mode in modes))
+    print(f"{'':>17} | " + " | ".join(f"{'trips':>7} {'p50 ms':>9}" for _ in modes))
+    for flow in results['legacy']:
+        cells = []
+        for mode in modes:
+            trips, latencies = results[mode][flow]
+            cells.append(f"{trips:>7.1f} {statistics.median(latencies):>9.3f}")
+        print(f"{flow:>17} | " + " | ".join(cells))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Cold-start benchmark.
+
+Starts the backend (python app.py) in a fresh process several times and
+measures how long it takes until /api/health first answers and until it
+reports ready (database schema created and model loaded).
+
+    python benchmark_startup.py --runs 5
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def poll_health(port):
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/api/health", timeout=1) as response:
+            return json.loads(response.read())
+    except (urllib.error.URLError, ConnectionError, OSError):
+        return None
+
+
+def measure(timeout):
+    port = free_port()
+    env = dict(os.environ, PORT=str(port), FLASK_DEBUG='False')
+    started = time.perf_counter()
+    process = subprocess.Popen([sys.executable, 'app.py'], env=env,
+                               cwd=os.path.dirname(os.path.abspath(__file__)),
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    first_response = None
+    ready = None
+    try:
+        while time.perf_counter() - started < timeout:
+            health = poll_health(port)
+            if health is not None:
+                if first_response is None:
+                    first_response = time.perf_counter() - started
+                if health.get('ready'):
+                    ready = time.perf_counter() - started
+                    break
+            time.sleep(0.05)
+    finally:
+        process.terminate()
+        process.wait()
+    return first_response, ready
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--timeout', type=float, default=120)
+    args = parser.parse_args()
+
+    first_responses = []
+    readies = []
+    for run in range(1, args.runs + 1):
+        first_response, ready = measure(args.timeout)
+        print(f"Run {run}: health answered after "
+              f"{first_response if first_response is not None else float('nan'):.2f}s, "
+              f"ready after {ready if ready is not None else float('nan'):.2f}s")
+        if first_response is not None:
+            first_responses.append(first_response)
+        if ready is not None:
+            readies.append(ready)
+
+    print("\n" + "="*60)
+    if first_responses:
+        print(f"Median time to first /api/health response: {statistics.median(first_responses):.2f}s")
+    if readies:
+        print(f"Median time to ready:                      {statistics.median(readies):.2f}s")
+    print("="*60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+"""
+Content-addressed storage for uploaded images.
+
+Blobs are named ``<sha256>.<ext>`` and stored two directory levels deep
+(``uploads/ab/cd/abcd….jpg``), so identical photos are kept once and no
+directory grows without bound. The ``image_blobs`` table counts how many
+reports reference each blob; a blob file is unlinked only when its last
+reference goes away.
+
+Uploads saved before this layout (``{user_id}_{timestamp}_{name}`` in the
+flat upload folder) are still served and deleted as before. Move them into
+the blob store with:
+
+    python blob_store.py --migrate
+"""
+import argparse
+import hashlib
+import os
+import re
+import threading
+import time
+from collections import Counter
+from dotenv import load_dotenv
+
+load_dotenv()
+
+BLOB_NAME = re.compile(r'^[0-9a-f]{64}\.[a-z0-9]+$')
+
+
+class BlobStore:
+    """Image files named by content hash under ``root``"""
+
+    def __init__(self, root, scan_grace=1800):
+        self.root = root
+        # Seconds after an upload during which its scan may still be saved
+        self.scan_grace = scan_grace
+
+    @staticmethod
+    def name_for(image_data, filename, digest=None):
+        """Blob name for ``image_data``; the extension comes from ``filename``"""
+        digest = digest or hashlib.sha256(image_data).hexdigest()
+        ext = os.path.splitext(filename)[1].lower().lstrip('.') or 'bin'
+        return f"{digest}.{ext}"
+
+    @staticmethod
+    def is_blob(name):
+        return bool(BLOB_NAME.match(name))
+
+    def path_for(self, name):
+        """On-disk path of ``name`` (sharded for blobs, flat for legacy uploads)"""
+        name = os.path.basename(name)
+        if self.is_blob(name):
+            return os.path.join(self.root, name[:2], name[2:4], name)
+        return os.path.join(self.root, name)
+
+    def exists(self, name):
+        return os.path.isfile(self.path_for(name))
+
+    def touch(self, name):
+        """Refresh the mtime of ``name`` so orphan collection (maintenance.py)
+        counts its grace period from now; False if it is not on disk"""
+        try:
+            os.utime(self.path_for(name))
+            return True
+        except FileNotFoundError:
+            return False
+
+    def read(self, name):
+        """Bytes of ``name``, or None if it is not on disk"""
+        path = self.path_for(name)
+        if not os.path.isfile(path):
+            return None
+        with open(path, 'rb') as f:
+            return f.read()
+
+    def write(self, name, data):
+        """Write ``data`` under ``name`` unless an identical blob is already stored"""
+        path = self.path_for(name)
+        if self.is_blob(name) and self.touch(name):
+            return path
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        return path
+
+    def unlink(self, name):
+        path = self.path_for(name)
+        if os.path.exists(path):
+            os.remove(path)
+
+    # Reference counts. These run on the caller's cursor so they commit
+    # (or roll back) together with the report rows that hold the reference.
+
+    @staticmethod
+    def add_ref(cursor, name, count=1):
+        cursor.execute("""
+            INSERT INTO image_blobs (name, refcount)
+            VALUES (%s, %s)
+            ON CONFLICT (name) DO UPDATE SET refcount = image_blobs.refcount + EXCLUDED.refcount
+        """, (name, count))
+
+    @staticmethod
+    def release_ref(cursor, name, count=1):
+        """Drop ``count`` references to ``name``.
+
+        Returns True when no reference is left (unlink the file after
+        commit), False while other reports still use it, and None for
+        untracked legacy uploads.
+        """
+        cursor.execute("""
+            UPDATE image_blobs SET refcount = refcount - %s
+            WHERE name = %s
+            RETURNING refcount
+        """, (count, name))
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        if row[0] > 0:
+            return False
+        cursor.execute("DELETE FROM image_blobs WHERE name = %s AND refcount <= 0", (name,))
+        return True
+
+    @staticmethod
+    def release_refs(cursor, names):
+        """release_ref() for many report images in two statements.
+
+        Returns the names with no reference left (including untracked
+        legacy uploads), whose files should be unlinked after commit.
+        """
+        counts = Counter(names)
+        if not counts:
+            return []
+        cursor.execute("""
+            UPDATE image_blobs AS b SET refcount = b.refcount - d.n
+            FROM unnest(%s::text[], %s::int[]) AS d(name, n)
+            WHERE b.name = d.name
+            RETURNING b.name, b.refcount
+        """, (list(counts), list(counts.values())))
+        remaining = dict(cursor.fetchall())
+        released = [name for name, refcount in remaining.items() if refcount <= 0]
+        if released:
+            cursor.execute("DELETE FROM image_blobs WHERE name = ANY(%s) AND refcount <= 0",
+                           (released,))
+        return [name for name in counts if remaining.get(name, 0) <= 0]
+
+    @staticmethod
+    def referenced(cursor, names):
+        """Subset of ``names`` that saved reports reference again"""
+        cursor.execute("SELECT name FROM image_blobs WHERE name = ANY(%s)", (list(names),))
+        return {row[0] for row in cursor.fetchall()}
+
+    def removable(self, cursor, names):
+        """The ``names`` whose files may be unlinked after their last reference
+        was released and committed.
+
+        Skips names that a report references again, and blobs uploaded or
+        scanned again (touch() refreshes the mtime) within ``scan_grace``
+        seconds, whose scan may still be saved. Skipped files that stay
+        unused are removed later by orphan collection (maintenance.py).
+        """
+        keep = self.referenced(cursor, names)
+        cutoff = time.time() - self.scan_grace
+        removable = []
+        for name in names:
+            if name in keep:
+                continue
+            try:
+                if os.stat(self.path_for(name)).st_mtime >= cutoff:
+                    continue
+            except FileNotFoundError:
+                pass
+            removable.append(name)
+        return removable
+
+
+# Shared by the upload routes and report storage
+BLOBS = BlobStore(os.getenv('UPLOAD_FOLDER', 'uploads'),
+                  scan_grace=int(os.getenv('PENDING_UPLOAD_TTL', 1800)))
+
+
+def migrate_legacy_uploads(batch_size=100):
+    """Move flat legacy uploads of saved reports into the blob store"""
+    from database import db
+
+    migrated = 0
+    missing = 0
+    with db.session() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT id, image_path FROM disease_reports ORDER BY id")
+        reports = [(report_id, path) for report_id, path in cursor.fetchall()
+                   if not BlobStore.is_blob(os.path.basename(path))]
+        cursor.close()
+
+        for start in range(0, len(reports), batch_size):
+            cursor = conn.cursor()
+            legacy_files = []
+            for report_id, image_path in reports[start:start + batch_size]:
+                legacy_name = os.path.basename(image_path)
+                data = BLOBS.read(legacy_name)
+                if data is None:
+                    missing += 1
+                    continue
+                name = BlobStore.name_for(data, legacy_name)
+                BLOBS.write(name, data)
+                cursor.execute("UPDATE disease_reports SET image_path = %s WHERE id = %s",
+                               (BLOBS.path_for(name), report_id))
+                BlobStore.add_ref(cursor, name)
+                legacy_files.append(legacy_name)
+                migrated += 1
+            conn.commit()
+            cursor.close()
+
+            # Legacy names are unique per report, so nothing else uses them
+            for legacy_name in legacy_files:
+                BLOBS.unlink(legacy_name)
+
+    print(f"✅ Migrated {migrated} uploads into the blob store ({missing} files missing)")
+    return migrated
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--migrate', action='store_true',
+                        help='move legacy flat uploads into the blob store')
+    parser.add_argument('--batch-size', type=int, default=100)
+    args = parser.parse_args()
+
+    if not args.migrate:
+        parser.print_help()
+        return
+
+    from database import db
+    if not db.connect():
+        raise SystemExit(1)
+    migrate_legacy_uploads(args.batch_size)
+
+
+if __name__ == "__main__":
+    main()
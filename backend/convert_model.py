@@ -0,0 +1,159 @@
+"""
+Convert a best_resnet50.pth checkpoint into the exported inference backends.
+
+Writes one artifact per format next to the checkpoint (or into --output-dir),
+each with a small .json sidecar holding the class names:
+
+    best_resnet50.torchscript.pt    TorchScript, traced and frozen
+    best_resnet50.int8_dynamic.pt   dynamic int8 quantization (Linear layers)
+    best_resnet50.int8_static.pt    static int8 quantization (FX graph mode)
+    best_resnet50.onnx              ONNX, for ONNX Runtime (needs onnx)
+
+int8_static is the int8 backend for this CNN. Dynamic quantization only
+covers nn.Linear, which in ResNet50 is the final fc layer, so the
+convolutions stay float32 and int8_dynamic is barely smaller or faster
+than eager.
+
+Static quantization needs representative calibration images:
+
+    python convert_model.py --checkpoint best_resnet50.pth --calibration-dir samples/
+
+Select a backend at runtime with INFERENCE_BACKEND=<format>.
+"""
+import argparse
+import inspect
+import json
+import os
+import warnings
+from datetime import datetime
+
+import torch
+
+from model_runtime import BACKENDS, decode_image, exported_model_path, get_transform, load_checkpoint_model
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.gif')
+
+
+def load_images(directory, limit):
+    """Preprocessed (1, C, H, W) tensors for up to `limit` images in a directory"""
+    tensors = []
+    if not directory:
+        return tensors
+    for name in sorted(os.listdir(directory)):
+        if not name.lower().endswith(IMAGE_EXTENSIONS):
+            continue
+        with open(os.path.join(directory, name), 'rb') as f:
+            tensors.append(get_transform()(decode_image(f.read())).unsqueeze(0))
+        if len(tensors) >= limit:
+            break
+    return tensors
+
+
+def freeze(model, example):
+    traced = torch.jit.trace(model, example)
+    return torch.jit.freeze(traced.eval())
+
+
+def export_torchscript(model, example, calibration, engine):
+    return freeze(model, example)
+
+
+def export_int8_dynamic(model, example, calibration, engine):
+    """Quantize the Linear layers only (just fc in ResNet50); see int8_static"""
+    from torch.ao.quantization import quantize_dynamic
+
+    torch.backends.quantized.engine = engine
+    quantized = quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    return freeze(quantized, example)
+
+
+def export_int8_static(model, example, calibration, engine):
+    from torch.ao.quantization import get_default_qconfig_mapping
+    from torch.ao.quantization.quantize_fx import convert_fx, prepare_fx
+
+    if not calibration:
+        print("⚠️ No calibration images given, calibrating on random noise. "
+              "Accuracy will suffer; pass --calibration-dir.")
+        calibration = [torch.randn_like(example) for _ in range(8)]
+
+    torch.backends.quantized.engine = engine
+    prepared = prepare_fx(model, get_default_qconfig_mapping(engine), example_inputs=(example,))
+    with torch.no_grad():
+        for batch in calibration:
+            prepared(batch)
+    return freeze(convert_fx(prepared), example)
+
+
+def export_onnx(model, example, path):
+    kwargs = {}
+    if 'dynamo' in inspect.signature(torch.onnx.export).parameters:
+        kwargs['dynamo'] = False
+    torch.onnx.export(
+        model, example, path,
+        input_names=['input'], output_names=['logits'],
+        dynamic_axes={'input': {0: 'batch'}, 'logits': {0: 'batch'}},
+        **kwargs
+    )
+
+
+EXPORTERS = {
+    'torchscript': export_torchscript,
+    'int8_dynamic': export_int8_dynamic,
+    'int8_static': export_int8_static
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--checkpoint', default=os.getenv('MODEL_PATH', 'best_resnet50.pth'))
+    parser.add_argument('--formats', default='torchscript,int8_dynamic,int8_static,onnx')
+    parser.add_argument('--output-dir', help='defaults to the checkpoint directory')
+    parser.add_argument('--calibration-dir', help='images used to calibrate static int8')
+    parser.add_argument('--calibration-samples', type=int, default=64)
+    parser.add_argument('--engine', default='x86', help='quantized engine (x86, fbgemm, qnnpack)')
+    args = parser.parse_args()
+
+    model = load_checkpoint_model(args.checkpoint)
+    if model is None:
+        raise SystemExit(1)
+    model = model.cpu().eval()
+    class_names = getattr(model, 'class_names', None)
+
+    example = torch.randn(1, 3, 224, 224)
+    calibration = load_images(args.calibration_dir, args.calibration_samples)
+    warnings.filterwarnings('ignore', category=DeprecationWarning)
+
+    for backend in [f.strip() for f in args.formats.split(',') if f.strip()]:
+        if backend not in BACKENDS or backend == 'eager':
+            print(f"⚠️ Unknown format '{backend}', skipping")
+            continue
+
+        path = exported_model_path(args.checkpoint, backend)
+        if args.output_dir:
+            os.makedirs(args.output_dir, exist_ok=True)
+            path = os.path.join(args.output_dir, os.path.basename(path))
+
+        print(f"🔧 Exporting {backend} -> {path}")
+        try:
+            if backend == 'onnx':
+                export_onnx(model, example, path)
+            else:
+                torch.jit.save(EXPORTERS[backend](model, example, calibration, args.engine), path)
+        except Exception as e:
+            print(f"❌ Failed to export {backend}: {e}")
+            continue
+
+        with open(f"{path}.json", 'w') as f:
+            json.dump({
+                'backend': backend,
+                'classes': class_names,
+                'engine': args.engine if backend.startswith('int8') else None,
+                'source_checkpoint': os.path.abspath(args.checkpoint),
+                'created_at': datetime.now().isoformat()
+            }, f, indent=2)
+        print(f"✅ {backend}: {os.path.getsize(path) / 1024 / 1024:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,222 @@
 import psycopg2
 from psycopg2 import Error
+from psycopg2.extensions import (TRANSACTION_STATUS_IDLE, cursor as BaseCursor,
+                                 connection as BaseConnection)
+from psycopg2.pool import PoolError
 import os
+import re
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
 from urllib.parse import urlparse
+from metrics import DB_QUERY_LATENCY, DB_QUERY_ERRORS, statement_label
 from dotenv import load_dotenv
 
 load_dotenv()
 
+# Server-side prepared statements (PreparedStatement). Turn off behind
+# poolers that do not keep a server session per client, such as PgBouncer
+# in transaction mode.
+PREPARED_STATEMENTS = os.getenv('DB_PREPARED_STATEMENTS', 'True').lower() == 'true'
+
+class TimedCursor(BaseCursor):
+    """Cursor recording each statement's latency in DB_QUERY_LATENCY"""
+
+    def execute(self, query, vars=None):
+        label = statement_label(query)
+        start = time.perf_counter()
+        try:
+            return super().execute(query, vars)
+        except Exception:
+            DB_QUERY_ERRORS.inc(label)
+            raise
+        finally:
+            DB_QUERY_LATENCY.observe(time.perf_counter() - start, label)
+
+    def executemany(self, query, vars_list):
+        label = statement_label(query)
+        start = time.perf_counter()
+        try:
+            return super().executemany(query, vars_list)
+        except Exception:
+            DB_QUERY_ERRORS.inc(label)
+            raise
+        finally:
+            DB_QUERY_LATENCY.observe(time.perf_counter() - start, label)
+
+class PreparingConnection(BaseConnection):
+    """Connection remembering which PreparedStatements its session holds"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prepared = set()
+
+class PreparedStatement:
+    """A statement parsed and planned once per connection.
+
+    Written with %s placeholders like any other query. The first run on a
+    connection sends PREPARE and EXECUTE in one round trip; later runs
+    send only EXECUTE with the parameters. Runs as a plain query when
+    DB_PREPARED_STATEMENTS is off or the connection does not track its
+    prepared statements. ``numbered`` is the $1, $2 ... form for asyncpg,
+    which prepares statements by itself.
+    """
+
+    def __init__(self, name, sql):
+        self.name = name
+        self.sql = sql
+        self.param_count = sql.count('%s')
+        numbers = iter(range(1, self.param_count + 1))
+        body = re.sub(r'%s', lambda _: f"${next(numbers)}", sql)
+        self._prepare_sql = f"PREPARE {name} AS {body}"
+        self.numbered = body.replace('%%', '%')
+
+    def execute(self, cursor, params=()):
+        """Run on ``cursor``; fetch results from the cursor as usual"""
+        prepared = getattr(cursor.connection, 'prepared', None)
+        if not PREPARED_STATEMENTS or prepared is None:
+            cursor.execute(self.sql, params)
+            return cursor
+
+        execute = f"EXECUTE {self.name}"
+        if self.param_count:
+            execute += " (" + ", ".join(["%s"] * self.param_count) + ")"
+        if self.name in prepared:
+            cursor.execute(execute, params)
+            return cursor
+
+        try:
+            cursor.execute(f"{self._prepare_sql}; {execute}", params)
+        except Error as e:
+            # Prepared statements outlive rolled-back transactions, so only
+            # a failing PREPARE itself (class 42) leaves nothing behind
+            code = e.pgcode or ''
+            if code and (not code.startswith('42') or code == '42P05'):
+                prepared.add(self.name)
+            raise
+        prepared.add(self.name)
+        return cursor
+
+class ConnectionPool:
+    """Thread-safe pool of PostgreSQL connections.
+
+    Keeps up to ``maxconn`` connections open (``minconn`` are opened
+    eagerly). Checkout blocks for up to ``timeout`` seconds when every
+    connection is in use, pings connections that sat idle longer than
+    ``healthcheck_interval`` seconds, and replaces connections the server
+    has dropped.
+    """
+
+    def __init__(self, minconn, maxconn, timeout=10, healthcheck_interval=30, **connect_kwargs):
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.healthcheck_interval = healthcheck_interval
+        self.connect_kwargs = connect_kwargs
+
+        self._idle = deque()  # (connection, idle_since)
+        self._size = 0
+        self._closed = False
+        self._cond = threading.Condition()
+
+        for _ in range(minconn):
+            self._idle.append((self._open(), time.monotonic()))
+            self._size += 1
+
+    def _open(self):
+        return psycopg2.connect(**self.connect_kwargs)
+
+    def _is_healthy(self, conn, idle_since):
+        if conn.closed:
+            return False
+        if time.monotonic() - idle_since < self.healthcheck_interval:
+            return True
+        try:
+            cursor = conn.cursor()
+            cursor.execute('SELECT 1')
+            cursor.close()
+            conn.rollback()
+            return True
+        except Error:
+            return False
+
+    def getconn(self):
+        """Check out a healthy connection, reconnecting if needed"""
+        deadline = time.monotonic() + self.timeout
+
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise PoolError('connection pool is closed')
+                if self._idle:
+                    conn, idle_since = self._idle.pop()
+                    break
+                if self._size < self.maxconn:
+                    # Reserve the slot, then connect outside the lock
+                    self._size += 1
+                    conn, idle_since = None, None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise PoolError('connection pool exhausted')
+                self._cond.wait(remaining)
+
+        if conn is not None:
+            if self._is_healthy(conn, idle_since):
+                return conn
+            # Reuse the slot of a connection the server dropped
+            print("⚠️  Dropped database connection detected, reconnecting")
+            try:
+                conn.close()
+            except Error:
+                pass
+
+        try:
+            return self._open()
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+
+    def putconn(self, conn):
+        """Return a connection, rolling back any transaction left open"""
+        if not conn.closed and conn.get_transaction_status() != TRANSACTION_STATUS_IDLE:
+            try:
+                conn.rollback()
+            except Error:
+                pass
+
+        with self._cond:
+            if conn.closed or self._closed:
+                self._size -= 1
+                if not conn.closed:
+                    conn.close()
+            else:
+                self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    def stats(self):
+        """Snapshot of pool utilisation"""
+        with self._cond:
+            return {
+                'size': self._size,
+                'idle': len(self._idle),
+                'in_use': self._size - len(self._idle),
+                'max': self.maxconn
+            }
+
+    def closeall(self):
+        """Close idle connections; in-use ones are closed when returned"""
+        with self._cond:
+            self._closed = True
+            while self._idle:
+                conn, _ = self._idle.pop()
+                self._size -= 1
+                conn.close()
+            self._cond.notify_all()
+
 class Database:
     def __init__(self):
         # Support both individual environment variables and DATABASE_URL
@@ -16,7 +227,19 @@ class Database:
         self.password = None
         self.database = None
         self.port = 5432
-        self.connection = None
+        self.pool = None
+        self.schema_ready = False
+        self._local = threading.local()
+        self._pool_lock = threading.Lock()
+
+        # Connection pool sizing (per gunicorn worker process)
+        self.pool_min = int(os.getenv('DB_POOL_MIN', 1))
+        self.pool_max = int(os.getenv('DB_POOL_MAX', 10))
+        self.pool_timeout = float(os.getenv('DB_POOL_TIMEOUT', 10))
+        self.pool_healthcheck_interval = float(os.getenv('DB_POOL_HEALTHCHECK_INTERVAL', 30))
+
+        # Time-range partitioning of otp_codes and disease_reports (partitions.py)
+        self.partitioning = os.getenv('DB_PARTITIONING', 'False').lower() == 'true'
         
         if database_url:
             try:
@@ -41,8 +264,24 @@ class Database:
             if self.host:
                 print(f"📋 Using environment variables: host={self.host}, user={self.user}")
 
+    def _create_pool(self, minconn):
+        return ConnectionPool(
+            minconn,
+            self.pool_max,
+            timeout=self.pool_timeout,
+            healthcheck_interval=self.pool_healthcheck_interval,
+            host=self.host,
+            user=self.user,
+            password=self.password,
+            database=self.database,
+            port=self.port,
+            connect_timeout=10,
+            connection_factory=PreparingConnection,
+            cursor_factory=TimedCursor
+        )
+
     def connect(self):
-        """Create database and tables if they don't exist"""
+        """Create the connection pool, then tables if they don't exist"""
         # Skip connection if not configured
         if not self.host:
             print("⚠️  Database not configured. Skipping connection.")
@@ -52,31 +291,91 @@ class Database:
         try:
             # Connect to PostgreSQL
             print(f"🔗 Connecting to PostgreSQL: {self.host}:{self.port}/{self.database}")
-            self.connection = psycopg2.connect(
-                host=self.host,
-                user=self.user,
-                password=self.password,
-                database=self.database,
-                port=self.port,
-                connect_timeout=10
-            )
-            
-            if self.connection:
-                print(f"✅ Connected to PostgreSQL database: {self.database}")
+            with self._pool_lock:
+                if self.pool is None:
+                    self.pool = self._create_pool(max(self.pool_min, 1))
+            print(f"✅ Connected to PostgreSQL database: {self.database} "
+                  f"(pool size {self.pool_min}-{self.pool_max})")
+
+            with self.session():
                 self.create_tables()
-                return self.connection
+            return self.pool
                 
         except psycopg2.OperationalError as e:
             print(f"❌ Database connection failed: {e}")
             print("⚠️  Application will start without database")
-            self.connection = None
+            self.pool = None
             return None
         except Error as e:
             print(f"❌ Error connecting to PostgreSQL: {e}")
             print("⚠️  Application will start without database")
-            self.connection = None
+            self.pool = None
+            return None
+
+    def _get_pool(self):
+        """Return the pool, creating it lazily if startup could not connect"""
+        if self.pool is None and self.host:
+            with self._pool_lock:
+                if self.pool is None:
+                    self.pool = self._create_pool(0)
+        return self.pool
+
+    @property
+    def connection(self):
+        """Connection checked out for the current request/thread.
+
+        The first access checks a connection out of the pool and binds it
+        to the calling thread until release() hands it back. Returns None
+        when the database is not configured or cannot be reached.
+        """
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and not conn.closed:
+            return conn
+
+        pool = self._get_pool()
+        if pool is None:
             return None
 
+        if conn is not None:
+            # Dropped mid-request: give it back so the pool frees the slot
+            self._local.conn = None
+            pool.putconn(conn)
+
+        try:
+            conn = pool.getconn()
+        except psycopg2.OperationalError as e:
+            print(f"❌ Database connection failed: {e}")
+            return None
+
+        self._local.conn = conn
+        return conn
+
+    def release(self):
+        """Return the current thread's connection to the pool"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            self._local.conn = None
+            if self.pool is not None:
+                self.pool.putconn(conn)
+
+    @contextmanager
+    def session(self):
+        """Bind a pooled connection for the duration of a block.
+
+        Meant for code running outside a Flask request (scripts, background
+        threads). Nested sessions reuse the outer connection.
+        """
+        owned = getattr(self._local, 'conn', None) is None
+        try:
+            yield self.connection
+        finally:
+            if owned:
+                self.release()
+
+    def pool_stats(self):
+        """Pool utilisation, or None when the database is not configured"""
+        return self.pool.stats() if self.pool else None
+
     def create_tables(self):
         """Create all necessary tables"""
         if not self.connection:
@@ -103,46 +402,50 @@ class Database:
                 )
             """)
 
-            # OTP codes table
+            # OTP codes and disease reports (partitioned by created_at
+            # with DB_PARTITIONING, see partitions.py)
+            self.create_otp_codes(cursor)
+            self.create_disease_reports(cursor)
+            if self.partitioning:
+                from partitions import PARTITIONS
+                PARTITIONS.ensure(cursor)
+
+            # Reference counts of content-addressed upload blobs (blob_store.py)
             cursor.execute("""
-                CREATE TABLE IF NOT EXISTS otp_codes (
-                    id SERIAL PRIMARY KEY,
-                    mobile_number VARCHAR(15) NOT NULL,
-                    otp_code VARCHAR(6) NOT NULL,
-                    purpose VARCHAR(20) NOT NULL,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    expires_at TIMESTAMP NOT NULL,
-                    is_used BOOLEAN DEFAULT FALSE
+                CREATE TABLE IF NOT EXISTS image_blobs (
+                    name VARCHAR(80) PRIMARY KEY,
+                    refcount INT NOT NULL DEFAULT 0,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
                 )
             """)
-            
-            # Create indexes for otp_codes
-            cursor.execute("""
-                CREATE INDEX IF NOT EXISTS idx_otp_mobile ON otp_codes(mobile_number)
-            """)
-            cursor.execute("""
-                CREATE INDEX IF NOT EXISTS idx_otp_expires ON otp_codes(expires_at)
-            """)
 
-            # Disease reports table
+            # Background unlinking of deleted reports' image files
+            # (deletion_jobs.py)
             cursor.execute("""
-                CREATE TABLE IF NOT EXISTS disease_reports (
-                    id SERIAL PRIMARY KEY,
+                CREATE TABLE IF NOT EXISTS deletion_jobs (
+                    id VARCHAR(32) PRIMARY KEY,
                     user_id INT NOT NULL,
-                    image_path VARCHAR(255) NOT NULL,
-                    is_healthy BOOLEAN NOT NULL,
-                    disease_name VARCHAR(200) NOT NULL,
-                    confidence_score DECIMAL(5,2),
-                    diagnosis_details TEXT,
-                    treatment_tips TEXT,
+                    status VARCHAR(20) NOT NULL DEFAULT 'queued',
+                    files TEXT[] NOT NULL DEFAULT '{}',
+                    total_files INT NOT NULL DEFAULT 0,
+                    deleted_files INT NOT NULL DEFAULT 0,
+                    error TEXT,
+                    owner VARCHAR(100),
+                    heartbeat_at TIMESTAMP,
                     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+                    finished_at TIMESTAMP
                 )
             """)
-            
-            # Create index for disease_reports
+            # Process working on a job and when it last made progress; other
+            # processes only take over jobs whose heartbeat is stale
             cursor.execute("""
-                CREATE INDEX IF NOT EXISTS idx_disease_user ON disease_reports(user_id)
+                ALTER TABLE deletion_jobs
+                ADD COLUMN IF NOT EXISTS owner VARCHAR(100),
+                ADD COLUMN IF NOT EXISTS heartbeat_at TIMESTAMP
+            """)
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_deletion_jobs_unfinished
+                ON deletion_jobs(status) WHERE status IN ('queued', 'running')
             """)
 
             # Ratings table
@@ -164,8 +467,30 @@ class Database:
             cursor.execute("""
                 CREATE INDEX IF NOT EXISTS idx_rating_score ON ratings(rating)
             """)
+            # Keyset pagination of GET /api/ratings (newest first)
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_rating_created
+                ON ratings(created_at DESC, id DESC)
+            """)
+
+            # Running count per star value, updated by every rating insert so
+            # the summary never scans the ratings table
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS ratings_summary (
+                    rating INT PRIMARY KEY CHECK (rating >= 1 AND rating <= 5),
+                    count BIGINT NOT NULL DEFAULT 0
+                )
+            """)
+            # Backfill once from existing ratings (no-op when populated)
+            cursor.execute("""
+                INSERT INTO ratings_summary (rating, count)
+                SELECT rating, COUNT(*) FROM ratings
+                WHERE NOT EXISTS (SELECT 1 FROM ratings_summary)
+                GROUP BY rating
+            """)
 
             self.connection.commit()
+            self.schema_ready = True
             print("✅ All tables created successfully")
             cursor.close()
 
@@ -174,22 +499,86 @@ class Database:
             if self.connection:
                 self.connection.rollback()
 
+    def create_otp_codes(self, cursor, partitioned=None):
+        """otp_codes and its indexes; partitioned by day with DB_PARTITIONING"""
+        partitioned = self.partitioning if partitioned is None else partitioned
+        cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS otp_codes (
+                id SERIAL,
+                mobile_number VARCHAR(15) NOT NULL,
+                otp_code VARCHAR(6) NOT NULL,
+                purpose VARCHAR(20) NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                expires_at TIMESTAMP NOT NULL,
+                is_used BOOLEAN DEFAULT FALSE,
+                PRIMARY KEY {'(id, created_at)' if partitioned else '(id)'}
+            ) {'PARTITION BY RANGE (created_at)' if partitioned else ''}
+        """)
+        
+        # Create indexes for otp_codes
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_otp_mobile ON otp_codes(mobile_number)
+        """)
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_otp_expires ON otp_codes(expires_at)
+        """)
+
+    def create_disease_reports(self, cursor, partitioned=None):
+        """disease_reports and its indexes; partitioned by month with DB_PARTITIONING"""
+        partitioned = self.partitioning if partitioned is None else partitioned
+        cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS disease_reports (
+                id SERIAL,
+                user_id INT NOT NULL,
+                image_path VARCHAR(255) NOT NULL,
+                is_healthy BOOLEAN NOT NULL,
+                disease_key VARCHAR(64),
+                catalog_version SMALLINT,
+                disease_name VARCHAR(200),
+                confidence_score DECIMAL(5,2),
+                diagnosis_details TEXT,
+                treatment_tips TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY {'(id, created_at)' if partitioned else '(id)'},
+                FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+            ) {'PARTITION BY RANGE (created_at)' if partitioned else ''}
+        """)
+
+        # Reports reference the disease catalog (disease_catalog.py) by
+        # key and version; disease_name and the JSON text columns are
+        # only set on rows saved before that
+        cursor.execute("""
+            ALTER TABLE disease_reports
+            ADD COLUMN IF NOT EXISTS disease_key VARCHAR(64),
+            ADD COLUMN IF NOT EXISTS catalog_version SMALLINT,
+            ALTER COLUMN disease_name DROP NOT NULL
+        """)
+        
+        # Index for keyset pagination of a user's reports (newest first).
+        # INCLUDE makes it covering for the list query; its user_id
+        # prefix replaces the old single-column idx_disease_user.
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_disease_user_recent
+            ON disease_reports(user_id, created_at DESC, id DESC)
+            INCLUDE (image_path, is_healthy, disease_key, catalog_version,
+                     disease_name, confidence_score)
+        """)
+        cursor.execute("""
+            DROP INDEX IF EXISTS idx_disease_user
+        """)
+        cursor.execute("""
+            DROP INDEX IF EXISTS idx_disease_user_created
+        """)
+
     def close(self):
-        """Close database connection"""
-        if self.connection:
-            self.connection.close()
-            print("PostgreSQL connection closed")
-
-# Initialize database
-print("\n" + "="*60)
-print("Initializing GrowGuardians Database")
-print("="*60)
-
-try:
-    db = Database()
-    db.connect()
-except Exception as e:
-    print(f"❌ Failed to initialize database: {e}")
-    db = Database()  # Create instance even if connection fails
-
-print("="*60 + "\n")
+        """Close all pooled database connections"""
+        self.release()
+        if self.pool:
+            self.pool.closeall()
+            self.pool = None
+            print("PostgreSQL connection pool closed")
+
+# Shared database instance. Nothing connects at import time; call
+# db.connect() (app.py does so in a background startup thread) to open the
+# pool and create tables, or let the first query open the pool lazily.
+db = Database()
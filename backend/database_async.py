@@ -0,0 +1,107 @@
+"""
+asyncpg connection pool for the asyncio server (app_async.py).
+
+Connection settings are the DATABASE_URL / DB_* variables parsed by
+database.py. Tables are still created by the synchronous Database, which
+app.py sets up at import; this module only runs queries.
+
+Queries use asyncpg's $1, $2 ... placeholders. Every statement is timed
+into the same DB_QUERY_LATENCY histogram as the psycopg2 cursors.
+"""
+import os
+import time
+from contextlib import asynccontextmanager
+from database import db, PREPARED_STATEMENTS
+from metrics import DB_QUERY_LATENCY, DB_QUERY_ERRORS, statement_label
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+class AsyncDatabase:
+    """A lazily created asyncpg pool with timed query helpers"""
+
+    def __init__(self, min_size=2, max_size=20, timeout=10):
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.pool = None
+
+    async def connect(self):
+        """Create the pool; returns None when the database is not configured or unreachable"""
+        if not db.host:
+            print("⚠️  Database not configured. Async pool not created.")
+            return None
+
+        import asyncpg
+
+        try:
+            self.pool = await asyncpg.create_pool(
+                host=db.host,
+                user=db.user,
+                password=db.password,
+                database=db.database,
+                port=db.port,
+                min_size=self.min_size,
+                max_size=self.max_size,
+                timeout=self.timeout,
+                # asyncpg prepares and caches every statement; the cache
+                # is off with DB_PREPARED_STATEMENTS=False, as for psycopg2
+                statement_cache_size=100 if PREPARED_STATEMENTS else 0
+            )
+            print(f"✅ Async database pool ready ({self.min_size}-{self.max_size} connections)")
+        except (OSError, asyncpg.PostgresError) as e:
+            print(f"❌ Async database connection failed: {e}")
+            self.pool = None
+        return self.pool
+
+    async def close(self):
+        if self.pool is not None:
+            await self.pool.close()
+            self.pool = None
+
+    async def _timed(self, method, query, args):
+        label = statement_label(query)
+        start = time.perf_counter()
+        try:
+            return await method(query, *args, timeout=self.timeout)
+        except Exception:
+            DB_QUERY_ERRORS.inc(label)
+            raise
+        finally:
+            DB_QUERY_LATENCY.observe(time.perf_counter() - start, label)
+
+    async def fetch(self, query, *args, conn=None):
+        return await self._timed((conn or self.pool).fetch, query, args)
+
+    async def fetchrow(self, query, *args, conn=None):
+        return await self._timed((conn or self.pool).fetchrow, query, args)
+
+    async def fetchval(self, query, *args, conn=None):
+        return await self._timed((conn or self.pool).fetchval, query, args)
+
+    async def execute(self, query, *args, conn=None):
+        return await self._timed((conn or self.pool).execute, query, args)
+
+    @asynccontextmanager
+    async def transaction(self):
+        """Connection with an open transaction, committed when the block exits cleanly"""
+        async with self.pool.acquire(timeout=self.timeout) as conn:
+            async with conn.transaction():
+                yield conn
+
+    def stats(self):
+        """Pool utilisation, or None when there is no pool"""
+        if self.pool is None:
+            return None
+        size = self.pool.get_size()
+        idle = self.pool.get_idle_size()
+        return {'size': size, 'idle': idle, 'in_use': size - idle, 'max': self.max_size}
+
+
+# Shared by the async routes
+adb = AsyncDatabase(
+    min_size=int(os.getenv('ASYNC_DB_POOL_MIN', 2)),
+    max_size=int(os.getenv('ASYNC_DB_POOL_MAX', 20)),
+    timeout=float(os.getenv('DB_POOL_TIMEOUT', 10))
+)
@@ -0,0 +1,226 @@
+import os
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from database import db
+from blob_store import BLOBS
+from image_derivatives import DERIVATIVES
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+class FileDeletionJobs:
+    """Unlinks image files of deleted reports in the background.
+
+    The caller deletes the report rows and calls create() in the same
+    transaction, which records the files to remove in ``deletion_jobs``.
+    After commit, start() splits them into batches of ``batch_size`` that
+    a pool of ``workers`` threads unlinks, updating the job's progress.
+
+    Each job is owned by the process that runs it. While any of its
+    batches are queued here, a heartbeat thread refreshes ``heartbeat_at``
+    every third of ``lease_seconds``, however long the batches wait for a
+    free worker. resume() (at startup and on every maintenance run) takes
+    over only jobs that are not queued in this process and whose heartbeat
+    is older than ``lease_seconds``, so jobs left by a stopped process are
+    finished without disturbing those a live worker is running.
+    """
+
+    def __init__(self, workers=2, batch_size=100, lease_seconds=300):
+        self.batch_size = batch_size
+        self.lease_seconds = lease_seconds
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='file-deletion')
+        # Job id -> batches still queued or running in this process
+        self._in_flight = {}
+        self._lock = threading.Lock()
+        self._heartbeat_thread = None
+
+    @staticmethod
+    def owner():
+        """This process, as recorded in ``deletion_jobs.owner``"""
+        return f"{socket.gethostname()}:{os.getpid()}"
+
+    @staticmethod
+    def create(cursor, user_id, names):
+        """Record a job for ``names`` on the caller's transaction; returns its id"""
+        job_id = uuid.uuid4().hex
+        cursor.execute("""
+            INSERT INTO deletion_jobs (id, user_id, status, files, total_files, finished_at,
+                                       owner, heartbeat_at)
+            VALUES (%s, %s, %s, %s, %s, CASE WHEN %s THEN CURRENT_TIMESTAMP END,
+                    %s, CURRENT_TIMESTAMP)
+        """, (job_id, user_id, 'queued' if names else 'done', list(names), len(names), not names,
+              FileDeletionJobs.owner()))
+        return job_id
+
+    def start(self, job_id, names):
+        """Queue the batches of a committed job"""
+        batches = [names[start:start + self.batch_size]
+                   for start in range(0, len(names), self.batch_size)]
+        if not batches:
+            return
+        with self._lock:
+            self._in_flight[job_id] = self._in_flight.get(job_id, 0) + len(batches)
+            if self._heartbeat_thread is None:
+                self._heartbeat_thread = threading.Thread(
+                    target=self._heartbeat_loop, name='file-deletion-heartbeat', daemon=True)
+                self._heartbeat_thread.start()
+        for batch in batches:
+            self._executor.submit(self._run_batch, job_id, batch)
+
+    def _finish_batch(self, job_id):
+        with self._lock:
+            self._in_flight[job_id] -= 1
+            if self._in_flight[job_id] <= 0:
+                del self._in_flight[job_id]
+
+    def _heartbeat_loop(self):
+        """Keep the lease of every job queued in this process"""
+        interval = max(1.0, self.lease_seconds / 3)
+        while True:
+            time.sleep(interval)
+            with self._lock:
+                job_ids = list(self._in_flight)
+            if not job_ids:
+                continue
+            try:
+                with db.session() as conn:
+                    if conn is None:
+                        continue
+                    cursor = conn.cursor()
+                    cursor.execute("""
+                        UPDATE deletion_jobs SET heartbeat_at = CURRENT_TIMESTAMP
+                        WHERE id = ANY(%s) AND owner = %s AND status IN ('queued', 'running')
+                    """, (job_ids, self.owner()))
+                    conn.commit()
+                    cursor.close()
+            except Exception as e:
+                print(f"⚠️ Could not refresh file deletion job heartbeats: {e}")
+
+    def _run_batch(self, job_id, names):
+        try:
+            self._delete_batch(job_id, names)
+        finally:
+            self._finish_batch(job_id)
+
+    def _delete_batch(self, job_id, names):
+        owner = self.owner()
+        with db.session() as conn:
+            try:
+                cursor = conn.cursor()
+                # Skip the batch if the job failed or another process took it over
+                cursor.execute("""
+                    UPDATE deletion_jobs SET heartbeat_at = CURRENT_TIMESTAMP
+                    WHERE id = %s AND owner = %s AND status IN ('queued', 'running')
+                """, (job_id, owner))
+                owned = cursor.rowcount == 1
+                conn.commit()
+                if not owned:
+                    cursor.close()
+                    return
+
+                # A blob may have been saved again, or scanned again and
+                # not saved yet, since its last reference went away; leave
+                # those in place
+                removable = BLOBS.removable(cursor, names)
+                conn.rollback()
+
+                for name in removable:
+                    try:
+                        BLOBS.unlink(name)
+                        DERIVATIVES.remove(name)
+                    except OSError as e:
+                        print(f"⚠️ Could not delete {name}: {e}")
+
+                # A failed job stays failed
+                cursor.execute("""
+                    UPDATE deletion_jobs
+                    SET deleted_files = LEAST(deleted_files + %s, total_files),
+                        status = CASE WHEN deleted_files + %s >= total_files
+                                      THEN 'done' ELSE 'running' END,
+                        files = CASE WHEN deleted_files + %s >= total_files
+                                     THEN '{}' ELSE files END,
+                        finished_at = CASE WHEN deleted_files + %s >= total_files
+                                           THEN CURRENT_TIMESTAMP END,
+                        heartbeat_at = CURRENT_TIMESTAMP
+                    WHERE id = %s AND owner = %s AND status IN ('queued', 'running')
+                """, (len(names), len(names), len(names), len(names), job_id, owner))
+                conn.commit()
+                cursor.close()
+            except Exception as e:
+                print(f"❌ File deletion job {job_id} failed: {e}")
+                # The connection itself may be gone; the job is then
+                # resumed once its lease runs out
+                try:
+                    conn.rollback()
+                    cursor = conn.cursor()
+                    cursor.execute("""
+                        UPDATE deletion_jobs SET status = 'failed', error = %s,
+                               finished_at = CURRENT_TIMESTAMP
+                        WHERE id = %s AND owner = %s
+                    """, (str(e), job_id, owner))
+                    conn.commit()
+                    cursor.close()
+                except Exception as update_error:
+                    print(f"❌ Could not mark file deletion job {job_id} failed: {update_error}")
+
+    def resume(self):
+        """Take over queued or running jobs whose owner stopped making progress"""
+        with self._lock:
+            in_flight = list(self._in_flight)
+        # Claiming refreshes heartbeat_at, so a concurrent resume() skips these jobs
+        with db.session() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                UPDATE deletion_jobs
+                SET status = 'running', deleted_files = 0,
+                    owner = %s, heartbeat_at = CURRENT_TIMESTAMP
+                WHERE status IN ('queued', 'running')
+                AND NOT (id = ANY(%s))
+                AND (heartbeat_at IS NULL
+                     OR heartbeat_at < NOW() - make_interval(secs => %s))
+                RETURNING id, files
+            """, (self.owner(), in_flight, float(self.lease_seconds)))
+            jobs = cursor.fetchall()
+            conn.commit()
+            cursor.close()
+
+        for job_id, names in jobs:
+            self.start(job_id, names)
+        if jobs:
+            print(f"🔁 Resumed {len(jobs)} file deletion jobs")
+        return len(jobs)
+
+    @staticmethod
+    def status(job_id, user_id):
+        """Progress of a job owned by ``user_id``, or None"""
+        cursor = db.connection.cursor()
+        cursor.execute("""
+            SELECT id, status, total_files, deleted_files, error, created_at, finished_at
+            FROM deletion_jobs
+            WHERE id = %s AND user_id = %s
+        """, (job_id, user_id))
+        row = cursor.fetchone()
+        cursor.close()
+        if not row:
+            return None
+        return {
+            'id': row[0],
+            'status': row[1],
+            'totalFiles': row[2],
+            'deletedFiles': row[3],
+            'error': row[4],
+            'createdAt': row[5].isoformat() if row[5] else None,
+            'finishedAt': row[6].isoformat() if row[6] else None
+        }
+
+
+# Shared by report deletion and the job status route
+DELETION_JOBS = FileDeletionJobs(
+    workers=int(os.getenv('DELETION_WORKERS', 2)),
+    batch_size=int(os.getenv('DELETION_BATCH_SIZE', 100)),
+    lease_seconds=int(os.getenv('DELETION_JOB_LEASE', 300))
+)
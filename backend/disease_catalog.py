@@ -0,0 +1,354 @@
+"""
+Versioned catalog of disease names, diagnoses and treatment tips.
+
+Reports store only a ``disease_key`` and the ``catalog_version`` they were
+written with; the text is looked up here when a report is read. Entries
+of a released version must never change, since existing reports point at
+them. To reword or add entries, copy DISEASE_INFO into CATALOGS under the
+current version, edit DISEASE_INFO and bump CATALOG_VERSION.
+
+The diagnosis and tips lists of every version are also JSON-encoded once
+at import (ENCODED_CATALOGS), and responses splice those bytes in through
+fast_json instead of serializing the same lists on every request.
+
+Reports saved before this layout carry their own copy of the text. Compact
+them (optionally reclaiming the freed space) with:
+
+    python disease_catalog.py --compact [--vacuum-full]
+"""
+import argparse
+import json
+from fast_json import raw
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Disease information database (catalog version CATALOG_VERSION)
+DISEASE_INFO = {
+    'healthy': {
+        'name': 'Healthy Plant',
+        'diagnosis': [
+            'No disease symptoms detected',
+            'Plant appears healthy and well-maintained',
+            'Continue regular care and monitoring'
+        ],
+        'tips': [
+            'Maintain current watering schedule',
+            'Ensure adequate sunlight exposure',
+            'Apply organic fertilizer monthly',
+            'Monitor for any changes in appearance'
+        ]
+    },
+    'bacterial_leaf_blight': {
+        'name': 'Bacterial Leaf Blight',
+        'diagnosis': [
+            'Bacterial Leaf Blight infection detected',
+            'Water-soaked lesions visible on leaves',
+            'Yellow to white lesions with wavy margins',
+            'Disease severity: Moderate to High'
+        ],
+        'tips': [
+            'Remove and destroy infected plant parts',
+            'Apply copper-based bactericide',
+            'Improve field drainage to reduce moisture',
+            'Use disease-resistant rice varieties',
+            'Avoid excessive nitrogen fertilization'
+        ]
+    },
+    'brown_spot': {
+        'name': 'Brown Spot',
+        'diagnosis': [
+            'Brown Spot disease identified',
+            'Circular brown spots with gray centers',
+            'Spots may coalesce causing leaf death'
+        ],
+        'tips': [
+            'Apply potassium fertilizer to strengthen plants',
+            'Use fungicides containing mancozeb or copper',
+            'Ensure proper soil nutrients',
+            'Remove infected debris after harvest',
+            'Plant resistant varieties'
+        ]
+    },
+    'leaf_blast': {
+        'name': 'Leaf Blast',
+        'diagnosis': [
+            'Leaf Blast (Rice Blast) infection detected',
+            'Diamond-shaped lesions with gray centers',
+            'Brown margins around lesions',
+            'Can cause severe yield loss'
+        ],
+        'tips': [
+            'Apply systemic fungicides (tricyclazole or azoxystrobin)',
+            'Avoid excessive nitrogen fertilizer',
+            'Maintain proper plant spacing for air circulation',
+            'Use blast-resistant rice varieties',
+            'Monitor fields regularly during humid conditions'
+        ]
+    },
+    'leaf_scald': {
+        'name': 'Leaf Scald',
+        'diagnosis': [
+            'Leaf Scald disease identified',
+            'Large lesions with alternating light and dark green bands',
+            'Zonate pattern characteristic of this disease'
+        ],
+        'tips': [
+            'Plant resistant varieties',
+            'Apply appropriate fungicides',
+            'Improve field sanitation',
+            'Avoid planting in shaded areas',
+            'Ensure balanced fertilization'
+        ]
+    },
+    'narrow_brown_spot': {
+        'name': 'Narrow Brown Spot',
+        'diagnosis': [
+            'Narrow Brown Spot disease detected',
+            'Long narrow brown lesions on leaves',
+            'Lesions run parallel to leaf veins'
+        ],
+        'tips': [
+            'Apply fungicides containing mancozeb',
+            'Improve soil fertility with balanced fertilizer',
+            'Ensure adequate potassium levels',
+            'Remove infected plant debris',
+            'Use healthy seeds for planting'
+        ]
+    },
+    # Legacy tomato disease support (for backward compatibility)
+    'tomato_late_blight': {
+        'name': 'Tomato Late Blight',
+        'diagnosis': [
+            'The plant shows symptoms of Late Blight disease',
+            'Dark brown spots visible on leaves',
+            'White fungal growth detected on leaf undersides',
+            'Disease severity: Moderate to High'
+        ],
+        'tips': [
+            'Remove and destroy all infected plant parts immediately',
+            'Apply copper-based fungicide every 7-10 days',
+            'Improve air circulation around plants',
+            'Avoid overhead watering to reduce moisture on leaves',
+            'Consider resistant tomato varieties for future planting'
+        ]
+    },
+    'tomato_early_blight': {
+        'name': 'Tomato Early Blight',
+        'diagnosis': [
+            'Early Blight infection detected',
+            'Concentric ring patterns visible on older leaves',
+            'Disease spreading from lower to upper leaves'
+        ],
+        'tips': [
+            'Remove affected leaves and stems',
+            'Apply fungicide containing chlorothalonil',
+            'Mulch around plants to prevent soil splash',
+            'Water at the base of plants, not on foliage',
+            'Rotate crops to prevent soil contamination'
+        ]
+    },
+    'bacterial_spot': {
+        'name': 'Bacterial Spot',
+        'diagnosis': [
+            'Bacterial spot disease identified',
+            'Small dark spots with yellow halos on leaves',
+            'Fruit may show raised spots'
+        ],
+        'tips': [
+            'Remove and destroy infected plant material',
+            'Apply copper-based bactericide',
+            'Avoid working with plants when wet',
+            'Use drip irrigation instead of sprinklers',
+            'Plant disease-resistant varieties'
+        ]
+    }
+}
+
+CATALOG_VERSION = 1
+
+# Released catalog versions; older versions are kept for the reports that use them
+CATALOGS = {
+    CATALOG_VERSION: DISEASE_INFO
+}
+
+
+def _encode_catalog(catalog):
+    return {
+        key: {
+            'name': entry['name'],
+            'diagnosis': raw(entry['diagnosis']),
+            'tips': raw(entry['tips'])
+        }
+        for key, entry in catalog.items()
+    }
+
+
+# Every catalog version with its lists pre-encoded as JSON, built once at
+# import so responses splice them in instead of serializing them again
+ENCODED_CATALOGS = {version: _encode_catalog(catalog) for version, catalog in CATALOGS.items()}
+
+
+def lookup(disease_key, catalog_version=None, catalogs=CATALOGS):
+    """Catalog entry for a stored key, as worded in the report's catalog version"""
+    current = catalogs[CATALOG_VERSION]
+    catalog = catalogs.get(catalog_version, current)
+    entry = catalog.get(disease_key) or current.get(disease_key)
+    return entry or current['healthy']
+
+
+def lookup_encoded(disease_key, catalog_version=None):
+    """lookup() with 'diagnosis' and 'tips' as fast_json.Raw fragments"""
+    return lookup(disease_key, catalog_version, ENCODED_CATALOGS)
+
+
+def report_title(disease_key, catalog_version, disease_name):
+    """Disease name of a report row; legacy rows carry it in disease_name"""
+    if disease_key is None:
+        return disease_name
+    return lookup(disease_key, catalog_version)['name']
+
+
+def report_text(disease_key, catalog_version, disease_name, diagnosis_details, treatment_tips):
+    """(name, diagnosis points, tips points) of a report row; catalog
+    points are pre-encoded, so the result must be serialized with fast_json"""
+    if disease_key is None:
+        # Legacy row with the text stored as JSON
+        return (disease_name,
+                json.loads(diagnosis_details) if diagnosis_details else [],
+                json.loads(treatment_tips) if treatment_tips else [])
+    entry = lookup_encoded(disease_key, catalog_version)
+    return entry['name'], entry['diagnosis'], entry['tips']
+
+
+def _legacy_index():
+    """(name, diagnosis, tips) of every catalog entry -> (key, newest version with that text)"""
+    index = {}
+    for version in sorted(CATALOGS, reverse=True):
+        for key, entry in CATALOGS[version].items():
+            text = (entry['name'], tuple(entry['diagnosis']), tuple(entry['tips']))
+            index.setdefault(text, (key, version))
+    return index
+
+
+def table_size(cursor):
+    """Rows, total bytes on disk (with TOAST and indexes) and average row bytes of disease_reports"""
+    # pg_partition_tree also sums the partitions when the table is partitioned
+    cursor.execute("""
+        SELECT COUNT(*),
+               (SELECT COALESCE(SUM(pg_total_relation_size(relid)), 0)
+                FROM pg_partition_tree('disease_reports')),
+               COALESCE(AVG(pg_column_size(r.*)), 0)
+        FROM disease_reports AS r
+    """)
+    rows, total_bytes, row_bytes = cursor.fetchone()
+    return {'rows': rows, 'total_bytes': total_bytes, 'avg_row_bytes': float(row_bytes)}
+
+
+def _print_size(label, size):
+    print(f"   {label}: {size['rows']} rows, {size['total_bytes'] / 1024:.1f} KB on disk, "
+          f"{size['avg_row_bytes']:.0f} bytes per row")
+
+
+def compact_reports(batch_size=500, vacuum_full=False):
+    """Replace the stored text of legacy reports with their catalog key and version.
+
+    Rows whose text matches no catalog entry keep their own copy. The
+    updated rows leave dead tuples whose space is reused by later inserts;
+    ``vacuum_full`` rewrites the table to return it to the operating system
+    (it locks the table while it runs).
+    """
+    from database import db
+
+    index = _legacy_index()
+    compacted = 0
+    unmatched = 0
+    with db.session() as conn:
+        cursor = conn.cursor()
+        before = table_size(cursor)
+        conn.commit()
+
+        last_id = 0
+        while True:
+            cursor.execute("""
+                SELECT id, disease_name, diagnosis_details, treatment_tips
+                FROM disease_reports
+                WHERE disease_key IS NULL AND id > %s
+                ORDER BY id
+                LIMIT %s
+            """, (last_id, batch_size))
+            rows = cursor.fetchall()
+            if not rows:
+                break
+            last_id = rows[-1][0]
+
+            ids, keys, versions = [], [], []
+            for report_id, name, diagnosis, tips in rows:
+                try:
+                    text = (name, tuple(json.loads(diagnosis or '[]')), tuple(json.loads(tips or '[]')))
+                    match = index.get(text)
+                except (TypeError, ValueError):
+                    match = None
+                if match is None:
+                    unmatched += 1
+                    continue
+                ids.append(report_id)
+                keys.append(match[0])
+                versions.append(match[1])
+
+            if ids:
+                cursor.execute("""
+                    UPDATE disease_reports AS r
+                    SET disease_key = c.disease_key, catalog_version = c.catalog_version,
+                        disease_name = NULL, diagnosis_details = NULL, treatment_tips = NULL
+                    FROM unnest(%s::int[], %s::varchar[], %s::smallint[])
+                         AS c(id, disease_key, catalog_version)
+                    WHERE r.id = c.id
+                """, (ids, keys, versions))
+            conn.commit()
+            compacted += len(ids)
+
+        if vacuum_full:
+            conn.autocommit = True
+            try:
+                cursor.execute("VACUUM (FULL, ANALYZE) disease_reports")
+            finally:
+                conn.autocommit = False
+
+        after = table_size(cursor)
+        conn.commit()
+        cursor.close()
+
+    print(f"✅ Compacted {compacted} reports ({unmatched} with text outside the catalog kept as is)")
+    _print_size('before', before)
+    _print_size('after', after)
+    if before['avg_row_bytes']:
+        saved = 100 * (1 - after['avg_row_bytes'] / before['avg_row_bytes'])
+        print(f"   Row size reduced by {saved:.0f}%")
+    if not vacuum_full:
+        print("   Disk space is reused by new rows; run with --vacuum-full to release it")
+    return compacted
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--compact', action='store_true',
+                        help='replace the stored text of legacy reports with catalog keys')
+    parser.add_argument('--vacuum-full', action='store_true',
+                        help='rewrite disease_reports afterwards to release the freed space')
+    parser.add_argument('--batch-size', type=int, default=500)
+    args = parser.parse_args()
+
+    if not args.compact:
+        parser.print_help()
+        return
+
+    from database import db
+    if not db.connect():
+        raise SystemExit(1)
+    compact_reports(args.batch_size, args.vacuum_full)
+
+
+if __name__ == "__main__":
+    main()
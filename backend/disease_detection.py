@@ -1,250 +1,269 @@
 import os
+import time
+import threading
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
-from PIL import Image
-import json
 from datetime import datetime
-from database import db
+from database import db, PreparedStatement
+from model_runtime import load_model, get_transform, decode_image, predict_probabilities
+from inference_batcher import InferenceBatcher, InferenceStats
+from lru_cache import LRUCache
+from prediction_cache import PredictionCache
+from pagination import encode_cursor, decode_cursor
+from image_derivatives import DERIVATIVES
+from blob_store import BLOBS, BlobStore
+from deletion_jobs import DELETION_JOBS
+from scan_profiling import stage
+from disease_catalog import DISEASE_INFO, CATALOG_VERSION, report_title, report_text
 from dotenv import load_dotenv
 
 load_dotenv()
 
-# Import PyTorch for the new model
-def load_model():
-    """Load the trained PyTorch model"""
+# INFERENCE_MODE=server sends images to inference_server.py processes
+# instead of loading the model into every web worker
+INFERENCE_MODE = os.getenv('INFERENCE_MODE', 'local').lower()
+INFERENCE_CLIENT = None
+if INFERENCE_MODE == 'server':
+    from inference_server import InferenceClient
+    INFERENCE_CLIENT = InferenceClient()
+    print(f"✅ Using inference server at {INFERENCE_CLIENT.address}")
+    if not INFERENCE_CLIENT.authkey:
+        print("⚠️ INFERENCE_AUTHKEY is not set; scans will fail until it matches the server's")
+
+# Forward-pass timings per batch size (batch size 1 when batching is off)
+INFERENCE_STATS = InferenceStats()
+
+# Optional dynamic batching of concurrent predictions
+ENABLE_BATCHING = os.getenv('INFERENCE_BATCHING', 'False').lower() == 'true'
+
+# The model is loaded on first use (or by a warm-up thread, see app.py) so
+# importing this module stays fast. MODEL_STATE is one of
+# 'not_loaded', 'loading', 'ready', 'failed' or 'server'.
+MODEL = None
+BATCHER = None
+MODEL_STATE = 'server' if INFERENCE_CLIENT is not None else 'not_loaded'
+_model_lock = threading.Lock()
+
+def get_model():
+    """Return the model, loading it on first call (None if unavailable)"""
+    global MODEL, BATCHER, MODEL_STATE
+    if MODEL_STATE in ('ready', 'failed', 'server'):
+        return MODEL
+
+    with _model_lock:
+        if MODEL_STATE in ('not_loaded', 'loading'):
+            MODEL_STATE = 'loading'
+            started = time.perf_counter()
+            model = load_model()
+
+            if model is not None and ENABLE_BATCHING:
+                BATCHER = InferenceBatcher(
+                    model,
+                    max_batch_size=int(os.getenv('INFERENCE_MAX_BATCH_SIZE', 8)),
+                    max_wait_ms=float(os.getenv('INFERENCE_MAX_WAIT_MS', 5)),
+                    stats=INFERENCE_STATS
+                )
+                print(f"✅ Batched inference enabled (max batch {BATCHER.max_batch_size}, "
+                      f"max wait {BATCHER.max_wait * 1000:.0f} ms)")
+
+            MODEL = model
+            MODEL_STATE = 'ready' if model is not None else 'failed'
+            print(f"⏱️ Model {MODEL_STATE} after {time.perf_counter() - started:.1f}s")
+    return MODEL
+
+def start_model_warmup():
+    """Load the model in a background thread"""
+    if MODEL_STATE == 'not_loaded':
+        threading.Thread(target=get_model, name='model-warmup', daemon=True).start()
+
+# Cache of predictions for repeated uploads of the same photo
+PREDICTION_CACHE = None
+if float(os.getenv('PREDICTION_CACHE_MB', 4)) > 0:
+    PREDICTION_CACHE = PredictionCache(
+        int(float(os.getenv('PREDICTION_CACHE_MB', 4)) * 1024 * 1024),
+        cache_dir=os.getenv('PREDICTION_CACHE_DIR')
+    )
+
+# Optional cache of preprocessed tensors keyed by image content hash
+PREPROCESS_CACHE_MB = float(os.getenv('PREPROCESS_CACHE_MB', 0))
+PREPROCESS_CACHE = None
+if PREPROCESS_CACHE_MB > 0:
+    PREPROCESS_CACHE = LRUCache(
+        int(PREPROCESS_CACHE_MB * 1024 * 1024),
+        sizeof=lambda tensor: tensor.element_size() * tensor.nelement()
+    )
+
+def preprocess_bytes(data, digest=None):
+    """Preprocess encoded image bytes into a (1, C, H, W) tensor.
+
+    ``digest`` is the sha256 hex digest of ``data`` if the caller already
+    computed it; it keys the optional preprocessed-tensor cache.
+    """
+    if PREPROCESS_CACHE is not None:
+        digest = digest or hashlib.sha256(data).hexdigest()
+        img_tensor = PREPROCESS_CACHE.get(digest)
+        if img_tensor is not None:
+            return img_tensor
+
+    with stage('decode'):
+        img = decode_image(data)
+    with stage('transform'):
+        img_tensor = get_transform()(img).unsqueeze(0)  # Add batch dimension
+
+    if PREPROCESS_CACHE is not None:
+        PREPROCESS_CACHE.put(digest, img_tensor)
+    return img_tensor
+
+def preprocess_image(image_path, target_size=(224, 224)):
+    """Preprocess image for PyTorch model prediction"""
     try:
-        import torch
-        import torch.nn as nn
-        from torchvision import models
-        
-        model_path = os.getenv('MODEL_PATH', 'C:\\Users\\Hp Pc\\OneDrive\\Desktop\\FYPGrowGuardians\\best_resnet50.pth')
-        
-        if os.path.exists(model_path):
-            print(f"✅ Loading PyTorch model from: {model_path}")
-            
-            try:
-                # Load the checkpoint
-                device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
-                checkpoint = torch.load(model_path, map_location=device)
-                
-                # Extract class names if available
-                if 'classes' in checkpoint:
-                    class_names = checkpoint['classes']
-                    num_classes = len(class_names)
-                    print(f"✅ Found {num_classes} classes: {class_names}")
-                else:
-                    # Default to 4 classes
-                    num_classes = 4
-                    print("⚠️ No class names in checkpoint, using default 4 classes")
-                
-                # Create ResNet50 model
-                model = models.resnet50(pretrained=False)
-                
-                # Adjust the final layer for number of classes
-                model.fc = nn.Linear(model.fc.in_features, num_classes)
-                
-                # Load the trained weights from checkpoint
-                if 'model_state_dict' in checkpoint:
-                    model.load_state_dict(checkpoint['model_state_dict'])
-                else:
-                    model.load_state_dict(checkpoint)
-                
-                model = model.to(device)
-                model.eval()
-                
-                print(f"✅ PyTorch model loaded successfully on {device}")
-                
-                # Store class names for later use
-                if 'classes' in checkpoint:
-                    model.class_names = checkpoint['classes']
-                
-                return model
-            except Exception as e:
-                print(f"⚠️ Error loading PyTorch model: {e}")
-                print("⚠️ Using fallback predictions")
-                return None
-        else:
-            print(f"❌ Model file not found at: {model_path}")
-            return None
+        with open(image_path, 'rb') as f:
+            return preprocess_bytes(f.read())
     except Exception as e:
-        print(f"❌ Error loading model: {e}")
+        print(f"Error preprocessing image: {e}")
         return None
 
-# Load model at module initialization
-MODEL = load_model()
-
-# Disease information database
-DISEASE_INFO = {
-    'healthy': {
-        'name': 'Healthy Plant',
-        'diagnosis': [
-            'No disease symptoms detected',
-            'Plant appears healthy and well-maintained',
-            'Continue regular care and monitoring'
-        ],
-        'tips': [
-            'Maintain current watering schedule',
-            'Ensure adequate sunlight exposure',
-            'Apply organic fertilizer monthly',
-            'Monitor for any changes in appearance'
-        ]
-    },
-    'bacterial_leaf_blight': {
-        'name': 'Bacterial Leaf Blight',
-        'diagnosis': [
-            'Bacterial Leaf Blight infection detected',
-            'Water-soaked lesions visible on leaves',
-            'Yellow to white lesions with wavy margins',
-            'Disease severity: Moderate to High'
-        ],
-        'tips': [
-            'Remove and destroy infected plant parts',
-            'Apply copper-based bactericide',
-            'Improve field drainage to reduce moisture',
-            'Use disease-resistant rice varieties',
-            'Avoid excessive nitrogen fertilization'
-        ]
-    },
-    'brown_spot': {
-        'name': 'Brown Spot',
-        'diagnosis': [
-            'Brown Spot disease identified',
-            'Circular brown spots with gray centers',
-            'Spots may coalesce causing leaf death'
-        ],
-        'tips': [
-            'Apply potassium fertilizer to strengthen plants',
-            'Use fungicides containing mancozeb or copper',
-            'Ensure proper soil nutrients',
-            'Remove infected debris after harvest',
-            'Plant resistant varieties'
-        ]
-    },
-    'leaf_blast': {
-        'name': 'Leaf Blast',
-        'diagnosis': [
-            'Leaf Blast (Rice Blast) infection detected',
-            'Diamond-shaped lesions with gray centers',
-            'Brown margins around lesions',
-            'Can cause severe yield loss'
-        ],
-        'tips': [
-            'Apply systemic fungicides (tricyclazole or azoxystrobin)',
-            'Avoid excessive nitrogen fertilizer',
-            'Maintain proper plant spacing for air circulation',
-            'Use blast-resistant rice varieties',
-            'Monitor fields regularly during humid conditions'
-        ]
-    },
-    'leaf_scald': {
-        'name': 'Leaf Scald',
-        'diagnosis': [
-            'Leaf Scald disease identified',
-            'Large lesions with alternating light and dark green bands',
-            'Zonate pattern characteristic of this disease'
-        ],
-        'tips': [
-            'Plant resistant varieties',
-            'Apply appropriate fungicides',
-            'Improve field sanitation',
-            'Avoid planting in shaded areas',
-            'Ensure balanced fertilization'
-        ]
-    },
-    'narrow_brown_spot': {
-        'name': 'Narrow Brown Spot',
-        'diagnosis': [
-            'Narrow Brown Spot disease detected',
-            'Long narrow brown lesions on leaves',
-            'Lesions run parallel to leaf veins'
-        ],
-        'tips': [
-            'Apply fungicides containing mancozeb',
-            'Improve soil fertility with balanced fertilizer',
-            'Ensure adequate potassium levels',
-            'Remove infected plant debris',
-            'Use healthy seeds for planting'
-        ]
-    },
-    # Legacy tomato disease support (for backward compatibility)
-    'tomato_late_blight': {
-        'name': 'Tomato Late Blight',
-        'diagnosis': [
-            'The plant shows symptoms of Late Blight disease',
-            'Dark brown spots visible on leaves',
-            'White fungal growth detected on leaf undersides',
-            'Disease severity: Moderate to High'
-        ],
-        'tips': [
-            'Remove and destroy all infected plant parts immediately',
-            'Apply copper-based fungicide every 7-10 days',
-            'Improve air circulation around plants',
-            'Avoid overhead watering to reduce moisture on leaves',
-            'Consider resistant tomato varieties for future planting'
-        ]
-    },
-    'tomato_early_blight': {
-        'name': 'Tomato Early Blight',
-        'diagnosis': [
-            'Early Blight infection detected',
-            'Concentric ring patterns visible on older leaves',
-            'Disease spreading from lower to upper leaves'
-        ],
-        'tips': [
-            'Remove affected leaves and stems',
-            'Apply fungicide containing chlorothalonil',
-            'Mulch around plants to prevent soil splash',
-            'Water at the base of plants, not on foliage',
-            'Rotate crops to prevent soil contamination'
-        ]
-    },
-    'bacterial_spot': {
-        'name': 'Bacterial Spot',
-        'diagnosis': [
-            'Bacterial spot disease identified',
-            'Small dark spots with yellow halos on leaves',
-            'Fruit may show raised spots'
-        ],
-        'tips': [
-            'Remove and destroy infected plant material',
-            'Apply copper-based bactericide',
-            'Avoid working with plants when wet',
-            'Use drip irrigation instead of sprinklers',
-            'Plant disease-resistant varieties'
-        ]
-    }
-}
+# /api/scan/batch decodes images on this many threads and runs the model
+# on at most SCAN_BATCH_FORWARD_SIZE images per forward pass
+SCAN_BATCH_FORWARD_SIZE = int(os.getenv('SCAN_BATCH_FORWARD_SIZE', 32))
+DECODE_POOL = ThreadPoolExecutor(max_workers=int(os.getenv('SCAN_BATCH_DECODE_WORKERS', 4)),
+                                 thread_name_prefix='scan-decode')
 
-def preprocess_image(image_path, target_size=(224, 224)):
-    """Preprocess image for PyTorch model prediction"""
+def _try_preprocess(data, digest):
     try:
-        import torch
-        from torchvision import transforms
-        
-        img = Image.open(image_path)
-        img = img.convert('RGB')
-        
-        # Define PyTorch transforms
-        transform = transforms.Compose([
-            transforms.Resize(256),
-            transforms.CenterCrop(224),
-            transforms.ToTensor(),
-            transforms.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225])
-        ])
-        
-        img_tensor = transform(img).unsqueeze(0)  # Add batch dimension
-        return img_tensor
+        return preprocess_bytes(data, digest)
     except Exception as e:
         print(f"Error preprocessing image: {e}")
         return None
 
+def prediction_from_probabilities(probabilities, class_names):
+    """Prediction dict (disease_key, confidence, is_healthy) for one probability vector"""
+    confidence = max(probabilities)
+    predicted_class = probabilities.index(confidence)
+    confidence = float(confidence * 100)
+    
+    # Get class names from model if available, otherwise use defaults
+    if class_names:
+        disease_classes = class_names
+        print(f"✅ Using model class names: {disease_classes}")
+    else:
+        # Default disease classes
+        disease_classes = ['healthy', 'tomato_late_blight', 'tomato_early_blight', 'bacterial_spot']
+        print("⚠️ Using default class names")
+    
+    if predicted_class < len(disease_classes):
+        disease_key = disease_classes[predicted_class]
+    else:
+        disease_key = 'healthy'
+    
+    # Normalize disease key to match DISEASE_INFO keys
+    disease_key_lower = disease_key.lower().replace(' ', '_')
+    
+    # Check if the key exists in DISEASE_INFO, otherwise use a generic key
+    if disease_key_lower not in DISEASE_INFO:
+        print(f"⚠️ Disease '{disease_key}' not in DISEASE_INFO, using generic mapping")
+        disease_key_lower = 'healthy' if 'healthy' in disease_key.lower() else 'tomato_late_blight'
+    
+    return {
+        'disease_key': disease_key_lower,
+        'confidence': confidence,
+        'is_healthy': 'healthy' in disease_key.lower()
+    }
+
+def format_report_list_item(row):
+    """Reports list entry for (id, image_path, is_healthy, disease_name, confidence_score,
+    created_at, disease_key, catalog_version)"""
+    return {
+        'id': str(row[0]),
+        'image': f"/uploads/{os.path.basename(row[1])}?size=thumb",
+        'imageOriginal': f"/uploads/{os.path.basename(row[1])}",
+        'title': report_title(row[6], row[7], row[3]),
+        'date': row[5].strftime('%Y-%m-%d'),
+        'isHealthy': bool(row[2]),
+        'confidence': float(row[4]) if row[4] else 0
+    }
+
+def format_report_details(row):
+    """diagnosisData for (id, image_path, is_healthy, disease_name, confidence_score,
+    diagnosis_details, treatment_tips, created_at, disease_key, catalog_version)"""
+    disease_name, diagnosis_points, tips_points = report_text(row[8], row[9], row[3], row[5], row[6])
+
+    return {
+        'id': str(row[0]),
+        'image': f"/uploads/{os.path.basename(row[1])}?size=preview",
+        'imageOriginal': f"/uploads/{os.path.basename(row[1])}",
+        'isHealthy': bool(row[2]),
+        'diseaseName': disease_name,
+        'diagnosisPoints': diagnosis_points,
+        'tipsPoints': tips_points,
+        'date': row[7].isoformat()
+    }
+
+REPORT_DETAIL_COLUMNS = """id, image_path, is_healthy, disease_name, confidence_score,
+    diagnosis_details, treatment_tips, created_at, disease_key, catalog_version"""
+
+# Insert a report and take a reference on its image blob (as
+# BlobStore.add_ref, skipped for legacy file names) in one statement,
+# returning the row for format_report_details
+SAVE_REPORT = PreparedStatement('report_save', f"""
+    WITH report AS (
+        INSERT INTO disease_reports
+        (user_id, image_path, is_healthy, disease_key, catalog_version, confidence_score)
+        VALUES (%s, %s, %s, %s, %s, %s)
+        RETURNING {REPORT_DETAIL_COLUMNS}
+    ),
+    blob_ref AS (
+        INSERT INTO image_blobs (name, refcount)
+        SELECT %s, 1 WHERE %s
+        ON CONFLICT (name) DO UPDATE SET refcount = image_blobs.refcount + EXCLUDED.refcount
+    )
+    SELECT * FROM report
+""")
+
+# GET /api/reports page size (default and upper bound for ?limit=)
+REPORTS_PAGE_SIZE = int(os.getenv('REPORTS_PAGE_SIZE', 50))
+REPORTS_MAX_PAGE_SIZE = int(os.getenv('REPORTS_MAX_PAGE_SIZE', 200))
+
+
 class DiseaseDetectionService:
+    @staticmethod
+    def run_model(img_tensor):
+        """Class probabilities for one preprocessed (1, C, H, W) image"""
+        model = get_model()
+        if BATCHER is not None:
+            # The forward pass runs on the batcher thread; time the wait for it
+            with stage('batch_wait'):
+                return BATCHER.predict(img_tensor)
+
+        start = time.perf_counter()
+        probabilities = predict_probabilities(model, img_tensor)[0]
+        elapsed = time.perf_counter() - start
+        INFERENCE_STATS.record(1, elapsed, [elapsed])
+        return probabilities
+
     @staticmethod
     def predict_disease(image_path):
-        """Predict disease from plant image using PyTorch"""
+        """Predict disease from a plant image file on disk"""
         try:
-            import torch
-            
-            if MODEL is None:
+            with open(image_path, 'rb') as f:
+                image_data = f.read()
+        except OSError as e:
+            print(f"Error reading image: {e}")
+            image_data = b''
+        return DiseaseDetectionService.predict_disease_bytes(image_data)
+
+    @staticmethod
+    def predict_disease_bytes(image_data, digest=None):
+        """Predict disease from encoded image bytes using PyTorch.
+
+        ``digest`` is the SHA-256 hex digest of ``image_data`` when the
+        caller already has it.
+        """
+        try:
+            with stage('load_model'):
+                model = get_model()
+            if model is None and INFERENCE_CLIENT is None:
                 # Return mock prediction if model not loaded
                 print("⚠️ Model not loaded, returning mock prediction")
                 return {
@@ -253,52 +272,38 @@ class DiseaseDetectionService:
                     'is_healthy': False
                 }
             
-            # Preprocess image
-            img_tensor = preprocess_image(image_path)
-            if img_tensor is None:
-                raise Exception("Failed to preprocess image")
-            
-            # Make prediction
-            device = next(MODEL.parameters()).device
-            img_tensor = img_tensor.to(device)
-            
-            with torch.no_grad():
-                outputs = MODEL(img_tensor)
-                probabilities = torch.nn.functional.softmax(outputs, dim=1)
-                confidence, predicted_class = torch.max(probabilities, 1)
-                
-            predicted_class = predicted_class.item()
-            confidence = float(confidence.item() * 100)
-            
-            # Get class names from model if available, otherwise use defaults
-            if hasattr(MODEL, 'class_names'):
-                disease_classes = MODEL.class_names
-                print(f"✅ Using model class names: {disease_classes}")
+            digest = digest or hashlib.sha256(image_data).hexdigest()
+
+            # Same photo and same checkpoint always give the same answer
+            if INFERENCE_CLIENT is not None:
+                checkpoint_id = INFERENCE_CLIENT.info()['checkpoint_id']
             else:
-                # Default disease classes
-                disease_classes = ['healthy', 'tomato_late_blight', 'tomato_early_blight', 'bacterial_spot']
-                print("⚠️ Using default class names")
-            
-            if predicted_class < len(disease_classes):
-                disease_key = disease_classes[predicted_class]
+                checkpoint_id = getattr(model, 'checkpoint_id', None)
+            cache_key = f"{digest}-{checkpoint_id or 'default'}"
+            if PREDICTION_CACHE is not None:
+                with stage('cache'):
+                    cached = PREDICTION_CACHE.get(cache_key)
+                if cached is not None:
+                    return dict(cached)
+
+            # Make prediction
+            if INFERENCE_CLIENT is not None:
+                start = time.perf_counter()
+                with stage('inference_server'):
+                    probabilities, class_names, checkpoint_id = INFERENCE_CLIENT.predict(image_data)
+                elapsed = time.perf_counter() - start
+                INFERENCE_STATS.record(1, elapsed, [elapsed])
+                # Cache under the checkpoint that actually answered
+                cache_key = f"{digest}-{checkpoint_id or 'default'}"
             else:
-                disease_key = 'healthy'
-            
-            # Normalize disease key to match DISEASE_INFO keys
-            disease_key_lower = disease_key.lower().replace(' ', '_')
-            
-            # Check if the key exists in DISEASE_INFO, otherwise use a generic key
-            if disease_key_lower not in DISEASE_INFO:
-                print(f"⚠️ Disease '{disease_key}' not in DISEASE_INFO, using generic mapping")
-                disease_key_lower = 'healthy' if 'healthy' in disease_key.lower() else 'tomato_late_blight'
-            
-            is_healthy = 'healthy' in disease_key.lower()
-            
-            return {
-                'disease_key': disease_key_lower,
-                'confidence': confidence,
-                'is_healthy': is_healthy
-            }
+                img_tensor = preprocess_bytes(image_data, digest)
+                probabilities = DiseaseDetectionService.run_model(img_tensor).tolist()
+                class_names = getattr(model, 'class_names', None)
+
+            prediction = prediction_from_probabilities(probabilities, class_names)
+            if PREDICTION_CACHE is not None:
+                PREDICTION_CACHE.put(cache_key, prediction)
+            return dict(prediction)
             
         except Exception as e:
             print(f"Error predicting disease: {e}")
@@ -309,35 +314,168 @@ class DiseaseDetectionService:
                 'is_healthy': False
             }
 
+    @staticmethod
+    def run_model_batch(img_tensors):
+        """Class probabilities for many (1, C, H, W) images, stacked into few forward passes"""
+        import torch
+
+        model = get_model()
+        rows = []
+        for start in range(0, len(img_tensors), SCAN_BATCH_FORWARD_SIZE):
+            batch = torch.cat(img_tensors[start:start + SCAN_BATCH_FORWARD_SIZE])
+            forward_start = time.perf_counter()
+            probabilities = predict_probabilities(model, batch)
+            elapsed = time.perf_counter() - forward_start
+            INFERENCE_STATS.record(len(batch), elapsed, [elapsed] * len(batch))
+            rows.extend(probabilities.tolist())
+        return rows
+
+    @staticmethod
+    def predict_disease_batch(images):
+        """Predict diseases for many encoded images at once.
+
+        ``images`` is a list of (image_data, digest) pairs, where digest may
+        be None. Images are decoded in parallel on DECODE_POOL and classified
+        together. Returns one prediction per image, in order; images that
+        cannot be decoded get ``{'error': message}`` instead.
+        """
+        with stage('load_model'):
+            model = get_model()
+        if model is None and INFERENCE_CLIENT is None:
+            print("⚠️ Model not loaded, returning mock predictions")
+            return [{
+                'disease_key': 'tomato_late_blight',
+                'confidence': 87.5,
+                'is_healthy': False
+            } for _ in images]
+
+        digests = [digest or hashlib.sha256(data).hexdigest() for data, digest in images]
+        if INFERENCE_CLIENT is not None:
+            checkpoint_id = INFERENCE_CLIENT.info()['checkpoint_id']
+        else:
+            checkpoint_id = getattr(model, 'checkpoint_id', None)
+        cache_keys = [f"{digest}-{checkpoint_id or 'default'}" for digest in digests]
+
+        predictions = [None] * len(images)
+        pending = []
+        with stage('cache'):
+            for index, cache_key in enumerate(cache_keys):
+                cached = PREDICTION_CACHE.get(cache_key) if PREDICTION_CACHE is not None else None
+                if cached is not None:
+                    predictions[index] = dict(cached)
+                else:
+                    pending.append(index)
+        if not pending:
+            return predictions
+
+        if INFERENCE_CLIENT is not None:
+            start = time.perf_counter()
+            with stage('inference_server'):
+                rows, class_names, checkpoint_id = INFERENCE_CLIENT.predict_batch(
+                    [images[index][0] for index in pending])
+            elapsed = time.perf_counter() - start
+            INFERENCE_STATS.record(len(pending), elapsed, [elapsed] * len(pending))
+            # Cache under the checkpoint that actually answered
+            cache_keys = [f"{digest}-{checkpoint_id or 'default'}" for digest in digests]
+        else:
+            with stage('preprocess'):
+                tensors = list(DECODE_POOL.map(_try_preprocess,
+                                               [images[index][0] for index in pending],
+                                               [digests[index] for index in pending]))
+            decoded = [tensor for tensor in tensors if tensor is not None]
+            probabilities = iter(DiseaseDetectionService.run_model_batch(decoded) if decoded else [])
+            rows = [next(probabilities) if tensor is not None else None for tensor in tensors]
+            class_names = getattr(model, 'class_names', None)
+
+        for index, row in zip(pending, rows):
+            if row is None:
+                predictions[index] = {'error': 'Could not read image'}
+                continue
+            prediction = prediction_from_probabilities(row, class_names)
+            if PREDICTION_CACHE is not None:
+                PREDICTION_CACHE.put(cache_keys[index], prediction)
+            predictions[index] = dict(prediction)
+        return predictions
+
+    @staticmethod
+    def summarize_predictions(predictions):
+        """Plot-level summary of the predictions of one batch scan"""
+        diagnosed = [p for p in predictions if 'error' not in p]
+        healthy_count = sum(1 for p in diagnosed if p['is_healthy'])
+
+        by_disease = {}
+        for prediction in diagnosed:
+            if not prediction['is_healthy']:
+                by_disease.setdefault(prediction['disease_key'], []).append(prediction['confidence'])
+
+        diseases = []
+        for disease_key, confidences in sorted(by_disease.items(), key=lambda item: -len(item[1])):
+            disease_data = DISEASE_INFO.get(disease_key, DISEASE_INFO['tomato_late_blight'])
+            diseases.append({
+                'diseaseKey': disease_key,
+                'diseaseName': disease_data['name'],
+                'count': len(confidences),
+                'percent': round(100 * len(confidences) / len(diagnosed), 1),
+                'averageConfidence': round(sum(confidences) / len(confidences), 2)
+            })
+
+        dominant = None
+        if diseases:
+            dominant_data = DISEASE_INFO.get(diseases[0]['diseaseKey'], DISEASE_INFO['tomato_late_blight'])
+            dominant = {
+                **diseases[0],
+                'diagnosisPoints': dominant_data['diagnosis'],
+                'tipsPoints': dominant_data['tips']
+            }
+
+        return {
+            'totalImages': len(predictions),
+            'diagnosedImages': len(diagnosed),
+            'failedImages': len(predictions) - len(diagnosed),
+            'healthyCount': healthy_count,
+            'diseasedCount': len(diagnosed) - healthy_count,
+            'healthyPercent': round(100 * healthy_count / len(diagnosed), 1) if diagnosed else 0.0,
+            'isHealthy': bool(diagnosed) and healthy_count == len(diagnosed),
+            'diseases': diseases,
+            'dominantDisease': dominant
+        }
+
     @staticmethod
     def save_report(user_id, image_path, prediction):
-        """Save disease detection report to database"""
+        """Save disease detection report to database.
+
+        The result carries the saved report's ``diagnosisData`` so callers
+        need not read it back.
+        """
         try:
-            disease_data = DISEASE_INFO.get(prediction['disease_key'], DISEASE_INFO['healthy'])
+            # The text is read from the catalog, only its key is stored
+            disease_key = prediction['disease_key']
+            if disease_key not in DISEASE_INFO:
+                disease_key = 'healthy'
+            
+            # The report holds a reference on its image blob
+            image_name = os.path.basename(image_path)
             
             cursor = db.connection.cursor()
-            cursor.execute("""
-                INSERT INTO disease_reports 
-                (user_id, image_path, is_healthy, disease_name, confidence_score, 
-                 diagnosis_details, treatment_tips)
-                VALUES (%s, %s, %s, %s, %s, %s, %s)
-            """, (
+            SAVE_REPORT.execute(cursor, (
                 user_id,
                 image_path,
                 prediction['is_healthy'],
-                disease_data['name'],
+                disease_key,
+                CATALOG_VERSION,
                 prediction['confidence'],
-                json.dumps(disease_data['diagnosis']),
-                json.dumps(disease_data['tips'])
+                image_name,
+                BlobStore.is_blob(image_name)
             ))
+            report_row = cursor.fetchone()
             
             db.connection.commit()
-            report_id = cursor.lastrowid
             cursor.close()
             
             return {
                 'success': True,
-                'report_id': report_id,
+                'report_id': report_row[0],
+                'diagnosisData': format_report_details(report_row),
                 'message': 'Report saved successfully'
             }
             
@@ -349,38 +487,57 @@ class DiseaseDetectionService:
             }
 
     @staticmethod
-    def get_user_reports(user_id):
-        """Get all reports for a user"""
+    def get_user_reports(user_id, limit=None, after=None):
+        """Get one page of a user's reports, newest first.
+
+        ``after`` is the ``nextCursor`` of the previous page. Pages are read
+        by keyset on (created_at, id), which walks the
+        idx_disease_user_recent index instead of sorting every report.
+        """
         try:
-            cursor = db.connection.cursor()
-            cursor.execute("""
-                SELECT id, image_path, is_healthy, disease_name, 
-                       confidence_score, created_at
-                FROM disease_reports
-                WHERE user_id = %s
-                ORDER BY created_at DESC
-            """, (user_id,))
-            
-            reports = cursor.fetchall()
-            cursor.close()
+            limit = min(limit or REPORTS_PAGE_SIZE, REPORTS_MAX_PAGE_SIZE)
+            params = [user_id]
+            keyset = ""
+            if after:
+                keyset = "AND (created_at, id) < (%s, %s)"
+                params.extend(decode_cursor(after))
+            # One extra row tells us whether there is a next page
+            params.append(limit + 1)
 
-            # Format reports for response
-            formatted_reports = []
-            for report in reports:
-                formatted_reports.append({
-                    'id': str(report[0]),
-                    'image': f"/uploads/{os.path.basename(report[1])}",
-                    'title': report[3],
-                    'date': report[5].strftime('%Y-%m-%d'),
-                    'isHealthy': bool(report[2]),
-                    'confidence': float(report[4]) if report[4] else 0
-                })
+            # Named (server-side) cursor streams rows instead of fetchall()
+            with db.connection.cursor(name='user_reports') as cursor:
+                cursor.itersize = min(limit + 1, 500)
+                cursor.execute(f"""
+                    SELECT id, image_path, is_healthy, disease_name, 
+                           confidence_score, created_at, disease_key, catalog_version
+                    FROM disease_reports
+                    WHERE user_id = %s {keyset}
+                    ORDER BY created_at DESC, id DESC
+                    LIMIT %s
+                """, params)
+
+                # Format reports for response
+                formatted_reports = []
+                next_cursor = None
+                last = None
+                for report in cursor:
+                    if len(formatted_reports) == limit:
+                        next_cursor = encode_cursor(last[5], last[0])
+                        break
+                    last = report
+                    formatted_reports.append(format_report_list_item(report))
             
             return {
                 'success': True,
-                'reports': formatted_reports
+                'reports': formatted_reports,
+                'nextCursor': next_cursor
             }
             
+        except ValueError:
+            return {
+                'success': False,
+                'message': 'Invalid cursor'
+            }
         except Exception as e:
             print(f"Error fetching reports: {e}")
             return {
@@ -393,9 +550,8 @@ class DiseaseDetectionService:
         """Get detailed report by ID"""
         try:
             cursor = db.connection.cursor()
-            cursor.execute("""
-                SELECT id, image_path, is_healthy, disease_name, confidence_score,
-                       diagnosis_details, treatment_tips, created_at
+            cursor.execute(f"""
+                SELECT {REPORT_DETAIL_COLUMNS}
                 FROM disease_reports
                 WHERE id = %s AND user_id = %s
             """, (report_id, user_id))
@@ -409,33 +565,9 @@ class DiseaseDetectionService:
                     'message': 'Report not found'
                 }
             
-            # Convert to dict for easier access
-            report = {
-                'id': report_row[0],
-                'image_path': report_row[1],
-                'is_healthy': report_row[2],
-                'disease_name': report_row[3],
-                'confidence_score': report_row[4],
-                'diagnosis_details': report_row[5],
-                'treatment_tips': report_row[6],
-                'created_at': report_row[7]
-            }
-
-            # Parse JSON fields
-            diagnosis_points = json.loads(report['diagnosis_details']) if report['diagnosis_details'] else []
-            tips_points = json.loads(report['treatment_tips']) if report['treatment_tips'] else []
-
             return {
                 'success': True,
-                'diagnosisData': {
-                    'id': str(report['id']),
-                    'image': f"/uploads/{os.path.basename(report['image_path'])}",
-                    'isHealthy': bool(report['is_healthy']),
-                    'diseaseName': report['disease_name'],
-                    'diagnosisPoints': diagnosis_points,
-                    'tipsPoints': tips_points,
-                    'date': report['created_at'].isoformat()
-                }
+                'diagnosisData': format_report_details(report_row)
             }
             
         except Exception as e:
@@ -449,28 +581,29 @@ class DiseaseDetectionService:
     def delete_report(report_id, user_id):
         """Delete a report"""
         try:
-            # Get report to delete image file
+            # Delete from database, returning the image it referenced
             cursor = db.connection.cursor()
             cursor.execute("""
-                SELECT image_path FROM disease_reports
+                DELETE FROM disease_reports
                 WHERE id = %s AND user_id = %s
+                RETURNING image_path
             """, (report_id, user_id))
             
             report_row = cursor.fetchone()
             
             if report_row:
-                image_path = report_row[0]
-                # Delete image file
-                if os.path.exists(image_path):
-                    os.remove(image_path)
-                
-                # Delete from database
-                cursor.execute("""
-                    DELETE FROM disease_reports
-                    WHERE id = %s AND user_id = %s
-                """, (report_id, user_id))
+                # Drop the report's blob reference in the same transaction
+                image_name = os.path.basename(report_row[0])
+                unreferenced = BlobStore.release_ref(cursor, image_name) is not False
                 
                 db.connection.commit()
+                
+                # Delete the image and its thumbnail/preview once unused,
+                # unless a recent scan of the same photo may still be saved
+                if unreferenced and BLOBS.removable(cursor, [image_name]):
+                    BLOBS.unlink(image_name)
+                    DERIVATIVES.remove(image_name)
+                db.connection.rollback()
                 cursor.close()
                 
                 return {
@@ -486,6 +619,7 @@ class DiseaseDetectionService:
 
         except Exception as e:
             print(f"Error deleting report: {e}")
+            db.connection.rollback()
             return {
                 'success': False,
                 'message': 'Failed to delete report'
@@ -493,43 +627,45 @@ class DiseaseDetectionService:
 
     @staticmethod
     def delete_all_reports(user_id):
-        """Delete all reports for a user"""
+        """Delete all reports for a user.
+
+        The rows go in one transaction; their image files are unlinked
+        afterwards by a background job whose id is returned as ``jobId``.
+        """
         try:
-            # Get all reports to delete image files
+            # Delete all reports from database, returning their images
             cursor = db.connection.cursor()
             cursor.execute("""
-                SELECT image_path FROM disease_reports
+                DELETE FROM disease_reports
                 WHERE user_id = %s
+                RETURNING image_path
             """, (user_id,))
             
             reports = cursor.fetchall()
+            deleted_count = len(reports)
             
-            # Delete all image files
-            for report in reports:
-                image_path = report[0]
-                if os.path.exists(image_path):
-                    try:
-                        os.remove(image_path)
-                    except:
-                        pass
-            
-            # Delete all reports from database
-            cursor.execute("""
-                DELETE FROM disease_reports
-                WHERE user_id = %s
-            """, (user_id,))
+            # Drop their blob references and record the files nothing
+            # references anymore, all in the same transaction
+            unreferenced = BlobStore.release_refs(
+                cursor, [os.path.basename(report[0]) for report in reports])
+            job_id = DELETION_JOBS.create(cursor, user_id, unreferenced)
             
             db.connection.commit()
-            deleted_count = cursor.rowcount
             cursor.close()
             
+            # Unlink the files in the background
+            DELETION_JOBS.start(job_id, unreferenced)
+            
             return {
                 'success': True,
-                'message': f'{deleted_count} reports deleted successfully'
+                'message': f'{deleted_count} reports deleted successfully',
+                'deletedCount': deleted_count,
+                'jobId': job_id
             }
 
         except Exception as e:
             print(f"Error deleting all reports: {e}")
+            db.connection.rollback()
             return {
                 'success': False,
                 'message': 'Failed to delete reports'
@@ -0,0 +1,74 @@
+"""
+JSON encoding with pre-encoded fragments.
+
+Static values that many responses share, such as the disease catalog's
+diagnosis and tips lists (disease_catalog.py), are encoded once into Raw
+fragments. dumps() copies a Raw into the output as it is and encodes the
+per-request fields around it with orjson when installed, falling back to
+the json module.
+"""
+import json
+from decimal import Decimal
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _default(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+if orjson is not None:
+    def _encode(value):
+        return orjson.dumps(value, default=_default)
+else:
+    def _encode(value):
+        return json.dumps(value, ensure_ascii=False, separators=(',', ':'),
+                          default=_default).encode()
+
+
+if orjson is not None and hasattr(orjson, 'Fragment'):
+    # orjson >= 3.9 splices fragments itself
+    Raw = orjson.Fragment
+
+    def dumps(obj):
+        """UTF-8 JSON bytes of obj, with Raw values copied in as they are"""
+        return _encode(obj)
+else:
+    class Raw:
+        """Bytes that already are JSON"""
+        __slots__ = ('contents',)
+
+        def __init__(self, contents):
+            self.contents = contents
+
+    _NESTED = (Raw, dict, list, tuple)
+
+    def dumps(obj):
+        """UTF-8 JSON bytes of obj, with Raw values copied in as they are"""
+        if isinstance(obj, Raw):
+            return obj.contents
+        if isinstance(obj, dict):
+            # Scalars are encoded in one call, then containers are spliced in
+            scalars = {}
+            members = []
+            for key, value in obj.items():
+                if isinstance(value, _NESTED):
+                    members.append(_encode(str(key)) + b':' + dumps(value))
+                else:
+                    scalars[key] = value
+            if scalars:
+                members.insert(0, _encode(scalars)[1:-1])
+            return b'{' + b','.join(members) + b'}'
+        if isinstance(obj, (list, tuple)) and any(isinstance(value, _NESTED) for value in obj):
+            return b'[' + b','.join(dumps(value) for value in obj) + b']'
+        return _encode(obj)
+
+
+def raw(value):
+    """Encode a static value once for splicing into many responses"""
+    return Raw(dumps(value))
@@ -0,0 +1,134 @@
+import hashlib
+import io
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image, ImageOps
+from lru_cache import TTLCache
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Longest edge in pixels of each derivative served as /uploads/<name>?size=
+DERIVATIVE_SIZES = {
+    'thumb': int(os.getenv('THUMBNAIL_SIZE', 160)),
+    'preview': int(os.getenv('PREVIEW_SIZE', 800))
+}
+
+
+class DerivativeStore:
+    """WebP thumbnails and previews of uploads, generated once and cached on disk.
+
+    Derivatives live in ``cache_dir/<size>/<ab>/<cd>/<name>.webp``, sharded
+    by a hash of the name. They are created on first request (or ahead of
+    time with generate_async()) and never change afterwards, since upload
+    names are unique. Each file's strong ETag is the SHA-256 of its bytes,
+    remembered for the most recently served ``max_etags`` files.
+    """
+
+    def __init__(self, cache_dir, quality=80, workers=1, max_etags=50000):
+        self.cache_dir = cache_dir
+        self.quality = quality
+        self.generated = 0
+
+        self._etags = TTLCache(max_etags)  # path -> etag
+        self._locks = {}  # path -> [Lock, threads using it] while generating
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='derivatives')
+
+    def path_for(self, filename, size):
+        name = os.path.basename(filename)
+        shard = hashlib.sha1(name.encode()).hexdigest()
+        return os.path.join(self.cache_dir, size, shard[:2], shard[2:4], f"{name}.webp")
+
+    def render(self, image_data, size):
+        """Encode ``image_data`` as a WebP no larger than DERIVATIVE_SIZES[size]"""
+        img = Image.open(io.BytesIO(image_data))
+        img.draft('RGB', (DERIVATIVE_SIZES[size], DERIVATIVE_SIZES[size]))
+        img = ImageOps.exif_transpose(img)
+        if img.mode not in ('RGB', 'RGBA'):
+            img = img.convert('RGBA' if 'transparency' in img.info else 'RGB')
+        img.thumbnail((DERIVATIVE_SIZES[size], DERIVATIVE_SIZES[size]), Image.LANCZOS)
+
+        out = io.BytesIO()
+        img.save(out, 'WEBP', quality=self.quality, method=4)
+        return out.getvalue()
+
+    def get(self, filename, size, load_original):
+        """Path and ETag of the derivative, creating it if needed.
+
+        ``load_original()`` returns the original bytes (or None when the
+        upload does not exist). Returns (None, None) if there is no original.
+        """
+        path = self.path_for(filename, size)
+        etag = self._etags.get(path)
+        if etag is not None:
+            return path, etag
+
+        # The entry stays until the last thread waiting on it is done, so a
+        # late request reuses it instead of rendering the derivative again
+        with self._lock:
+            entry = self._locks.setdefault(path, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                etag = self._etags.get(path)
+                if etag is not None:
+                    return path, etag
+
+                if os.path.exists(path):
+                    with open(path, 'rb') as f:
+                        data = f.read()
+                else:
+                    original = load_original()
+                    if original is None:
+                        return None, None
+                    data = self.render(original, size)
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    tmp_path = f"{path}.{threading.get_ident()}.tmp"
+                    with open(tmp_path, 'wb') as f:
+                        f.write(data)
+                    os.replace(tmp_path, path)
+                    self.generated += 1
+
+                etag = hashlib.sha256(data).hexdigest()
+                self._etags.put(path, etag)
+        finally:
+            with self._lock:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    del self._locks[path]
+        return path, etag
+
+    def generate_async(self, filename, load_original):
+        """Create every derivative of ``filename`` in the background"""
+        def generate():
+            for size in DERIVATIVE_SIZES:
+                try:
+                    self.get(filename, size, load_original)
+                except Exception as e:
+                    print(f"❌ Failed to create {size} for {filename}: {e}")
+        return self._executor.submit(generate)
+
+    def remove(self, filename):
+        """Delete the cached derivatives of ``filename``"""
+        for size in DERIVATIVE_SIZES:
+            path = self.path_for(filename, size)
+            self._etags.pop(path)
+            if os.path.exists(path):
+                os.remove(path)
+
+    def stats(self):
+        return {
+            'sizes': DERIVATIVE_SIZES,
+            'generated': self.generated,
+            'etags': self._etags.stats()
+        }
+
+
+# Shared by the upload routes and report deletion
+DERIVATIVES = DerivativeStore(
+    os.getenv('DERIVATIVE_CACHE_DIR',
+              os.path.join(os.getenv('UPLOAD_FOLDER', 'uploads'), 'derivatives')),
+    quality=int(os.getenv('DERIVATIVE_QUALITY', 80))
+)
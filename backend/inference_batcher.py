@@ -0,0 +1,132 @@
+import queue
+import threading
+import time
+from collections import defaultdict, deque
+from concurrent.futures import Future
+from metrics import MODEL_INFERENCE
+
+
+class InferenceStats:
+    """Per-batch-size throughput and latency counters.
+
+    Keeps a bounded window of recent samples per batch size so percentiles
+    reflect current load rather than the whole process lifetime.
+    """
+
+    def __init__(self, window=1000):
+        self._lock = threading.Lock()
+        self._window = window
+        self.reset()
+
+    def reset(self):
+        """Drop all recorded samples"""
+        with self._lock:
+            self._batches = defaultdict(int)
+            self._forward_seconds = defaultdict(float)
+            self._forward_samples = defaultdict(lambda: deque(maxlen=self._window))
+            self._latency_samples = defaultdict(lambda: deque(maxlen=self._window))
+
+    def record(self, batch_size, forward_seconds, latencies):
+        """Record one forward pass and the end-to-end latency of each request"""
+        MODEL_INFERENCE.observe(forward_seconds, str(batch_size))
+        with self._lock:
+            self._batches[batch_size] += 1
+            self._forward_seconds[batch_size] += forward_seconds
+            self._forward_samples[batch_size].append(forward_seconds)
+            self._latency_samples[batch_size].extend(latencies)
+
+    @staticmethod
+    def _percentile(samples, pct):
+        if not samples:
+            return 0.0
+        ordered = sorted(samples)
+        index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+        return ordered[index]
+
+    def snapshot(self):
+        """Stats per batch size, sorted by batch size"""
+        with self._lock:
+            result = []
+            for batch_size in sorted(self._batches):
+                batches = self._batches[batch_size]
+                items = batches * batch_size
+                forward_total = self._forward_seconds[batch_size]
+                latencies = list(self._latency_samples[batch_size])
+                forwards = list(self._forward_samples[batch_size])
+                result.append({
+                    'batch_size': batch_size,
+                    'batches': batches,
+                    'images': items,
+                    'images_per_second': round(items / forward_total, 2) if forward_total else 0,
+                    'forward_p50_ms': round(self._percentile(forwards, 50) * 1000, 2),
+                    'latency_p50_ms': round(self._percentile(latencies, 50) * 1000, 2),
+                    'latency_p99_ms': round(self._percentile(latencies, 99) * 1000, 2)
+                })
+            return result
+
+
+class InferenceBatcher:
+    """Dynamic batching scheduler in front of a PyTorch classifier.
+
+    Callers submit single preprocessed images; a background thread gathers
+    whatever arrives within ``max_wait_ms`` of the first request (up to
+    ``max_batch_size`` images), runs one forward pass and resolves each
+    caller's future with its own row of class probabilities.
+    """
+
+    def __init__(self, model, max_batch_size=8, max_wait_ms=5, stats=None):
+        self.model = model
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self.stats = stats or InferenceStats()
+
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name='inference-batcher', daemon=True)
+        self._thread.start()
+
+    def submit(self, img_tensor):
+        """Queue a (1, C, H, W) tensor; returns a Future of its probabilities"""
+        future = Future()
+        self._queue.put((img_tensor, future, time.perf_counter()))
+        return future
+
+    def predict(self, img_tensor, timeout=None):
+        """Blocking helper: submit and wait for the probability vector"""
+        return self.submit(img_tensor).result(timeout=timeout)
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        import torch
+        from model_runtime import predict_probabilities
+
+        while True:
+            batch = self._collect()
+            futures = [item[1] for item in batch]
+            try:
+                inputs = torch.cat([item[0] for item in batch])
+
+                start = time.perf_counter()
+                probabilities = predict_probabilities(self.model, inputs)
+                done = time.perf_counter()
+
+                for i, future in enumerate(futures):
+                    future.set_result(probabilities[i])
+
+                self.stats.record(len(batch), done - start, [done - item[2] for item in batch])
+            except Exception as e:
+                print(f"❌ Batched inference failed: {e}")
+                for future in futures:
+                    if not future.done():
+                        future.set_exception(e)
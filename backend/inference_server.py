@@ -0,0 +1,275 @@
+"""
+Standalone model-serving process pool.
+
+Runs a fixed number of model worker processes behind a Unix socket so the
+Flask/gunicorn workers never load torch themselves. Web concurrency
+(gunicorn workers/threads) and inference concurrency (INFERENCE_WORKERS x
+INFERENCE_THREADS) can then be scaled independently.
+
+    INFERENCE_AUTHKEY=... python inference_server.py --workers 2 --threads 2
+
+and start the API with INFERENCE_MODE=server and the same INFERENCE_AUTHKEY.
+Requests are pickled, so the socket lives in a directory only the server's
+user can enter and every connection must prove it knows the key.
+"""
+import argparse
+import multiprocessing
+import os
+import signal
+import socket
+import stat
+import time
+from multiprocessing.connection import (Connection, Listener, answer_challenge,
+                                        deliver_challenge)
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+SOCKET_PATH = os.getenv('INFERENCE_SOCKET', '/tmp/growguardians-inference/inference.sock')
+# Shared secret of the server and its web workers; never the JWT SECRET_KEY
+AUTHKEY = os.getenv('INFERENCE_AUTHKEY', '').encode()
+
+# Seconds the server's checkpoint id is trusted for prediction cache keys
+# before it is asked again (a restarted server may serve a new model)
+INFO_TTL = float(os.getenv('INFERENCE_INFO_TTL', 5))
+
+
+class InferenceClient:
+    """Talks to the inference server from a web worker.
+
+    Opens one short-lived Unix socket connection per prediction, so any
+    idle model process can pick it up.
+    """
+
+    def __init__(self, address=SOCKET_PATH, authkey=AUTHKEY, timeout=30, info_ttl=INFO_TTL):
+        self.address = address
+        self.authkey = authkey
+        self.timeout = timeout
+        self.info_ttl = info_ttl
+        # (class names, checkpoint id, monotonic time) of the latest answer,
+        # replaced as a whole so readers never mix two answers
+        self._info = None
+
+    def _connect(self):
+        """multiprocessing Client(), but with ``timeout`` on the connect and on
+        the auth handshake, which waits until a model process accepts"""
+        if not self.authkey:
+            raise RuntimeError("INFERENCE_AUTHKEY is not set")
+        sock = socket.socket(socket.AF_UNIX)
+        try:
+            sock.settimeout(self.timeout)
+            sock.connect(self.address)
+            sock.setblocking(True)
+            conn = Connection(sock.detach())
+        finally:
+            sock.close()
+
+        try:
+            if not conn.poll(self.timeout):
+                raise TimeoutError(f"No inference worker accepted within {self.timeout}s")
+            answer_challenge(conn, self.authkey)
+            deliver_challenge(conn, self.authkey)
+        except BaseException:
+            conn.close()
+            raise
+        return conn
+
+    def _call(self, message):
+        conn = self._connect()
+        try:
+            conn.send(message)
+            if not conn.poll(self.timeout):
+                raise TimeoutError(f"Inference server did not answer within {self.timeout}s")
+            response = conn.recv()
+        finally:
+            conn.close()
+
+        if not response.get('success'):
+            raise RuntimeError(response.get('message', 'Inference failed'))
+        # Every answer carries the model metadata of the process that served it
+        self._info = (response.get('classes'), response.get('checkpoint_id'), time.monotonic())
+        return response
+
+    @property
+    def class_names(self):
+        return self._info[0] if self._info else None
+
+    @property
+    def checkpoint_id(self):
+        return self._info[1] if self._info else None
+
+    def info(self):
+        """Model metadata (class names, checkpoint id) from the server, at most
+        ``info_ttl`` seconds old"""
+        info = self._info
+        if info is None or time.monotonic() - info[2] >= self.info_ttl:
+            response = self._call({'op': 'info'})
+            return {'classes': response.get('classes'), 'checkpoint_id': response.get('checkpoint_id')}
+        return {'classes': info[0], 'checkpoint_id': info[1]}
+
+    def predict(self, image_data):
+        """(class probabilities, class names, checkpoint id) for encoded image
+        bytes, all from the model process that answered"""
+        response = self._call({'op': 'predict', 'image': image_data})
+        return response['probabilities'], response.get('classes'), response.get('checkpoint_id')
+
+    def predict_batch(self, images):
+        """(probabilities per image, class names, checkpoint id) from one forward
+        pass; probabilities are None where an image cannot be decoded"""
+        response = self._call({'op': 'predict_batch', 'images': images})
+        return response['probabilities'], response.get('classes'), response.get('checkpoint_id')
+
+    def is_available(self):
+        try:
+            self._call({'op': 'info'})
+            return True
+        except Exception:
+            return False
+
+
+def predict_batch(model, images):
+    """Probability lists for encoded images, None for those that fail to decode"""
+    import torch
+    import model_runtime
+
+    tensors = []
+    for image_data in images:
+        try:
+            img = model_runtime.decode_image(image_data)
+            tensors.append(model_runtime.get_transform()(img).unsqueeze(0))
+        except Exception:
+            tensors.append(None)
+
+    decoded = [tensor for tensor in tensors if tensor is not None]
+    rows = iter(model_runtime.predict_probabilities(model, torch.cat(decoded)).tolist()
+                if decoded else [])
+    return [next(rows) if tensor is not None else None for tensor in tensors]
+
+
+def worker_main(listener, threads):
+    """Model process: load the model once, then serve connections forever"""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    import model_runtime
+    # Each process gets its share of the cores instead of torch's one per core
+    model_runtime.INFERENCE_THREADS = threads
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+    model = model_runtime.load_model()
+    if model is None:
+        # Keep answering so web workers fall back instead of hanging
+        print(f"❌ Inference worker {os.getpid()} could not load the model")
+
+    meta = {
+        'classes': getattr(model, 'class_names', None),
+        'checkpoint_id': getattr(model, 'checkpoint_id', None)
+    }
+    print(f"✅ Inference worker {os.getpid()} ready")
+
+    while True:
+        try:
+            conn = listener.accept()
+        except Exception as e:
+            print(f"⚠️ Inference worker accept failed: {e}")
+            continue
+
+        try:
+            message = conn.recv()
+            if model is None:
+                conn.send({'success': False, 'message': 'Model not loaded'})
+            elif message.get('op') == 'predict':
+                img = model_runtime.decode_image(message['image'])
+                img_tensor = model_runtime.get_transform()(img).unsqueeze(0)
+                probabilities = model_runtime.predict_probabilities(model, img_tensor)[0]
+                conn.send({'success': True, 'probabilities': probabilities.tolist(), **meta})
+            elif message.get('op') == 'predict_batch':
+                conn.send({'success': True,
+                           'probabilities': predict_batch(model, message['images']), **meta})
+            else:
+                conn.send({'success': True, **meta})
+        except EOFError:
+            pass
+        except Exception as e:
+            try:
+                conn.send({'success': False, 'message': str(e)})
+            except Exception:
+                pass
+        finally:
+            conn.close()
+
+
+def private_socket_dir(address):
+    """Create the socket's directory readable only by this user, or refuse a
+    directory someone else owns or can enter"""
+    directory = os.path.dirname(os.path.abspath(address))
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    info = os.lstat(directory)
+    if not stat.S_ISDIR(info.st_mode) or info.st_uid != os.getuid():
+        raise SystemExit(f"❌ {directory} is not a directory owned by this user")
+    if info.st_mode & 0o077:
+        raise SystemExit(f"❌ {directory} must only be accessible by its owner (chmod 700)")
+    return directory
+
+
+def serve(address, workers, threads):
+    if not AUTHKEY:
+        raise SystemExit("❌ Set INFERENCE_AUTHKEY (a long random string shared with the web workers)")
+    private_socket_dir(address)
+    if os.path.exists(address):
+        os.remove(address)
+    umask = os.umask(0o077)
+    try:
+        listener = Listener(address, family='AF_UNIX', authkey=AUTHKEY)
+    finally:
+        os.umask(umask)
+
+    # Fork after binding so every model process accepts on the same socket
+    ctx = multiprocessing.get_context('fork')
+
+    def spawn():
+        process = ctx.Process(target=worker_main, args=(listener, threads), daemon=True)
+        process.start()
+        return process
+
+    processes = [spawn() for _ in range(workers)]
+    print(f"🚀 Inference server on {address}: {workers} workers x {threads} torch threads")
+
+    stopping = []
+    signal.signal(signal.SIGTERM, lambda *_: stopping.append(True))
+    try:
+        while not stopping:
+            time.sleep(1)
+            for i, process in enumerate(processes):
+                if not process.is_alive():
+                    print(f"⚠️ Inference worker {process.pid} exited, restarting")
+                    processes[i] = spawn()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for process in processes:
+            process.terminate()
+        listener.close()
+        if os.path.exists(address):
+            os.remove(address)
+        print("Inference server stopped")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--socket', default=SOCKET_PATH)
+    parser.add_argument('--workers', type=int, default=int(os.getenv('INFERENCE_WORKERS', 2)))
+    parser.add_argument('--threads', type=int, default=int(os.getenv('INFERENCE_THREADS', 0)),
+                        help='torch intra-op threads per worker (0 = cores / workers)')
+    args = parser.parse_args()
+    workers = max(1, args.workers)
+    threads = args.threads if args.threads > 0 else max(1, (os.cpu_count() or 1) // workers)
+    serve(args.socket, workers, threads)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,309 @@
+"""
+Scheduled maintenance: expired OTPs and orphaned uploads.
+
+A scan's image reaches the upload folder whether or not its report is
+ever saved, either right away (UPLOAD_PERSIST=immediate) or when the
+pending upload store spills to disk. Each maintenance run:
+
+- purges expired OTPs, MAINTENANCE_OTP_BATCH rows per transaction. On a
+  partitioned otp_codes it drops whole expired partitions instead, after
+  creating the upcoming ones (partitions.py).
+- deletes upload files, with their thumbnails and previews, that no saved
+  report references and that were not written or uploaded again for
+  UPLOAD_ORPHAN_GRACE seconds (at least PENDING_UPLOAD_TTL, so a scan can
+  still be saved). Only files the app writes are considered: content-hash
+  blobs, their interrupted writes, and legacy ``{user_id}_{timestamp}_{name}``
+  images in the top level of the upload folder. Anything else placed there
+  is left alone.
+- takes over file deletion jobs whose process stopped (deletion_jobs.py).
+
+A PostgreSQL advisory lock lets only one process run at a time. Every app
+worker may run the scheduler (MAINTENANCE_IN_APP=True), or run it as a
+separate process:
+
+    python maintenance.py              # every MAINTENANCE_INTERVAL seconds
+    python maintenance.py --once       # a single run, e.g. from cron
+    python maintenance.py --once --dry-run
+"""
+import argparse
+import os
+import re
+import threading
+import time
+from datetime import datetime
+
+from database import db
+from blob_store import BLOBS, BlobStore
+from image_derivatives import DERIVATIVES
+from otp_service import OTPService
+from partitions import PARTITIONS
+from deletion_jobs import DELETION_JOBS
+from metrics import MAINTENANCE_RECLAIMED
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Key of the advisory lock held for the duration of a run
+LOCK_KEY = 4769001
+
+# Files the app writes to the upload folder: uploads saved before the blob
+# store ({user_id}_{YYYYMMDD_HHMMSS}_{name} with an allowed image extension)
+# and temporary files of interrupted blob writes
+LEGACY_UPLOAD = re.compile(r'^\d+_\d{8}_\d{6}_.+\.(png|jpe?g|gif)$', re.IGNORECASE)
+BLOB_TEMP = re.compile(r'^[0-9a-f]{64}\.[a-z0-9]+\.\d+\.tmp$')
+
+
+def is_upload(root, dirpath, name):
+    """Whether ``name`` in ``dirpath`` is a file the app wrote, and may collect"""
+    if BlobStore.is_blob(name) or BLOB_TEMP.match(name):
+        return True
+    # Legacy uploads were written to the top level only
+    return (os.path.realpath(dirpath) == os.path.realpath(root)
+            and bool(LEGACY_UPLOAD.match(name)))
+
+
+def upload_files(root, skip_dirs, older_than):
+    """(name, path, size) of app-written upload files under ``root`` last
+    modified before ``older_than``"""
+    skip = {os.path.realpath(path) for path in skip_dirs}
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = [name for name in dirnames
+                       if os.path.realpath(os.path.join(dirpath, name)) not in skip]
+        for filename in filenames:
+            if not is_upload(root, dirpath, filename):
+                continue
+            path = os.path.join(dirpath, filename)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            if stat.st_mtime < older_than:
+                yield filename, path, stat.st_size
+
+
+def referenced_uploads(cursor, names):
+    """Subset of ``names`` that saved reports still use.
+
+    Content-hash blob names are looked up in image_blobs by primary key.
+    Other (legacy) upload names can only be matched against
+    disease_reports.image_path, which scans the table, so pass them in as
+    few calls as possible; ``python blob_store.py --migrate`` turns them
+    into blobs. Temporary files of interrupted writes are never referenced.
+    """
+    blobs = [name for name in names if BlobStore.is_blob(name)]
+    legacy = [name for name in names
+              if not BlobStore.is_blob(name) and not name.endswith('.tmp')]
+    referenced = BlobStore.referenced(cursor, blobs) if blobs else set()
+    if legacy:
+        cursor.execute("""
+            SELECT substring(image_path FROM '[^/\\\\]+$') FROM disease_reports
+            WHERE substring(image_path FROM '[^/\\\\]+$') = ANY(%s)
+        """, (legacy,))
+        referenced |= {row[0] for row in cursor.fetchall()}
+    return referenced
+
+
+class MaintenanceWorker:
+    """Runs maintenance every ``interval`` seconds on a daemon thread"""
+
+    def __init__(self, interval=3600, otp_batch_size=1000, orphan_grace=24 * 3600,
+                 gc_batch_size=500, min_orphan_grace=0):
+        self.interval = interval
+        self.otp_batch_size = otp_batch_size
+        # An upload must outlive the time its scan may still be saved
+        if orphan_grace < min_orphan_grace:
+            print(f"⚠️ UPLOAD_ORPHAN_GRACE raised from {orphan_grace}s to {min_orphan_grace}s "
+                  f"(PENDING_UPLOAD_TTL)")
+        self.orphan_grace = max(orphan_grace, min_orphan_grace)
+        self.gc_batch_size = gc_batch_size
+        self.runs = 0
+        self.last_run = None
+        self._thread = None
+        self._stop = threading.Event()
+
+    def collect_orphan_uploads(self, dry_run=False):
+        """Delete unreferenced upload files older than the grace period.
+
+        Returns (files removed, bytes reclaimed); with ``dry_run`` nothing
+        is deleted and the counts are what would have been.
+        """
+        older_than = time.time() - self.orphan_grace
+        files = reclaimed = 0
+        batch = []
+        others = []
+        candidates = upload_files(BLOBS.root, [DERIVATIVES.cache_dir], older_than)
+        with db.session() as conn:
+            for candidate in candidates:
+                if not BlobStore.is_blob(candidate[0]):
+                    others.append(candidate)
+                    continue
+                batch.append(candidate)
+                if len(batch) >= self.gc_batch_size:
+                    removed, size = self._collect_batch(conn, batch, older_than, dry_run)
+                    files, reclaimed, batch = files + removed, reclaimed + size, []
+
+            # Legacy uploads are checked together: one scan of disease_reports per run
+            for group in (batch, others):
+                if group:
+                    removed, size = self._collect_batch(conn, group, older_than, dry_run)
+                    files, reclaimed = files + removed, reclaimed + size
+        return files, reclaimed
+
+    @staticmethod
+    def _collect_batch(conn, batch, older_than, dry_run):
+        cursor = conn.cursor()
+        keep = referenced_uploads(cursor, [name for name, _, _ in batch])
+        conn.rollback()
+        cursor.close()
+
+        files = reclaimed = 0
+        for name, path, size in batch:
+            if name in keep:
+                continue
+            try:
+                # Uploading the same image again refreshes its mtime
+                if os.stat(path).st_mtime >= older_than:
+                    continue
+                if not dry_run:
+                    os.remove(path)
+                    DERIVATIVES.remove(name)
+            except FileNotFoundError:
+                continue
+            except OSError as e:
+                print(f"⚠️ Could not delete orphaned upload {name}: {e}")
+                continue
+            files += 1
+            reclaimed += size
+        return files, reclaimed
+
+    def run(self, dry_run=False):
+        """One maintenance pass.
+
+        Returns what it reclaimed, or None when the database is unavailable
+        or another process holds the maintenance lock.
+        """
+        started = time.perf_counter()
+        report = {'otpsPurged': 0, 'partitions': None, 'orphanFiles': 0, 'orphanBytes': 0,
+                  'deletionJobsResumed': 0, 'dryRun': dry_run, 'errors': []}
+
+        with db.session() as conn:
+            if conn is None:
+                print("⚠️  Maintenance skipped: database not available")
+                return None
+            cursor = conn.cursor()
+            cursor.execute("SELECT pg_try_advisory_lock(%s)", (LOCK_KEY,))
+            locked = cursor.fetchone()[0]
+            conn.commit()
+            if not locked:
+                cursor.close()
+                print("⏭️  Maintenance skipped: another process is running it")
+                return None
+
+            try:
+                if not dry_run:
+                    if db.partitioning:
+                        try:
+                            report['partitions'] = PARTITIONS.run()
+                            report['otpsPurged'] += report['partitions']['otpRowsRemoved']
+                        except Exception as e:
+                            report['errors'].append(f"partitions: {e}")
+                    purged = OTPService.cleanup_expired_otps(self.otp_batch_size)
+                    if purged is None:
+                        report['errors'].append("OTP purge failed")
+                    else:
+                        report['otpsPurged'] += purged
+
+                    try:
+                        report['deletionJobsResumed'] = DELETION_JOBS.resume()
+                    except Exception as e:
+                        report['errors'].append(f"deletion jobs: {e}")
+
+                try:
+                    report['orphanFiles'], report['orphanBytes'] = self.collect_orphan_uploads(dry_run)
+                except Exception as e:
+                    report['errors'].append(f"orphaned uploads: {e}")
+            finally:
+                conn.rollback()
+                cursor.execute("SELECT pg_advisory_unlock(%s)", (LOCK_KEY,))
+                conn.commit()
+                cursor.close()
+
+        report['seconds'] = round(time.perf_counter() - started, 3)
+        report['finishedAt'] = datetime.now().isoformat()
+        if not dry_run:
+            MAINTENANCE_RECLAIMED.inc('otp_rows', amount=report['otpsPurged'])
+            MAINTENANCE_RECLAIMED.inc('upload_files', amount=report['orphanFiles'])
+            MAINTENANCE_RECLAIMED.inc('upload_bytes', amount=report['orphanBytes'])
+        self.runs += 1
+        self.last_run = report
+
+        action = 'to remove' if dry_run else 'removed'
+        print(f"🧹 Maintenance: {report['otpsPurged']} OTPs purged, {report['orphanFiles']} "
+              f"orphaned uploads {action} ({report['orphanBytes'] / (1024 * 1024):.1f} MB) "
+              f"in {report['seconds']:.1f}s")
+        for error in report['errors']:
+            print(f"❌ Maintenance error: {error}")
+        return report
+
+    def start(self):
+        """Run maintenance now and then every ``interval`` seconds in the background"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, name='maintenance', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                self.run()
+            except Exception as e:
+                print(f"❌ Maintenance run failed: {e}")
+            self._stop.wait(self.interval)
+
+    def stats(self):
+        return {
+            'scheduled': self._thread is not None and self._thread.is_alive(),
+            'interval': self.interval,
+            'runs': self.runs,
+            'lastRun': self.last_run
+        }
+
+
+# Started by app.py (MAINTENANCE_IN_APP) or the command below
+MAINTENANCE = MaintenanceWorker(
+    interval=int(os.getenv('MAINTENANCE_INTERVAL', 3600)),
+    otp_batch_size=int(os.getenv('MAINTENANCE_OTP_BATCH', 1000)),
+    orphan_grace=int(os.getenv('UPLOAD_ORPHAN_GRACE', 24 * 3600)),
+    gc_batch_size=int(os.getenv('UPLOAD_GC_BATCH', 500)),
+    min_orphan_grace=max(int(os.getenv('PENDING_UPLOAD_TTL', 1800)), BLOBS.scan_grace)
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--once', action='store_true',
+                        help='run once and exit instead of every MAINTENANCE_INTERVAL seconds')
+    parser.add_argument('--dry-run', action='store_true',
+                        help='only report the orphaned uploads that would be deleted')
+    args = parser.parse_args()
+
+    if not db.connect():
+        raise SystemExit(1)
+
+    if args.once or args.dry_run:
+        report = MAINTENANCE.run(dry_run=args.dry_run)
+        raise SystemExit(0 if report is not None and not report['errors'] else 1)
+
+    MAINTENANCE.start()
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        MAINTENANCE.stop()
+
+
+if __name__ == "__main__":
+    main()
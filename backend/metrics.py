@@ -0,0 +1,244 @@
+"""
+In-process metrics exposed in Prometheus text format on /metrics.
+
+Counters and histograms are plain dicts keyed by label values behind one
+lock per metric, so recording costs a dict lookup, a bisect and two adds.
+Each process keeps its own registry; with several gunicorn workers every
+scrape sees the worker that answered it.
+"""
+import re
+import threading
+import time
+from bisect import bisect_left
+
+# Request latency buckets in seconds (5 ms ... 30 s)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Buckets for fast operations such as single SQL statements (0.5 ms ... 5 s)
+FAST_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic counter with optional labels"""
+
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def value(self, *label_values):
+        return self._values.get(label_values, 0)
+
+    def expose(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        for label_values, value in items:
+            yield f"{self.name}{_format_labels(self.labels, label_values)} {_format_value(value)}"
+
+
+class Histogram:
+    """Cumulative-bucket histogram with optional labels"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # label values -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    def time(self, *label_values):
+        """Context manager observing the duration of its block"""
+        return _Timer(self, label_values)
+
+    def count(self, *label_values):
+        series = self._series.get(label_values)
+        return sum(series[:-1]) if series else 0
+
+    def expose(self):
+        with self._lock:
+            items = sorted((labels, list(series)) for labels, series in self._series.items())
+        for label_values, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), series[:-1]):
+                cumulative += count
+                le = f'le="{_format_value(float(bound))}"'
+                yield (f"{self.name}_bucket{_format_labels(self.labels, label_values, le)} "
+                       f"{cumulative}")
+            labels = _format_labels(self.labels, label_values)
+            yield f"{self.name}_sum{labels} {_format_value(series[-1])}"
+            yield f"{self.name}_count{labels} {cumulative}"
+
+
+class _Timer:
+    __slots__ = ('histogram', 'label_values', 'start')
+
+    def __init__(self, histogram, label_values):
+        self.histogram = histogram
+        self.label_values = label_values
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start, *self.label_values)
+
+
+class GaugeCallback:
+    """Gauge read at scrape time from ``fn()`` -> {label values tuple: number}"""
+
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, fn, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.fn = fn
+
+    def expose(self):
+        try:
+            values = self.fn() or {}
+        except Exception:
+            return
+        for label_values, value in sorted(values.items()):
+            yield f"{self.name}{_format_labels(self.labels, label_values)} {_format_value(value)}"
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name, documentation, labels=()):
+        return self.register(Counter(name, documentation, labels))
+
+    def histogram(self, name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, documentation, labels, buckets))
+
+    def gauge_callback(self, name, documentation, fn, labels=()):
+        return self.register(GaugeCallback(name, documentation, fn, labels))
+
+    def expose(self):
+        """All metrics in Prometheus text exposition format (version 0.0.4)"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.expose())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+HTTP_REQUESTS = REGISTRY.counter(
+    'growguardians_http_requests_total', 'HTTP requests by route and status',
+    ('method', 'route', 'status'))
+HTTP_ERRORS = REGISTRY.counter(
+    'growguardians_http_request_errors_total', 'HTTP requests answered with a 5xx status',
+    ('method', 'route'))
+HTTP_LATENCY = REGISTRY.histogram(
+    'growguardians_http_request_duration_seconds', 'HTTP request latency by route',
+    ('method', 'route'))
+
+DB_QUERY_LATENCY = REGISTRY.histogram(
+    'growguardians_db_query_duration_seconds', 'SQL statement latency by statement',
+    ('statement',), FAST_BUCKETS)
+DB_QUERY_ERRORS = REGISTRY.counter(
+    'growguardians_db_query_errors_total', 'SQL statements that raised', ('statement',))
+
+MODEL_INFERENCE = REGISTRY.histogram(
+    'growguardians_model_inference_seconds', 'Model forward pass time by batch size',
+    ('batch_size',))
+
+SCAN_STAGE_LATENCY = REGISTRY.histogram(
+    'growguardians_scan_stage_duration_seconds', 'Time per stage of /api/scan/upload',
+    ('stage',), FAST_BUCKETS)
+
+OTP_STORE_LATENCY = REGISTRY.histogram(
+    'growguardians_otp_store_duration_seconds', 'OTP store operation latency',
+    ('backend', 'operation'), FAST_BUCKETS)
+SMS_SEND_LATENCY = REGISTRY.histogram(
+    'growguardians_sms_send_duration_seconds', 'SMS provider call latency by outcome',
+    ('backend', 'outcome'))
+
+MAINTENANCE_RECLAIMED = REGISTRY.counter(
+    'growguardians_maintenance_reclaimed_total',
+    'OTP rows, upload files and upload bytes removed by maintenance runs', ('kind',))
+
+
+_TABLE_AFTER = {
+    'select': re.compile(r'\bfrom\s+(\w+)', re.IGNORECASE),
+    'delete': re.compile(r'\bfrom\s+(\w+)', re.IGNORECASE),
+    'insert': re.compile(r'\binto\s+(\w+)', re.IGNORECASE),
+    'update': re.compile(r'^\s*update\s+(\w+)', re.IGNORECASE),
+    'with': re.compile(r'^\s*with\s+(\w+)', re.IGNORECASE),
+    'create': re.compile(r'\b(?:table|index)\s+(?:if\s+not\s+exists\s+)?(\w+)', re.IGNORECASE),
+    'drop': re.compile(r'\b(?:table|index)\s+(?:if\s+exists\s+)?(\w+)', re.IGNORECASE),
+    # Prepared statements are labelled by statement name
+    'prepare': re.compile(r'^\s*prepare\s+(\w+)', re.IGNORECASE),
+    'execute': re.compile(r'^\s*execute\s+(\w+)', re.IGNORECASE)
+}
+_statement_labels = {}
+
+
+def statement_label(query):
+    """Low-cardinality label such as 'select disease_reports' for a SQL string"""
+    label = _statement_labels.get(query)
+    if label is None:
+        text = query.decode(errors='replace') if isinstance(query, bytes) else str(query)
+        verb = text.split(None, 1)[0].lower() if text.strip() else 'other'
+        pattern = _TABLE_AFTER.get(verb)
+        match = pattern.search(text) if pattern else None
+        label = f"{verb} {match.group(1).lower()}" if match else verb
+        if len(_statement_labels) < 1000:
+            _statement_labels[query] = label
+    return label
@@ -0,0 +1,226 @@
+# Model loading and image preprocessing. Kept free of Flask and database
+# imports so inference worker processes (inference_server.py) can use it.
+import os
+import io
+import json
+import hashlib
+from PIL import Image
+from scan_profiling import stage
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Torch intra-op threads per process (0 keeps torch's default of one per core)
+INFERENCE_THREADS = int(os.getenv('INFERENCE_THREADS', 0))
+
+# Inference backend: eager (float32), int8_dynamic, int8_static, torchscript
+# or onnx. Everything but eager needs an artifact from convert_model.py.
+BACKENDS = ('eager', 'int8_dynamic', 'int8_static', 'torchscript', 'onnx')
+INFERENCE_BACKEND = os.getenv('INFERENCE_BACKEND', 'eager').lower()
+
+def get_model_path():
+    """Path of the trained float32 checkpoint"""
+    return os.getenv('MODEL_PATH', 'C:\\Users\\Hp Pc\\OneDrive\\Desktop\\FYPGrowGuardians\\best_resnet50.pth')
+
+def exported_model_path(checkpoint_path, backend):
+    """Where convert_model.py writes the artifact for a backend"""
+    root, _ = os.path.splitext(checkpoint_path)
+    if backend == 'onnx':
+        return f"{root}.onnx"
+    return f"{root}.{backend}.pt"
+
+def checkpoint_identity(path):
+    """Short id of a model file so cached predictions from another model
+    version are never reused"""
+    stat = os.stat(path)
+    return hashlib.sha256(
+        f"{os.path.abspath(path)}:{stat.st_size}:{stat.st_mtime_ns}".encode()
+    ).hexdigest()[:16]
+
+def load_model(backend=None):
+    """Load the model for the configured inference backend.
+
+    Falls back to the eager float32 checkpoint if the exported artifact
+    for the backend is missing or cannot be loaded.
+    """
+    backend = backend or INFERENCE_BACKEND
+    try:
+        import torch
+
+        if INFERENCE_THREADS > 0:
+            torch.set_num_threads(INFERENCE_THREADS)
+    except Exception as e:
+        print(f"❌ Error loading model: {e}")
+        return None
+
+    if backend != 'eager':
+        model = load_exported_model(backend)
+        if model is not None:
+            return model
+        print("⚠️ Falling back to the eager float32 model")
+
+    return load_checkpoint_model(get_model_path())
+
+# Import PyTorch for the new model
+def load_checkpoint_model(model_path):
+    """Load the trained float32 PyTorch model from a checkpoint"""
+    try:
+        import torch
+        import torch.nn as nn
+        from torchvision import models
+        
+        if os.path.exists(model_path):
+            print(f"✅ Loading PyTorch model from: {model_path}")
+            
+            try:
+                # Load the checkpoint
+                device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+                checkpoint = torch.load(model_path, map_location=device)
+                
+                # Extract class names if available
+                if 'classes' in checkpoint:
+                    class_names = checkpoint['classes']
+                    num_classes = len(class_names)
+                    print(f"✅ Found {num_classes} classes: {class_names}")
+                else:
+                    # Default to 4 classes
+                    num_classes = 4
+                    print("⚠️ No class names in checkpoint, using default 4 classes")
+                
+                # Create ResNet50 model
+                model = models.resnet50(pretrained=False)
+                
+                # Adjust the final layer for number of classes
+                model.fc = nn.Linear(model.fc.in_features, num_classes)
+                
+                # Load the trained weights from checkpoint
+                if 'model_state_dict' in checkpoint:
+                    model.load_state_dict(checkpoint['model_state_dict'])
+                else:
+                    model.load_state_dict(checkpoint)
+                
+                model = model.to(device)
+                model.eval()
+                
+                print(f"✅ PyTorch model loaded successfully on {device}")
+                
+                # Store class names for later use
+                if 'classes' in checkpoint:
+                    model.class_names = checkpoint['classes']
+
+                model.backend = 'eager'
+                model.checkpoint_id = checkpoint_identity(model_path)
+                
+                return model
+            except Exception as e:
+                print(f"⚠️ Error loading PyTorch model: {e}")
+                print("⚠️ Using fallback predictions")
+                return None
+        else:
+            print(f"❌ Model file not found at: {model_path}")
+            return None
+    except Exception as e:
+        print(f"❌ Error loading model: {e}")
+        return None
+
+class ExportedModel:
+    """TorchScript/quantized/ONNX model behind the same call interface as
+    the eager model: takes a (N, C, H, W) CPU tensor, returns logits."""
+
+    def __init__(self, runner, backend, class_names, checkpoint_id):
+        self.runner = runner
+        self.backend = backend
+        self.class_names = class_names
+        self.checkpoint_id = checkpoint_id
+
+    def __call__(self, batch):
+        return self.runner(batch)
+
+def load_exported_model(backend, path=None):
+    """Load an artifact written by convert_model.py (None on failure)"""
+    path = path or os.getenv('INFERENCE_MODEL_PATH') or exported_model_path(get_model_path(), backend)
+    if not os.path.exists(path):
+        print(f"❌ {backend} model not found at: {path} (create it with convert_model.py)")
+        return None
+
+    try:
+        import torch
+
+        meta = {}
+        if os.path.exists(f"{path}.json"):
+            with open(f"{path}.json") as f:
+                meta = json.load(f)
+
+        if backend == 'onnx':
+            try:
+                import onnxruntime as ort
+            except ImportError:
+                print("❌ INFERENCE_BACKEND=onnx needs the optional onnxruntime package "
+                      "(pip install onnxruntime)")
+                return None
+
+            options = ort.SessionOptions()
+            if INFERENCE_THREADS > 0:
+                options.intra_op_num_threads = INFERENCE_THREADS
+            session = ort.InferenceSession(path, options, providers=['CPUExecutionProvider'])
+            input_name = session.get_inputs()[0].name
+
+            def runner(batch):
+                return torch.from_numpy(session.run(None, {input_name: batch.numpy()})[0])
+        else:
+            if meta.get('engine'):
+                torch.backends.quantized.engine = meta['engine']
+            runner = torch.jit.load(path, map_location='cpu')
+            runner.eval()
+
+        print(f"✅ Loaded {backend} model from: {path}")
+        return ExportedModel(runner, backend, meta.get('classes'), checkpoint_identity(path))
+    except Exception as e:
+        print(f"⚠️ Error loading {backend} model: {e}")
+        return None
+
+# Preprocessing pipeline, built on first use and shared by all requests
+RESIZE_SIZE = 256
+CROP_SIZE = 224
+_TRANSFORM = None
+
+def get_transform():
+    """Return the shared Resize/CenterCrop/Normalize pipeline"""
+    global _TRANSFORM
+    if _TRANSFORM is None:
+        from torchvision import transforms
+
+        _TRANSFORM = transforms.Compose([
+            transforms.Resize(RESIZE_SIZE),
+            transforms.CenterCrop(CROP_SIZE),
+            transforms.ToTensor(),
+            transforms.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225])
+        ])
+    return _TRANSFORM
+
+def decode_image(data):
+    """Decode image bytes to RGB, letting JPEG decode at reduced scale.
+
+    draft() makes libjpeg downscale by 1/2, 1/4 or 1/8 while decoding, as
+    long as the result still covers the Resize target, so multi-megapixel
+    phone photos never get fully decoded.
+    """
+    img = Image.open(io.BytesIO(data))
+    img.draft('RGB', (RESIZE_SIZE, RESIZE_SIZE))
+    if img.mode != 'RGB':
+        img = img.convert('RGB')
+    return img
+
+def predict_probabilities(model, img_tensor):
+    """Softmax class probabilities for a (N, C, H, W) batch, on the CPU"""
+    import torch
+
+    if isinstance(model, ExportedModel):
+        device = torch.device('cpu')
+    else:
+        device = next(model.parameters()).device
+    with torch.no_grad():
+        with stage('forward'):
+            outputs = model(img_tensor.to(device))
+        with stage('softmax'):
+            return torch.nn.functional.softmax(outputs, dim=1).cpu()
@@ -1,64 +1,37 @@
 import random
 import string
 import os
-from datetime import datetime, timedelta
-from database import db
-from twilio.rest import Client
+from otp_store import create_otp_store
+from sms_delivery import SMSDeliveryQueue, create_sender, timed_send
+from metrics import OTP_STORE_LATENCY
+
+OTP_TTL_SECONDS = 180  # 3 minutes expiry
+
+# Where OTPs live (OTP_STORE=postgres or memory)
+OTP_STORE = create_otp_store()
+
+# SMS provider (Twilio, console display or the fake sink for tests)
+SMS_SENDER = create_sender()
+
+# 'async' hands SMS to background workers so the request returns as soon
+# as the OTP is stored; 'sync' sends inside the request as before
+SMS_DELIVERY = os.getenv('SMS_DELIVERY', 'async').lower()
+SMS_QUEUE = None
+if SMS_DELIVERY == 'async':
+    SMS_QUEUE = SMSDeliveryQueue(
+        SMS_SENDER,
+        workers=int(os.getenv('SMS_WORKERS', 2)),
+        max_queue=int(os.getenv('SMS_QUEUE_SIZE', 1000)),
+        max_attempts=int(os.getenv('SMS_MAX_ATTEMPTS', 3)),
+        backoff=float(os.getenv('SMS_RETRY_BACKOFF', 1))
+    )
 
 class OTPService:
     @staticmethod
     def send_sms(mobile_number, otp_code):
-        """Send SMS using Twilio"""
+        """Send SMS synchronously through the configured provider"""
         try:
-            # Check if SMS is enabled
-            enable_sms = os.getenv('ENABLE_SMS', 'False').lower() == 'true'
-            
-            if not enable_sms:
-                print("\n" + "="*60)
-                print("⚠️  SMS DISABLED - Using Console Display Mode")
-                print(f"📱 Mobile Number: {mobile_number}")
-                print(f"🔑 OTP Code: {otp_code}")
-                print("💡 To enable SMS: Set ENABLE_SMS=True in .env")
-                print("="*60 + "\n")
-                return {'success': True, 'message': 'OTP displayed in console'}
-            
-            # Get Twilio credentials from environment
-            account_sid = os.getenv('TWILIO_ACCOUNT_SID')
-            auth_token = os.getenv('TWILIO_AUTH_TOKEN')
-            twilio_number = os.getenv('TWILIO_PHONE_NUMBER')
-            
-            # Validate credentials
-            if not all([account_sid, auth_token, twilio_number]):
-                print("❌ Twilio credentials not configured properly")
-                return {'success': False, 'message': 'SMS service not configured'}
-            
-            # Initialize Twilio client
-            client = Client(account_sid, auth_token)
-            
-            # Format mobile number (add +92 for Pakistan if not present)
-            if not mobile_number.startswith('+'):
-                if mobile_number.startswith('0'):
-                    mobile_number = '+92' + mobile_number[1:]  # Remove leading 0, add +92
-                elif mobile_number.startswith('92'):
-                    mobile_number = '+' + mobile_number
-                else:
-                    mobile_number = '+92' + mobile_number
-            
-            # Send SMS
-            message = client.messages.create(
-                body=f"Your GrowGuardians OTP is: {otp_code}. Valid for 3 minutes. Do not share this code.",
-                from_=twilio_number,
-                to=mobile_number
-            )
-            
-            print(f"✅ SMS sent successfully to {mobile_number}")
-            print(f"📨 Message SID: {message.sid}")
-            
-            return {
-                'success': True,
-                'message': 'SMS sent successfully',
-                'message_sid': message.sid
-            }
+            return timed_send(SMS_SENDER, mobile_number, otp_code)
             
         except Exception as e:
             error_msg = str(e)
@@ -76,38 +49,40 @@ class OTPService:
                 'success': True,  # Still return success for development
                 'message': f'SMS failed, OTP displayed in console: {error_msg}'
             }
+
     @staticmethod
     def generate_otp():
         """Generate a 4-digit OTP"""
         return ''.join(random.choices(string.digits, k=4))
 
     @staticmethod
-    def send_otp(mobile_number, purpose='registration'):
-        """Generate and save OTP for a mobile number"""
+    def send_otp(mobile_number, purpose='registration', require_user=None):
+        """Generate and save OTP for a mobile number.
+
+        ``require_user`` True (False) refuses numbers that are not (are
+        already) registered, checked in the same statement that stores the OTP.
+        """
         try:
             otp_code = OTPService.generate_otp()
-            expires_at = datetime.now() + timedelta(minutes=3)  # 3 minutes expiry
-            
-            cursor = db.connection.cursor()
-            
-            # Invalidate previous OTPs for this mobile number and purpose
-            cursor.execute("""
-                UPDATE otp_codes 
-                SET is_used = TRUE 
-                WHERE mobile_number = %s AND purpose = %s AND is_used = FALSE
-            """, (mobile_number, purpose))
-            
-            # Insert new OTP
-            cursor.execute("""
-                INSERT INTO otp_codes (mobile_number, otp_code, purpose, expires_at)
-                VALUES (%s, %s, %s, %s)
-            """, (mobile_number, otp_code, purpose, expires_at))
-            
-            db.connection.commit()
-            cursor.close()
+            with OTP_STORE_LATENCY.time(OTP_STORE.name, 'issue'):
+                issued = OTP_STORE.issue(mobile_number, purpose, otp_code, OTP_TTL_SECONDS,
+                                         require_user=require_user)
+            if not issued:
+                return {
+                    'success': False,
+                    'message': ('Mobile number not registered' if require_user
+                                else 'Mobile number already registered')
+                }
             
-            # Send SMS with OTP
-            sms_result = OTPService.send_sms(mobile_number, otp_code)
+            # Send SMS with OTP (queued unless SMS_DELIVERY=sync)
+            if SMS_QUEUE is not None:
+                queued = SMS_QUEUE.enqueue(mobile_number, otp_code)
+                sms_result = {
+                    'success': queued,
+                    'message': 'SMS queued for delivery' if queued else 'SMS queue full'
+                }
+            else:
+                sms_result = OTPService.send_sms(mobile_number, otp_code)
             
             # Also display in console for development
             print("\n" + "="*60)
@@ -122,7 +97,7 @@ class OTPService:
                 'success': True,
                 'message': 'OTP sent successfully',
                 'otp': otp_code,  # For development only - remove in production
-                'expiresIn': 180,  # seconds
+                'expiresIn': OTP_TTL_SECONDS,
                 'sms_sent': sms_result.get('success', False)
             }
             
@@ -137,40 +112,14 @@ class OTPService:
     def verify_otp(mobile_number, otp_code, purpose='registration'):
         """Verify OTP code"""
         try:
-            cursor = db.connection.cursor()
-            
-            # Find valid OTP
-            cursor.execute("""
-                SELECT id FROM otp_codes
-                WHERE mobile_number = %s 
-                AND otp_code = %s 
-                AND purpose = %s 
-                AND is_used = FALSE
-                AND expires_at > NOW()
-                ORDER BY created_at DESC
-                LIMIT 1
-            """, (mobile_number, otp_code, purpose))
-            
-            otp_record = cursor.fetchone()
-            
-            if otp_record:
-                otp_id = otp_record[0]
-                # Mark OTP as used
-                cursor.execute("""
-                    UPDATE otp_codes 
-                    SET is_used = TRUE 
-                    WHERE id = %s
-                """, (otp_id,))
-                
-                db.connection.commit()
-                cursor.close()
-                
+            with OTP_STORE_LATENCY.time(OTP_STORE.name, 'verify'):
+                verified = OTP_STORE.verify(mobile_number, purpose, otp_code)
+            if verified:
                 return {
                     'success': True,
                     'message': 'OTP verified successfully'
                 }
             else:
-                cursor.close()
                 return {
                     'success': False,
                     'message': 'Invalid or expired OTP'
@@ -184,17 +133,11 @@ class OTPService:
             }
 
     @staticmethod
-    def cleanup_expired_otps():
-        """Clean up expired and used OTPs"""
+    def cleanup_expired_otps(batch_size=None):
+        """Clean up expired and used OTPs, ``batch_size`` rows per transaction"""
         try:
-            cursor = db.connection.cursor()
-            cursor.execute("""
-                DELETE FROM otp_codes 
-                WHERE expires_at < NOW() OR is_used = TRUE
-            """)
-            db.connection.commit()
-            deleted_count = cursor.rowcount
-            cursor.close()
+            deleted_count = OTP_STORE.purge_expired(batch_size)
             print(f"Cleaned up {deleted_count} expired/used OTPs")
+            return deleted_count
         except Exception as e:
             print(f"Error cleaning up OTPs: {e}")
@@ -0,0 +1,257 @@
+import heapq
+import os
+import threading
+import time
+from database import db, PreparedStatement
+from partitions import PARTITIONS
+
+
+# Revoke the live OTPs of a mobile number and purpose, then store a new
+# one, in a single statement
+ISSUE_OTP = PreparedStatement('otp_issue', """
+    WITH revoked AS (
+        UPDATE otp_codes
+        SET is_used = TRUE
+        WHERE mobile_number = %s AND purpose = %s AND is_used = FALSE
+    )
+    INSERT INTO otp_codes (mobile_number, otp_code, purpose, expires_at)
+    VALUES (%s, %s, %s, NOW() + make_interval(secs => %s))
+""")
+
+# ISSUE_OTP only if the mobile number is (or is not) registered; returns
+# whether it is registered
+ISSUE_OTP_IF_USER = PreparedStatement('otp_issue_if_user', """
+    WITH registered AS (
+        SELECT EXISTS (SELECT 1 FROM users WHERE mobile_number = %s) AS found
+    ),
+    revoked AS (
+        UPDATE otp_codes
+        SET is_used = TRUE
+        WHERE mobile_number = %s AND purpose = %s AND is_used = FALSE
+        AND (SELECT found FROM registered) = %s
+    ),
+    issued AS (
+        INSERT INTO otp_codes (mobile_number, otp_code, purpose, expires_at)
+        SELECT %s, %s, %s, NOW() + make_interval(secs => %s)
+        FROM registered
+        WHERE found = %s
+    )
+    SELECT found FROM registered
+""")
+
+# Mark the newest matching, unexpired OTP used, returning its id. The outer
+# is_used check makes concurrent verifications of one code race-free.
+CONSUME_OTP = PreparedStatement('otp_consume', """
+    UPDATE otp_codes
+    SET is_used = TRUE
+    WHERE is_used = FALSE AND id = (
+        SELECT id FROM otp_codes
+        WHERE mobile_number = %s
+        AND otp_code = %s
+        AND purpose = %s
+        AND is_used = FALSE
+        AND expires_at > NOW()
+        ORDER BY created_at DESC
+        LIMIT 1
+    )
+    RETURNING id
+""")
+
+
+def user_registered(cursor, mobile_number):
+    cursor.execute("SELECT EXISTS (SELECT 1 FROM users WHERE mobile_number = %s)",
+                   (mobile_number,))
+    return cursor.fetchone()[0]
+
+
+class PostgresOTPStore:
+    """OTPs as rows in the otp_codes table (the original behaviour)"""
+
+    name = 'postgres'
+
+    def issue(self, mobile_number, purpose, otp_code, ttl_seconds, require_user=None):
+        """Store a new OTP, revoking earlier ones.
+
+        With ``require_user`` True (False) the OTP is only issued if the
+        mobile number is (is not) registered. Returns whether it was issued.
+        """
+        cursor = db.connection.cursor()
+        if require_user is None:
+            ISSUE_OTP.execute(cursor, (mobile_number, purpose,
+                                       mobile_number, otp_code, purpose, float(ttl_seconds)))
+            issued = True
+        else:
+            ISSUE_OTP_IF_USER.execute(cursor, (mobile_number,
+                                               mobile_number, purpose, require_user,
+                                               mobile_number, otp_code, purpose,
+                                               float(ttl_seconds), require_user))
+            issued = cursor.fetchone()[0] == require_user
+        db.connection.commit()
+        cursor.close()
+        return issued
+
+    def verify(self, mobile_number, purpose, otp_code):
+        """Consume a matching, unexpired OTP. Returns True if one was found"""
+        cursor = db.connection.cursor()
+        CONSUME_OTP.execute(cursor, (mobile_number, otp_code, purpose))
+        verified = cursor.fetchone() is not None
+        db.connection.commit()
+        cursor.close()
+        return verified
+
+    def invalidate(self, mobile_number, purpose):
+        cursor = db.connection.cursor()
+        cursor.execute("""
+            UPDATE otp_codes
+            SET is_used = TRUE
+            WHERE mobile_number = %s AND purpose = %s AND is_used = FALSE
+        """, (mobile_number, purpose))
+        db.connection.commit()
+        cursor.close()
+
+    def purge_expired(self, batch_size=None):
+        """Delete expired and used OTPs, returning how many were removed.
+
+        With ``batch_size``, expired rows are deleted (and committed) that
+        many at a time so a large backlog never holds long locks; used
+        codes go once they expire. With a partitioned otp_codes, whole
+        expired day partitions are dropped instead of deleting their rows.
+        """
+        cursor = db.connection.cursor()
+        if db.partitioning and PARTITIONS.is_partitioned(cursor, 'otp_codes'):
+            _, deleted_count = PARTITIONS.drop_expired_otps(cursor)
+        elif batch_size:
+            deleted_count = 0
+            while True:
+                cursor.execute("""
+                    DELETE FROM otp_codes
+                    WHERE id IN (
+                        SELECT id FROM otp_codes
+                        WHERE expires_at < NOW()
+                        LIMIT %s
+                    )
+                """, (batch_size,))
+                db.connection.commit()
+                deleted_count += cursor.rowcount
+                if cursor.rowcount < batch_size:
+                    break
+        else:
+            cursor.execute("""
+                DELETE FROM otp_codes
+                WHERE expires_at < NOW() OR is_used = TRUE
+            """)
+            deleted_count = cursor.rowcount
+        db.connection.commit()
+        cursor.close()
+        return deleted_count
+
+    def stats(self):
+        return {'backend': self.name}
+
+
+class MemoryOTPStore:
+    """OTPs in a process-local dict keyed by (mobile_number, purpose).
+
+    Issue, verify and invalidate are O(1). Expiry is tracked in a min-heap
+    of deadlines which is swept on every write, so expired codes are
+    dropped without a cleanup job. Only one live OTP is kept per key,
+    matching the "invalidate previous OTPs" rule of the table store.
+
+    The store is not shared between processes: run a single worker
+    process (threads are fine) or pin OTP traffic to one process.
+    """
+
+    name = 'memory'
+
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self.issued = 0
+        self.verified = 0
+        self.rejected = 0
+        self.expired = 0
+
+        self._entries = {}  # (mobile_number, purpose) -> (otp_code, expires_at)
+        self._deadlines = []  # heap of (expires_at, key)
+        self._lock = threading.Lock()
+
+    def _sweep(self, now):
+        # Heap entries of re-issued or consumed keys are stale; only drop
+        # the live entry when its deadline matches
+        while self._deadlines and self._deadlines[0][0] <= now:
+            expires_at, key = heapq.heappop(self._deadlines)
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] == expires_at:
+                del self._entries[key]
+                self.expired += 1
+
+        # Bound stale heap entries left behind by verify/invalidate
+        if len(self._deadlines) > 2 * len(self._entries) + 64:
+            self._deadlines = [(entry[1], key) for key, entry in self._entries.items()]
+            heapq.heapify(self._deadlines)
+
+    def issue(self, mobile_number, purpose, otp_code, ttl_seconds, require_user=None):
+        """See PostgresOTPStore.issue; the registration check is a query on users"""
+        if require_user is not None:
+            cursor = db.connection.cursor()
+            registered = user_registered(cursor, mobile_number)
+            cursor.close()
+            if registered != require_user:
+                return False
+
+        key = (mobile_number, purpose)
+        with self._lock:
+            now = self.clock()
+            self._sweep(now)
+            expires_at = now + ttl_seconds
+            self._entries[key] = (otp_code, expires_at)
+            heapq.heappush(self._deadlines, (expires_at, key))
+            self.issued += 1
+        return True
+
+    def verify(self, mobile_number, purpose, otp_code):
+        """Consume a matching, unexpired OTP. Returns True if one was found"""
+        key = (mobile_number, purpose)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != otp_code or entry[1] <= self.clock():
+                self.rejected += 1
+                return False
+            del self._entries[key]
+            self.verified += 1
+            return True
+
+    def invalidate(self, mobile_number, purpose):
+        with self._lock:
+            self._entries.pop((mobile_number, purpose), None)
+
+    def purge_expired(self, batch_size=None):
+        with self._lock:
+            before = self.expired
+            self._sweep(self.clock())
+            return self.expired - before
+
+    def stats(self):
+        with self._lock:
+            return {
+                'backend': self.name,
+                'live': len(self._entries),
+                'issued': self.issued,
+                'verified': self.verified,
+                'rejected': self.rejected,
+                'expired': self.expired
+            }
+
+
+OTP_STORES = {
+    'postgres': PostgresOTPStore,
+    'memory': MemoryOTPStore
+}
+
+
+def create_otp_store(name=None):
+    """OTP store for OTP_STORE (postgres or memory)"""
+    name = (name or os.getenv('OTP_STORE', 'postgres')).lower()
+    if name not in OTP_STORES:
+        print(f"⚠️ Unknown OTP_STORE '{name}', using postgres")
+        name = 'postgres'
+    return OTP_STORES[name]()
@@ -0,0 +1,350 @@
+"""
+Time-range partitions of otp_codes and disease_reports, and their retention.
+
+With DB_PARTITIONING=True, Database.create_tables creates otp_codes
+partitioned by day and disease_reports partitioned by month of
+created_at, on the database clock. Each also gets a DEFAULT partition for
+rows no range partition covers, so inserts keep working if maintenance
+falls behind; those rows move into their range partition once it exists.
+PartitionManager.run():
+
+- creates the partitions for the next PARTITION_PREMAKE_DAYS days and
+  PARTITION_PREMAKE_MONTHS months
+- drops otp_codes partitions that ended OTP_PARTITION_RETENTION_DAYS
+  days ago. Every OTP in them expired long before, so nothing is deleted
+  row by row.
+- with REPORT_ARCHIVE_MONTHS > 0, detaches disease_reports partitions
+  older than that and moves them to the ``archive`` schema. Archived
+  reports leave the app but keep their rows and image blob references
+  until the table is dumped and dropped by hand.
+
+Tables created before partitioning was turned on are converted in one
+transaction that locks the table while its rows are copied:
+
+    python partitions.py --convert otp_codes
+    python partitions.py --convert disease_reports
+    python partitions.py --run
+"""
+import argparse
+import os
+from datetime import date, datetime, timedelta
+from database import db
+from dotenv import load_dotenv
+
+load_dotenv()
+
+ARCHIVE_SCHEMA = 'archive'
+
+
+def _add_months(day, months):
+    """First day of the month ``months`` after the month of ``day``"""
+    month = day.month - 1 + months
+    return date(day.year + month // 12, month % 12 + 1, 1)
+
+
+class PartitionedTable:
+    """Range partitioning of a table on created_at, by 'day' or 'month'"""
+
+    def __init__(self, name, unit, premake):
+        self.name = name
+        self.unit = unit
+        self.premake = premake
+        self._suffix = '%Y%m%d' if unit == 'day' else '%Y%m'
+
+    def period_start(self, day):
+        return day if self.unit == 'day' else day.replace(day=1)
+
+    def next_period(self, start):
+        return start + timedelta(days=1) if self.unit == 'day' else _add_months(start, 1)
+
+    def partition_name(self, start):
+        return f"{self.name}_p{start.strftime(self._suffix)}"
+
+    def partition_start(self, partition):
+        """Start of a partition's range, read from its name (None for the default partition)"""
+        prefix = f"{self.name}_p"
+        if not partition.startswith(prefix):
+            return None
+        try:
+            return datetime.strptime(partition[len(prefix):], self._suffix).date()
+        except ValueError:
+            return None
+
+
+class PartitionManager:
+    """Creates, drops and archives the partitions of otp_codes and disease_reports"""
+
+    def __init__(self, otp_retention_days=1, report_archive_months=0,
+                 premake_days=7, premake_months=3):
+        self.tables = {
+            'otp_codes': PartitionedTable('otp_codes', 'day', premake_days),
+            'disease_reports': PartitionedTable('disease_reports', 'month', premake_months)
+        }
+        self.otp_retention_days = otp_retention_days
+        self.report_archive_months = report_archive_months
+
+    @staticmethod
+    def is_partitioned(cursor, table):
+        cursor.execute("SELECT relkind = 'p' FROM pg_class WHERE oid = to_regclass(%s)", (table,))
+        row = cursor.fetchone()
+        return bool(row and row[0])
+
+    @staticmethod
+    def partitions(cursor, table):
+        """Names of the partitions attached to ``table``"""
+        cursor.execute("""
+            SELECT c.relname FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = to_regclass(%s)
+            ORDER BY c.relname
+        """, (table,))
+        return [row[0] for row in cursor.fetchall()]
+
+    @staticmethod
+    def today(cursor):
+        """Current date on the database clock, which created_at also uses"""
+        cursor.execute("SELECT CURRENT_DATE")
+        return cursor.fetchone()[0]
+
+    def ensure(self, cursor, tables=None, since=None, today=None):
+        """Create the default partition and the range partitions from ``since``
+        (default today) to the premake horizon; returns the created names.
+
+        A table whose partitions cannot be created is skipped with a
+        message, so the rest of the caller's transaction (e.g. the schema
+        bootstrap) is kept.
+        """
+        today = today or self.today(cursor)
+        created = []
+        for name in tables or self.tables:
+            if not self.is_partitioned(cursor, name):
+                print(f"⚠️  {name} is not partitioned; convert it with "
+                      f"python partitions.py --convert {name}")
+                continue
+
+            cursor.execute("SAVEPOINT ensure_partitions")
+            try:
+                created += self._ensure_table(cursor, self.tables[name], since, today)
+                cursor.execute("RELEASE SAVEPOINT ensure_partitions")
+            except Exception as e:
+                cursor.execute("ROLLBACK TO SAVEPOINT ensure_partitions")
+                print(f"❌ Could not create partitions of {name}: {e}")
+        return created
+
+    def _ensure_table(self, cursor, spec, since, today):
+        name = spec.name
+        default = f"{name}_default"
+        cursor.execute(f"CREATE TABLE IF NOT EXISTS {default} PARTITION OF {name} DEFAULT")
+        existing = set(self.partitions(cursor, name))
+
+        last = spec.period_start(today)
+        for _ in range(spec.premake):
+            last = spec.next_period(last)
+        missing = []
+        start = spec.period_start(min(since or today, today))
+        while start <= last:
+            end = spec.next_period(start)
+            if spec.partition_name(start) not in existing:
+                missing.append((start, end))
+            start = end
+        if not missing:
+            return []
+
+        # Rows that landed in the default partition while a range was
+        # missing (maintenance did not run) block creating that range, so
+        # they are moved into it with the default partition detached
+        cursor.execute(f"""
+            SELECT EXISTS (
+                SELECT 1 FROM {default}
+                WHERE created_at >= %s AND created_at < %s
+            )
+        """, (missing[0][0], missing[-1][1]))
+        move_rows = cursor.fetchone()[0]
+        if move_rows:
+            cursor.execute(f"ALTER TABLE {name} DETACH PARTITION {default}")
+
+        created = []
+        for start, end in missing:
+            partition = spec.partition_name(start)
+            cursor.execute(f"""
+                CREATE TABLE {partition} PARTITION OF {name}
+                FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')
+            """)
+            created.append(partition)
+
+        if move_rows:
+            cursor.execute(f"""
+                WITH moved AS (
+                    DELETE FROM {default}
+                    WHERE created_at >= %s AND created_at < %s
+                    RETURNING *
+                )
+                INSERT INTO {name} SELECT * FROM moved
+            """, (missing[0][0], missing[-1][1]))
+            print(f"🗂️  Moved {cursor.rowcount} rows of {default} into new partitions")
+            cursor.execute(f"ALTER TABLE {name} ATTACH PARTITION {default} DEFAULT")
+        return created
+
+    def drop_expired_otps(self, cursor, today=None):
+        """Drop otp_codes partitions that ended ``otp_retention_days`` ago.
+
+        Expired and used rows in the default partition are deleted.
+        Returns (dropped partition names, rows removed).
+        """
+        spec = self.tables['otp_codes']
+        cutoff = (today or self.today(cursor)) - timedelta(days=self.otp_retention_days)
+        dropped = []
+        rows = 0
+        for partition in self.partitions(cursor, 'otp_codes'):
+            start = spec.partition_start(partition)
+            if start is None or spec.next_period(start) > cutoff:
+                continue
+            cursor.execute(f"SELECT COUNT(*) FROM {partition}")
+            rows += cursor.fetchone()[0]
+            cursor.execute(f"DROP TABLE {partition}")
+            dropped.append(partition)
+
+        cursor.execute("""
+            DELETE FROM otp_codes_default
+            WHERE expires_at < NOW() OR is_used = TRUE
+        """)
+        rows += cursor.rowcount
+        return dropped, rows
+
+    def archive_reports(self, cursor, today=None):
+        """Move disease_reports partitions older than ``report_archive_months``
+        into the archive schema; returns their new names"""
+        if self.report_archive_months <= 0:
+            return []
+        spec = self.tables['disease_reports']
+        cutoff = _add_months(today or self.today(cursor), -self.report_archive_months)
+        archived = []
+        for partition in self.partitions(cursor, 'disease_reports'):
+            start = spec.partition_start(partition)
+            if start is None or spec.next_period(start) > cutoff:
+                continue
+            cursor.execute(f"CREATE SCHEMA IF NOT EXISTS {ARCHIVE_SCHEMA}")
+            cursor.execute(f"ALTER TABLE disease_reports DETACH PARTITION {partition}")
+            cursor.execute(f"ALTER TABLE {partition} SET SCHEMA {ARCHIVE_SCHEMA}")
+            archived.append(f"{ARCHIVE_SCHEMA}.{partition}")
+        return archived
+
+    def run(self):
+        """Create upcoming partitions, drop expired OTP partitions and archive old reports"""
+        with db.session() as conn:
+            cursor = conn.cursor()
+            try:
+                created = self.ensure(cursor)
+                dropped, otp_rows = [], 0
+                if self.is_partitioned(cursor, 'otp_codes'):
+                    dropped, otp_rows = self.drop_expired_otps(cursor)
+                archived = []
+                if self.is_partitioned(cursor, 'disease_reports'):
+                    archived = self.archive_reports(cursor)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                cursor.close()
+
+        print(f"🗂️  Partitions: {len(created)} created, {len(dropped)} OTP partitions dropped "
+              f"({otp_rows} rows), {len(archived)} report partitions archived")
+        return {
+            'created': created,
+            'droppedOtpPartitions': dropped,
+            'otpRowsRemoved': otp_rows,
+            'archivedReportPartitions': archived
+        }
+
+    def convert(self, table):
+        """Recreate an unpartitioned table as a partitioned one and copy its rows.
+
+        Only live OTPs are copied. Returns the number of rows copied.
+        """
+        with db.session() as conn:
+            cursor = conn.cursor()
+            try:
+                if self.is_partitioned(cursor, table):
+                    print(f"✅ {table} is already partitioned")
+                    return 0
+
+                # Keep the old table aside and free its index names
+                old = f"{table}_unpartitioned"
+                cursor.execute(f"ALTER TABLE {table} RENAME TO {old}")
+                cursor.execute("""
+                    SELECT indexname FROM pg_indexes
+                    WHERE schemaname = current_schema() AND tablename = %s
+                """, (old,))
+                for (index,) in cursor.fetchall():
+                    cursor.execute(f"ALTER INDEX {index} RENAME TO {index}_unpartitioned")
+
+                getattr(db, f"create_{table}")(cursor, partitioned=True)
+                cursor.execute(f"SELECT MIN(created_at) FROM {old}")
+                oldest = cursor.fetchone()[0]
+                self.ensure(cursor, tables=[table], since=oldest.date() if oldest else None)
+
+                cursor.execute("""
+                    SELECT column_name FROM information_schema.columns
+                    WHERE table_schema = current_schema() AND table_name = %s
+                    ORDER BY ordinal_position
+                """, (old,))
+                columns = [row[0] for row in cursor.fetchall()]
+                values = ['COALESCE(created_at, CURRENT_TIMESTAMP)' if column == 'created_at'
+                          else column for column in columns]
+                live_only = "WHERE is_used = FALSE AND expires_at > NOW()" if table == 'otp_codes' else ""
+                cursor.execute(f"""
+                    INSERT INTO {table} ({', '.join(columns)})
+                    SELECT {', '.join(values)} FROM {old} {live_only}
+                """)
+                copied = cursor.rowcount
+
+                # Continue ids after the copied rows
+                cursor.execute(f"""
+                    SELECT setval(pg_get_serial_sequence(%s, 'id'),
+                                  COALESCE((SELECT MAX(id) FROM {old}), 0) + 1, false)
+                """, (table,))
+                cursor.execute(f"DROP TABLE {old}")
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                cursor.close()
+
+        print(f"✅ Converted {table} to partitions ({copied} rows copied)")
+        return copied
+
+
+# Shared by Database.create_tables, the OTP store and the maintenance CLI
+PARTITIONS = PartitionManager(
+    otp_retention_days=int(os.getenv('OTP_PARTITION_RETENTION_DAYS', 1)),
+    report_archive_months=int(os.getenv('REPORT_ARCHIVE_MONTHS', 0)),
+    premake_days=int(os.getenv('PARTITION_PREMAKE_DAYS', 7)),
+    premake_months=int(os.getenv('PARTITION_PREMAKE_MONTHS', 3))
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--run', action='store_true',
+                        help='create upcoming partitions and apply retention')
+    parser.add_argument('--convert', choices=sorted(PARTITIONS.tables),
+                        help='recreate an unpartitioned table with partitions')
+    args = parser.parse_args()
+
+    if not args.run and not args.convert:
+        parser.print_help()
+        return
+
+    if not db.connect():
+        raise SystemExit(1)
+    if args.convert:
+        PARTITIONS.convert(args.convert)
+    if args.run:
+        PARTITIONS.run()
+
+
+if __name__ == "__main__":
+    main()
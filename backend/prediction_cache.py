@@ -0,0 +1,74 @@
+import json
+import os
+import threading
+
+from lru_cache import LRUCache
+
+
+class PredictionCache:
+    """Two-tier cache of model predictions keyed by image content.
+
+    The memory tier is a byte-bounded LRU; the optional disk tier stores one
+    small JSON file per key under ``cache_dir`` (sharded by key prefix) so
+    results survive restarts and are shared between worker processes.
+    """
+
+    def __init__(self, max_bytes, cache_dir=None):
+        self.memory = LRUCache(max_bytes, sizeof=lambda value: len(json.dumps(value)))
+        self.cache_dir = cache_dir or None
+        self.disk_hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        if self.cache_dir:
+            os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _disk_path(self, key):
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def get(self, key):
+        value = self.memory.get(key)
+        if value is not None:
+            return value
+
+        if self.cache_dir:
+            try:
+                with open(self._disk_path(key), 'r') as f:
+                    value = json.load(f)
+                self.memory.put(key, value)
+                with self._lock:
+                    self.disk_hits += 1
+                return value
+            except (OSError, ValueError):
+                pass
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key, value):
+        self.memory.put(key, value)
+
+        if self.cache_dir:
+            path = self._disk_path(key)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            try:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(tmp_path, 'w') as f:
+                    json.dump(value, f)
+                os.replace(tmp_path, path)
+            except OSError as e:
+                print(f"⚠️ Could not write prediction cache entry: {e}")
+
+    def stats(self):
+        memory = self.memory.stats()
+        with self._lock:
+            return {
+                'hits': memory['hits'] + self.disk_hits,
+                'memoryHits': memory['hits'],
+                'diskHits': self.disk_hits,
+                'misses': self.misses,
+                'entries': memory['entries'],
+                'bytes': memory['bytes'],
+                'disk': bool(self.cache_dir)
+            }
@@ -0,0 +1,160 @@
+"""
+Stage timing and sampled profiling of the scan pipeline.
+
+A StageTimer activated around a scan collects how long each stage took
+(request parsing, hashing, saving, decoding, transforms, the forward pass,
+softmax, serialization). Code along the pipeline marks stages with
+``with stage('decode'):``, which does nothing outside an active timer, so
+the same functions stay cheap when called from batch jobs or benchmarks.
+
+ScanProfiler runs cProfile over every N-th scan, or over every scan while
+a window opened with enable_for() lasts, and writes ``.prof`` files for
+offline analysis:
+
+    python -m pstats profiles/scan-20250101-120000-1234-1.prof
+    snakeviz profiles/scan-20250101-120000-1234-1.prof
+"""
+import cProfile
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager, nullcontext
+
+_local = threading.local()
+_NO_STAGE = nullcontext()
+
+
+class StageTimer:
+    """Seconds spent per named stage of one request"""
+
+    def __init__(self):
+        self.stages = {}  # stage -> seconds, in the order first seen
+        self.start = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + time.perf_counter() - start
+
+    @contextmanager
+    def activate(self):
+        """Make this the timer that stage() records into on this thread"""
+        previous = getattr(_local, 'timer', None)
+        _local.timer = self
+        try:
+            yield self
+        finally:
+            _local.timer = previous
+
+    def total(self):
+        return time.perf_counter() - self.start
+
+    def server_timing(self):
+        """``Server-Timing`` header value, durations in milliseconds"""
+        parts = [f"{name};dur={seconds * 1000:.2f}" for name, seconds in self.stages.items()]
+        parts.append(f"total;dur={self.total() * 1000:.2f}")
+        return ', '.join(parts)
+
+
+def stage(name):
+    """Time a block as ``name`` on the active StageTimer, if any"""
+    timer = getattr(_local, 'timer', None)
+    return timer.stage(name) if timer is not None else _NO_STAGE
+
+
+class ScanProfiler:
+    """cProfile for a sample of scans, dumped to ``directory``.
+
+    Every ``every``-th scan is profiled (0 disables sampling), as is every
+    scan while a window opened by enable_for() lasts. One scan is profiled
+    at a time per process; only the newest ``max_files`` profiles written
+    by this process are kept.
+    """
+
+    def __init__(self, directory, every=0, max_files=200):
+        self.directory = directory
+        self.every = every
+        self.max_files = max_files
+        self.written = 0
+
+        self._seen = 0
+        self._window_until = 0.0
+        self._busy = False
+        self._files = deque()
+        self._lock = threading.Lock()
+
+    def enable_for(self, seconds):
+        """Profile every scan for the next ``seconds``.
+
+        Safe to call from a signal handler: it neither takes the lock, which
+        the interrupted thread may hold, nor prints; a single float store
+        is atomic.
+        """
+        self._window_until = time.monotonic() + seconds
+
+    def _claim(self):
+        with self._lock:
+            self._seen += 1
+            wanted = (time.monotonic() < self._window_until
+                      or (self.every > 0 and self._seen % self.every == 0))
+            if not wanted or self._busy:
+                return False
+            self._busy = True
+            return True
+
+    @contextmanager
+    def maybe_profile(self, label='scan'):
+        """Profile the block if this request is sampled; yields the profiler or None"""
+        if not self._claim():
+            yield None
+            return
+
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:  # Another profiling tool is active
+            with self._lock:
+                self._busy = False
+            yield None
+            return
+
+        try:
+            yield profiler
+        finally:
+            profiler.disable()
+            try:
+                self._dump(profiler, label)
+            except OSError as e:
+                print(f"❌ Could not write profile: {e}")
+            finally:
+                with self._lock:
+                    self._busy = False
+
+    def _dump(self, profiler, label):
+        os.makedirs(self.directory, exist_ok=True)
+        with self._lock:
+            self.written += 1
+            name = f"{label}-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{self.written}.prof"
+        path = os.path.join(self.directory, name)
+        profiler.dump_stats(path)
+
+        with self._lock:
+            self._files.append(path)
+            expired = [self._files.popleft() for _ in range(len(self._files) - self.max_files)]
+        for old_path in expired:
+            if os.path.exists(old_path):
+                os.remove(old_path)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'every': self.every,
+                'windowSeconds': max(0.0, round(self._window_until - time.monotonic(), 1)),
+                'written': self.written,
+                'kept': len(self._files),
+                'directory': self.directory
+            }
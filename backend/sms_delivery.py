@@ -0,0 +1,238 @@
+import os
+import queue
+import threading
+import time
+from metrics import SMS_SEND_LATENCY
+from dotenv import load_dotenv
+
+load_dotenv()
+
+OTP_MESSAGE = "Your GrowGuardians OTP is: {otp_code}. Valid for 3 minutes. Do not share this code."
+
+
+def format_mobile_number(mobile_number):
+    """Format mobile number in E.164 (add +92 for Pakistan if not present)"""
+    if not mobile_number.startswith('+'):
+        if mobile_number.startswith('0'):
+            mobile_number = '+92' + mobile_number[1:]  # Remove leading 0, add +92
+        elif mobile_number.startswith('92'):
+            mobile_number = '+' + mobile_number
+        else:
+            mobile_number = '+92' + mobile_number
+    return mobile_number
+
+
+def timed_send(sender, mobile_number, otp_code):
+    """``sender.send()``, recording its latency and outcome in SMS_SEND_LATENCY"""
+    start = time.perf_counter()
+    outcome = 'error'
+    try:
+        result = sender.send(mobile_number, otp_code)
+        if result.get('success'):
+            outcome = 'ok'
+        return result
+    finally:
+        SMS_SEND_LATENCY.observe(time.perf_counter() - start, sender.name, outcome)
+
+
+class ConsoleSender:
+    """Prints the OTP instead of sending it (ENABLE_SMS=False)"""
+
+    name = 'console'
+
+    def send(self, mobile_number, otp_code):
+        print("\n" + "="*60)
+        print("⚠️  SMS DISABLED - Using Console Display Mode")
+        print(f"📱 Mobile Number: {mobile_number}")
+        print(f"🔑 OTP Code: {otp_code}")
+        print("💡 To enable SMS: Set ENABLE_SMS=True in .env")
+        print("="*60 + "\n")
+        return {'success': True, 'message': 'OTP displayed in console'}
+
+
+class TwilioSender:
+    """Sends OTPs through Twilio, reusing one client for all messages"""
+
+    name = 'twilio'
+
+    def __init__(self, account_sid, auth_token, from_number):
+        self.account_sid = account_sid
+        self.auth_token = auth_token
+        self.from_number = from_number
+        self._client = None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    from twilio.rest import Client
+                    self._client = Client(self.account_sid, self.auth_token)
+        return self._client
+
+    def send(self, mobile_number, otp_code):
+        to_number = format_mobile_number(mobile_number)
+        message = self.client.messages.create(
+            body=OTP_MESSAGE.format(otp_code=otp_code),
+            from_=self.from_number,
+            to=to_number
+        )
+
+        print(f"✅ SMS sent successfully to {to_number}")
+        print(f"📨 Message SID: {message.sid}")
+
+        return {
+            'success': True,
+            'message': 'SMS sent successfully',
+            'message_sid': message.sid
+        }
+
+
+class FakeSMSSink:
+    """Records messages in memory instead of sending them.
+
+    For tests and benchmarks (SMS_BACKEND=fake). ``latency`` simulates the
+    provider round trip and ``fail_first`` makes the first N attempts per
+    number fail, to exercise retries.
+    """
+
+    name = 'fake'
+
+    def __init__(self, latency=0.0, fail_first=0):
+        self.latency = latency
+        self.fail_first = fail_first
+        self.messages = []
+        self._attempts = {}
+        self._lock = threading.Lock()
+
+    def send(self, mobile_number, otp_code):
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            attempts = self._attempts.get(mobile_number, 0) + 1
+            self._attempts[mobile_number] = attempts
+            if attempts <= self.fail_first:
+                raise ConnectionError(f"Simulated SMS failure {attempts} for {mobile_number}")
+            self.messages.append({
+                'to': format_mobile_number(mobile_number),
+                'body': OTP_MESSAGE.format(otp_code=otp_code),
+                'otp_code': otp_code,
+                'sent_at': time.time()
+            })
+        return {'success': True, 'message': 'SMS recorded by fake sink'}
+
+    def last_otp(self, mobile_number):
+        to_number = format_mobile_number(mobile_number)
+        with self._lock:
+            for message in reversed(self.messages):
+                if message['to'] == to_number:
+                    return message['otp_code']
+        return None
+
+
+class SMSDeliveryQueue:
+    """Delivers SMS on a bounded pool of background threads.
+
+    enqueue() returns immediately. Failed sends are retried up to
+    ``max_attempts`` times with exponential backoff starting at
+    ``backoff`` seconds. When the queue is full, enqueue() returns False.
+    """
+
+    def __init__(self, sender, workers=2, max_queue=1000, max_attempts=3, backoff=1.0):
+        self.sender = sender
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.sent = 0
+        self.failed = 0
+        self.retried = 0
+
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._threads = [
+            threading.Thread(target=self._worker, name=f'sms-delivery-{i}', daemon=True)
+            for i in range(workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def enqueue(self, mobile_number, otp_code):
+        try:
+            self._queue.put_nowait((mobile_number, otp_code))
+            return True
+        except queue.Full:
+            print(f"❌ SMS queue full, dropping OTP message for {mobile_number}")
+            with self._lock:
+                self.failed += 1
+            return False
+
+    def _deliver(self, mobile_number, otp_code):
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                result = timed_send(self.sender, mobile_number, otp_code)
+                if result.get('success'):
+                    return result
+                error = result.get('message', 'unknown error')
+            except Exception as e:
+                error = str(e)
+
+            print(f"❌ SMS Error (attempt {attempt}/{self.max_attempts}): {error}")
+            if attempt < self.max_attempts:
+                with self._lock:
+                    self.retried += 1
+                time.sleep(self.backoff * (2 ** (attempt - 1)))
+
+        # Fallback to console display
+        print("\n" + "="*60)
+        print("⚠️  SMS FAILED - Displaying OTP in Console")
+        print(f"📱 Mobile Number: {mobile_number}")
+        print(f"🔑 OTP Code: {otp_code}")
+        print(f"❌ Error: {error}")
+        print("="*60 + "\n")
+        return {'success': False, 'message': f'SMS failed, OTP displayed in console: {error}'}
+
+    def _worker(self):
+        while True:
+            mobile_number, otp_code = self._queue.get()
+            try:
+                result = self._deliver(mobile_number, otp_code)
+                with self._lock:
+                    if result.get('success'):
+                        self.sent += 1
+                    else:
+                        self.failed += 1
+            finally:
+                self._queue.task_done()
+
+    def join(self):
+        """Block until every queued message was attempted"""
+        self._queue.join()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'queued': self._queue.qsize(),
+                'sent': self.sent,
+                'failed': self.failed,
+                'retried': self.retried
+            }
+
+
+def create_sender():
+    """Sender for the configured backend (SMS_BACKEND, else ENABLE_SMS)"""
+    backend = os.getenv('SMS_BACKEND', '').lower()
+    if not backend:
+        backend = 'twilio' if os.getenv('ENABLE_SMS', 'False').lower() == 'true' else 'console'
+
+    if backend == 'fake':
+        return FakeSMSSink(latency=float(os.getenv('FAKE_SMS_LATENCY_MS', 0)) / 1000)
+
+    if backend == 'twilio':
+        account_sid = os.getenv('TWILIO_ACCOUNT_SID')
+        auth_token = os.getenv('TWILIO_AUTH_TOKEN')
+        twilio_number = os.getenv('TWILIO_PHONE_NUMBER')
+        if all([account_sid, auth_token, twilio_number]):
+            return TwilioSender(account_sid, auth_token, twilio_number)
+        print("❌ Twilio credentials not configured properly, using console display")
+
+    return ConsoleSender()
@@ -0,0 +1,122 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+
+class PendingUploadStore:
+    """Holds freshly uploaded scans in memory until they need to be on disk.
+
+    Scans are classified straight from memory; the original image is only
+    written to ``path_for(filename)`` (by default inside ``upload_folder``)
+    when persist() is called (e.g. the report
+    is saved) or when it has to be evicted to stay under ``max_bytes``.
+    Entries nobody persisted are dropped after ``ttl_seconds``. Writes run
+    on a small background thread pool, off the request path.
+    """
+
+    def __init__(self, upload_folder, max_bytes=64 * 1024 * 1024, ttl_seconds=1800, workers=2,
+                 path_for=None):
+        self.upload_folder = upload_folder
+        self.path_for = path_for or (lambda filename: os.path.join(upload_folder, filename))
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+
+        self._entries = OrderedDict()  # filename -> (data, added_at)
+        self._writing = {}  # filename -> Future
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='upload-writer')
+
+    def add(self, filename, data):
+        """Keep ``data`` in memory under ``filename``"""
+        spill = []
+        with self._lock:
+            self._expire()
+            old = self._entries.pop(filename, None)
+            if old is not None:
+                self._bytes -= len(old[0])
+            self._entries[filename] = (data, time.monotonic())
+            self._bytes += len(data)
+
+            # Over budget: write the oldest scans out instead of losing them
+            projected = self._bytes
+            for name, (pending, _) in self._entries.items():
+                if projected <= self.max_bytes or name == filename:
+                    break
+                if name not in self._writing:
+                    spill.append(name)
+                projected -= len(pending)
+
+        for name in spill:
+            self.persist(name)
+
+    def get(self, filename):
+        """Return the pending bytes for ``filename``, or None"""
+        with self._lock:
+            entry = self._entries.get(filename)
+            return entry[0] if entry else None
+
+    def persist(self, filename):
+        """Write a pending upload to disk in the background.
+
+        Returns a Future, or None if nothing is pending under that name.
+        """
+        with self._lock:
+            if filename in self._writing:
+                return self._writing[filename]
+            entry = self._entries.get(filename)
+            if entry is None:
+                return None
+            future = self._executor.submit(self._write, filename, entry[0])
+            self._writing[filename] = future
+            return future
+
+    def _write(self, filename, data):
+        path = self.path_for(filename)
+        tmp_path = f"{path}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            # Keep the bytes in memory so a later persist() can retry
+            print(f"❌ Failed to persist upload {filename}: {e}")
+            with self._lock:
+                self._writing.pop(filename, None)
+            raise
+
+        with self._lock:
+            self._writing.pop(filename, None)
+            entry = self._entries.pop(filename, None)
+            if entry is not None:
+                self._bytes -= len(entry[0])
+        return path
+
+    def _expire(self):
+        cutoff = time.monotonic() - self.ttl_seconds
+        while self._entries:
+            name, (data, added_at) = next(iter(self._entries.items()))
+            if added_at >= cutoff or name in self._writing:
+                break
+            del self._entries[name]
+            self._bytes -= len(data)
+
+    def flush(self, timeout=None):
+        """Persist everything still pending and wait for the writes"""
+        with self._lock:
+            names = list(self._entries)
+        futures = [self.persist(name) for name in names]
+        for future in futures:
+            if future is not None:
+                future.exception(timeout=timeout)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'pending': len(self._entries),
+                'bytes': self._bytes,
+                'writing': len(self._writing)
+            }
@@ -1,33 +1,87 @@
-from database import db
-from otp_service import OTPService
+from database import db, PreparedStatement
+from otp_service import OTPService, OTP_STORE
+from otp_store import CONSUME_OTP
 import jwt
 import os
+import hashlib
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
+from lru_cache import TTLCache
 
 load_dotenv()
 
 SECRET_KEY = os.getenv('SECRET_KEY', 'your-secret-key-change-in-production')
 
+# Verified tokens by SHA-256 digest, kept until the token's exp, so repeat
+# requests skip the HMAC check. TOKEN_CACHE_SIZE=0 disables it.
+TOKEN_CACHE = TTLCache(int(os.getenv('TOKEN_CACHE_SIZE', 10000)))
+
+# Profiles by user id. Invalidated by update_user_profile in this process;
+# PROFILE_CACHE_TTL bounds staleness in other worker processes.
+PROFILE_CACHE = TTLCache(int(os.getenv('PROFILE_CACHE_SIZE', 10000)),
+                         ttl=float(os.getenv('PROFILE_CACHE_TTL', 300)))
+
+def format_user(row):
+    """Client-facing profile for (id, name, surname, mobile_number, email,
+    province, district, tehsil, village, address)"""
+    return {
+        'id': row[0],
+        'name': row[1],
+        'surname': row[2],
+        'mobileNumber': row[3],
+        'email': row[4] or '',
+        'province': row[5] or '',
+        'district': row[6] or '',
+        'tehsil': row[7] or '',
+        'village': row[8] or '',
+        'address': row[9] or ''
+    }
+
+USER_COLUMNS = "id, name, surname, mobile_number, email, province, district, tehsil, village, address"
+
+# Register after consuming the OTP, in one statement. Returns (OTP verified,
+# new user id); the id is NULL when the number is already registered.
+REGISTER_USER = PreparedStatement('user_register', f"""
+    WITH otp AS ({CONSUME_OTP.sql}),
+    new_user AS (
+        INSERT INTO users (name, surname, mobile_number, email, province,
+                           district, tehsil, village, address)
+        SELECT %s, %s, %s, %s, %s, %s, %s, %s, %s FROM otp
+        ON CONFLICT (mobile_number) DO NOTHING
+        RETURNING id
+    )
+    SELECT EXISTS (SELECT 1 FROM otp), (SELECT id FROM new_user)
+""")
+
+# The same insert for OTPs kept outside the database (OTP_STORE=memory)
+INSERT_USER = PreparedStatement('user_insert', """
+    INSERT INTO users (name, surname, mobile_number, email, province,
+                       district, tehsil, village, address)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+    ON CONFLICT (mobile_number) DO NOTHING
+    RETURNING id
+""")
+
+# Consume the login OTP and read the user in one statement. Always one
+# row: (OTP verified, user columns or NULLs).
+LOGIN_USER = PreparedStatement('user_login', f"""
+    WITH otp AS ({CONSUME_OTP.sql})
+    SELECT EXISTS (SELECT 1 FROM otp), {', '.join('u.' + c for c in USER_COLUMNS.split(', '))}
+    FROM (SELECT 1) AS one
+    LEFT JOIN users AS u ON u.mobile_number = %s
+""")
+
+USER_BY_MOBILE = PreparedStatement('user_by_mobile', f"""
+    SELECT {USER_COLUMNS} FROM users WHERE mobile_number = %s
+""")
+
 class UserService:
     @staticmethod
     def send_registration_otp(mobile_number):
         """Send OTP for registration"""
         try:
-            # Check if user already exists
-            cursor = db.connection.cursor()
-            cursor.execute("SELECT id FROM users WHERE mobile_number = %s", (mobile_number,))
-            existing_user = cursor.fetchone()
-            cursor.close()
-            
-            if existing_user:
-                return {
-                    'success': False,
-                    'message': 'Mobile number already registered'
-                }
-            
-            # Send OTP
-            return OTPService.send_otp(mobile_number, 'registration')
+            # Refused when the number is already registered
+            return OTPService.send_otp(mobile_number, 'registration', require_user=False)
             
         except Exception as e:
             print(f"Error sending registration OTP: {e}")
@@ -41,31 +95,7 @@ class UserService:
         """Register a new user after OTP verification"""
         try:
             mobile_number = user_data.get('mobileNumber')
-            
-            # Verify OTP
-            otp_result = OTPService.verify_otp(mobile_number, otp_code, 'registration')
-            if not otp_result['success']:
-                return otp_result
-            
-            # Check if user already exists
-            cursor = db.connection.cursor()
-            cursor.execute("SELECT id FROM users WHERE mobile_number = %s", (mobile_number,))
-            existing_user = cursor.fetchone()
-            
-            if existing_user:
-                cursor.close()
-                return {
-                    'success': False,
-                    'message': 'User already registered'
-                }
-            
-            # Insert new user
-            cursor.execute("""
-                INSERT INTO users (name, surname, mobile_number, email, province, 
-                                  district, tehsil, village, address)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-                RETURNING id
-            """, (
+            user_values = (
                 user_data.get('name'),
                 user_data.get('surname'),
                 mobile_number,
@@ -75,12 +105,38 @@ class UserService:
                 user_data.get('tehsil'),
                 user_data.get('village', ''),
                 user_data.get('address', '')
-            ))
+            )
+            
+            if OTP_STORE.name == 'memory':
+                otp_result = OTPService.verify_otp(mobile_number, otp_code, 'registration')
+                if not otp_result['success']:
+                    return otp_result
+                cursor = db.connection.cursor()
+                INSERT_USER.execute(cursor, user_values)
+                row = cursor.fetchone()
+                user_id = row[0] if row else None
+            else:
+                # Verify the OTP and insert the user in one statement
+                cursor = db.connection.cursor()
+                REGISTER_USER.execute(cursor, (mobile_number, otp_code, 'registration') + user_values)
+                verified, user_id = cursor.fetchone()
+                if not verified:
+                    db.connection.commit()
+                    cursor.close()
+                    return {
+                        'success': False,
+                        'message': 'Invalid or expired OTP'
+                    }
             
-            user_id = cursor.fetchone()[0]
             db.connection.commit()
             cursor.close()
             
+            if user_id is None:
+                return {
+                    'success': False,
+                    'message': 'User already registered'
+                }
+            
             # Generate JWT token
             token = UserService.generate_token(user_id, mobile_number)
             
@@ -103,20 +159,8 @@ class UserService:
     def send_login_otp(mobile_number):
         """Send OTP for login"""
         try:
-            # Check if user exists
-            cursor = db.connection.cursor()
-            cursor.execute("SELECT id FROM users WHERE mobile_number = %s", (mobile_number,))
-            user = cursor.fetchone()
-            cursor.close()
-            
-            if not user:
-                return {
-                    'success': False,
-                    'message': 'Mobile number not registered'
-                }
-            
-            # Send OTP
-            return OTPService.send_otp(mobile_number, 'login')
+            # Refused when the number is not registered
+            return OTPService.send_otp(mobile_number, 'login', require_user=True)
             
         except Exception as e:
             print(f"Error sending login OTP: {e}")
@@ -129,22 +173,27 @@ class UserService:
     def login_user(mobile_number, otp_code):
         """Login user with OTP verification"""
         try:
-            # Verify OTP
-            otp_result = OTPService.verify_otp(mobile_number, otp_code, 'login')
-            if not otp_result['success']:
-                return otp_result
-            
-            # Get user data
-            cursor = db.connection.cursor()
-            cursor.execute("""
-                SELECT id, name, surname, mobile_number, email, province, 
-                       district, tehsil, village, address
-                FROM users 
-                WHERE mobile_number = %s
-            """, (mobile_number,))
-            
-            user_row = cursor.fetchone()
-            cursor.close()
+            if OTP_STORE.name == 'memory':
+                otp_result = OTPService.verify_otp(mobile_number, otp_code, 'login')
+                if not otp_result['success']:
+                    return otp_result
+                cursor = db.connection.cursor()
+                USER_BY_MOBILE.execute(cursor, (mobile_number,))
+                user_row = cursor.fetchone()
+                cursor.close()
+            else:
+                # Verify the OTP and read the user in one statement
+                cursor = db.connection.cursor()
+                LOGIN_USER.execute(cursor, (mobile_number, otp_code, 'login', mobile_number))
+                verified, *user_row = cursor.fetchone()
+                db.connection.commit()
+                cursor.close()
+                if not verified:
+                    return {
+                        'success': False,
+                        'message': 'Invalid or expired OTP'
+                    }
+                user_row = user_row if user_row[0] is not None else None
 
             if not user_row:
                 return {
@@ -152,19 +201,7 @@ class UserService:
                     'message': 'User not found'
                 }
             
-            # Convert row to dict for easier access
-            user = {
-                'id': user_row[0],
-                'name': user_row[1],
-                'surname': user_row[2],
-                'mobile_number': user_row[3],
-                'email': user_row[4],
-                'province': user_row[5],
-                'district': user_row[6],
-                'tehsil': user_row[7],
-                'village': user_row[8],
-                'address': user_row[9]
-            }
+            user = format_user(user_row)
 
             # Generate JWT token
             token = UserService.generate_token(user['id'], mobile_number)
@@ -173,18 +210,7 @@ class UserService:
                 'success': True,
                 'message': 'Login successful',
                 'token': token,
-                'user': {
-                    'id': user['id'],
-                    'name': user['name'],
-                    'surname': user['surname'],
-                    'mobileNumber': user['mobile_number'],
-                    'email': user['email'] or '',
-                    'province': user['province'] or '',
-                    'district': user['district'] or '',
-                    'tehsil': user['tehsil'] or '',
-                    'village': user['village'] or '',
-                    'address': user['address'] or ''
-                }
+                'user': user
             }
             
         except Exception as e:
@@ -196,7 +222,11 @@ class UserService:
 
     @staticmethod
     def get_user_profile(user_id):
-        """Get user profile by ID"""
+        """Get user profile by ID (read through PROFILE_CACHE)"""
+        cached = PROFILE_CACHE.get(user_id)
+        if cached is not None:
+            return {'success': True, 'user': dict(cached)}
+        
         try:
             cursor = db.connection.cursor()
             cursor.execute("""
@@ -210,32 +240,11 @@ class UserService:
             cursor.close()
 
             if user_row:
-                user = {
-                    'id': user_row[0],
-                    'name': user_row[1],
-                    'surname': user_row[2],
-                    'mobile_number': user_row[3],
-                    'email': user_row[4],
-                    'province': user_row[5],
-                    'district': user_row[6],
-                    'tehsil': user_row[7],
-                    'village': user_row[8],
-                    'address': user_row[9]
-                }
+                profile = format_user(user_row)
+                PROFILE_CACHE.put(user_id, profile)
                 return {
                     'success': True,
-                    'user': {
-                        'id': user['id'],
-                        'name': user['name'],
-                        'surname': user['surname'],
-                        'mobileNumber': user['mobile_number'],
-                        'email': user['email'] or '',
-                        'province': user['province'] or '',
-                        'district': user['district'] or '',
-                        'tehsil': user['tehsil'] or '',
-                        'village': user['village'] or '',
-                        'address': user['address'] or ''
-                    }
+                    'user': dict(profile)
                 }
             else:
                 return {
@@ -292,6 +301,7 @@ class UserService:
             
             db.connection.commit()
             cursor.close()
+            PROFILE_CACHE.pop(user_id)
 
             return {
                 'success': True,
@@ -319,9 +329,15 @@ class UserService:
 
     @staticmethod
     def verify_token(token):
-        """Verify JWT token"""
+        """Verify JWT token (verified tokens are cached until they expire)"""
+        digest = hashlib.sha256(token.encode()).digest()
+        user_id = TOKEN_CACHE.get(digest)
+        if user_id is not None:
+            return {'success': True, 'user_id': user_id}
+        
         try:
             payload = jwt.decode(token, SECRET_KEY, algorithms=['HS256'])
+            TOKEN_CACHE.put(digest, payload['user_id'], expires_at=payload.get('exp'))
             return {'success': True, 'user_id': payload['user_id']}
         except jwt.ExpiredSignatureError:
             return {'success': False, 'message': 'Token expired'}
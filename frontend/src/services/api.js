@@ -212,12 +212,45 @@ export const diseaseService = {
   },
 
   /**
-   * Get all reports for user
+   * Upload several photos of one plot for disease detection in one request
+   * @param {File[]} imageFiles - Image files (at most 30)
+   * @returns {Promise} One result per image and a plot summary
+   */
+  uploadScanBatch: async (imageFiles) => {
+    const formData = new FormData();
+    imageFiles.forEach((imageFile) => formData.append('images', imageFile));
+
+    const response = await apiClient.post('/scan/batch', formData, {
+      headers: {
+        'Content-Type': 'multipart/form-data',
+      },
+    });
+
+    return response.data;
+  },
+
+  /**
+   * Get one page of reports for user, newest first
+   * @param {Object} params - Optional { limit, after } (after = previous nextCursor)
+   * @returns {Promise} Reports and nextCursor (null on the last page)
+   */
+  getReports: async (params = {}) => {
+    const response = await apiClient.get('/reports', { params });
+    return response.data;
+  },
+
+  /**
+   * Get all reports for user (follows pagination cursors)
    * @returns {Promise} List of reports
    */
   getAllReports: async () => {
-    const response = await apiClient.get('/reports');
-    return response.data;
+    let data = await diseaseService.getReports();
+    const reports = [...(data.reports || [])];
+    while (data.success && data.nextCursor) {
+      data = await diseaseService.getReports({ after: data.nextCursor });
+      reports.push(...(data.reports || []));
+    }
+    return { ...data, reports };
   },
 
   /**